@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import os
 
 from .routers import makler, leads, rechnungen, statistiken, export, makler_stats, makler_monatsstatistik, auth, upload, gatelink, credits, stripe, organisation, tickets
@@ -16,7 +17,15 @@ def create_app() -> FastAPI:
     # Datenbank initialisieren
     init_db()
     
-    app = FastAPI(title="LeadGate CRM & Abrechnung")
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Unterbrochene CSV-Import-Jobs fortsetzen (z.B. nach Absturz oder Neustart)
+        from .services.lead_import_service import setze_offene_import_jobs_fort, beende_import_worker
+        setze_offene_import_jobs_fort()
+        yield
+        beende_import_worker()
+    
+    app = FastAPI(title="LeadGate CRM & Abrechnung", lifespan=lifespan)
     
     # CORS-Middleware hinzufügen
     app.add_middleware(
@@ -25,6 +34,7 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "X-Total-Count"],  # Pagination-Header für das Frontend
     )
     
     # Rate Limiting hinzufügen
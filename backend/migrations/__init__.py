@@ -0,0 +1,28 @@
+"""
+Versionierte Datenbank-Migrationen in Ausführungsreihenfolge (Runner: services/migration_service.py).
+
+Neue Migration: Modul mNNN_<name>.py mit upgrade(db) anlegen und unten anhängen.
+Versionen werden nie umnummeriert oder entfernt. upgrade() committet nicht selbst, der
+Runner trägt die Version in derselben Transaktion ein. Auf frischen Datenbanken legt
+Migration 1 per create_all bereits alle Tabellen im aktuellen Modellstand an - spätere
+Migrationen müssen daher prüfen, ob ihre Änderung schon vorhanden ist.
+"""
+
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy.orm import Session
+
+from . import m001_ausgangsschema, m002_chat_konversationen, m003_makler_gebiet_version
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    upgrade: Callable[[Session], None]
+
+
+MIGRATIONEN: List[Migration] = [
+    Migration(1, "Ausgangsschema (bisheriges init_db)", m001_ausgangsschema.upgrade),
+    Migration(2, "Postfach-Tabelle chat_konversationen", m002_chat_konversationen.upgrade),
+    Migration(3, "Änderungszähler makler_gebiet_version", m003_makler_gebiet_version.upgrade),
+]
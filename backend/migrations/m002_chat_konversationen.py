@@ -0,0 +1,21 @@
+"""
+Migration 2: Postfach-Tabelle chat_konversationen (services/chat_konversation_service.py).
+Legt die Tabelle an, falls Migration 1 sie noch nicht per create_all angelegt hat,
+befüllt sie einmalig aus den vorhandenen Chat-Nachrichten und ergänzt den Index für die
+Ungelesen-Zählung in Gruppen-Chats.
+"""
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..models import ChatKonversation
+from ..services.chat_konversation_service import baue_chat_konversationen_neu
+
+
+def upgrade(db: Session) -> None:
+    ChatKonversation.__table__.create(bind=db.connection(), checkfirst=True)
+    db.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_chat_messages_gruppe_gelesen ON chat_messages(chat_gruppe_id, gelesen)"
+    ))
+    anzahl = baue_chat_konversationen_neu(db)
+    print(f"Postfach-Tabelle befüllt: {anzahl} Konversationen")
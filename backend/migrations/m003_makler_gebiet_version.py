@@ -0,0 +1,16 @@
+"""
+Migration 3: Änderungszähler makler_gebiet_version (services/gebiet_index_service.py).
+Legt die Tabelle an, falls Migration 1 sie noch nicht per create_all angelegt hat, und
+trägt die einzige Zeile ein.
+"""
+
+from sqlalchemy.orm import Session
+
+from ..models import MaklerGebietVersion
+from ..services.gebiet_index_service import VERSION_ID
+
+
+def upgrade(db: Session) -> None:
+    MaklerGebietVersion.__table__.create(bind=db.connection(), checkfirst=True)
+    if db.get(MaklerGebietVersion, VERSION_ID) is None:
+        db.add(MaklerGebietVersion(id=VERSION_ID, version=0))
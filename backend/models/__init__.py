@@ -4,12 +4,19 @@ from .rechnung import Rechnung
 from .user import User
 from .chat import ChatMessage
 from .chat_gruppe import ChatGruppe, ChatGruppeTeilnehmer
+from .chat_konversation import ChatKonversation
 from .makler_dokument import MaklerDokument
 from .makler_credits import MaklerCredits
 from .credits_rueckzahlung_anfrage import CreditsRueckzahlungAnfrage
 from .ticket import Ticket, TicketTeilnehmer, TicketDringlichkeit
+from .makler_gebiet import MaklerGebiet, MaklerGebietVersion
+from .lead_nummer_sequenz import LeadNummerSequenz
+from .import_job import ImportJob
+from .makler_monat_rollup import MaklerMonatRollup
+from .makler_tagesplan import MaklerTagesplan
+from .schema_migration import SchemaMigration, SchemaMigrationSperre
 
-__all__ = ["Makler", "Lead", "Rechnung", "User", "ChatMessage", "ChatGruppe", "ChatGruppeTeilnehmer", "MaklerDokument", "MaklerCredits", "CreditsRueckzahlungAnfrage", "Ticket", "TicketTeilnehmer", "TicketDringlichkeit"]
+__all__ = ["Makler", "Lead", "Rechnung", "User", "ChatMessage", "ChatGruppe", "ChatGruppeTeilnehmer", "ChatKonversation", "MaklerDokument", "MaklerCredits", "CreditsRueckzahlungAnfrage", "Ticket", "TicketTeilnehmer", "TicketDringlichkeit", "MaklerGebiet", "MaklerGebietVersion", "LeadNummerSequenz", "ImportJob", "MaklerMonatRollup", "MaklerTagesplan", "SchemaMigration", "SchemaMigrationSperre"]
 
 
 
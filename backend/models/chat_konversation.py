@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Index
+
+from ..database import Base
+
+
+class ChatKonversation(Base):
+    """
+    Postfach-Eintrag: eine Zeile pro Benutzer und Konversation (Kontakt-User, Makler oder
+    Chat-Gruppe) mit der letzten Nachricht und der Anzahl ungelesener Nachrichten für diesen
+    Benutzer. Wird beim Senden und beim Lesen von Nachrichten aktualisiert
+    (services/chat_konversation_service.py); das Postfach liest nur diese Tabelle.
+    """
+
+    __tablename__ = "chat_konversationen"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Besitzer des Postfach-Eintrags
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    kontakt_typ = Column(String, nullable=False)  # "user", "makler" oder "gruppe"
+    kontakt_id = Column(Integer, nullable=False)
+
+    letzte_nachricht_id = Column(Integer, ForeignKey("chat_messages.id", ondelete="SET NULL"), nullable=True)
+    letzte_nachricht_am = Column(DateTime, nullable=True)
+    letzte_nachricht_vorschau = Column(String, nullable=True)  # Anfang der Nachricht (VORSCHAU_LAENGE)
+    ungelesen = Column(Integer, nullable=False, default=0)
+
+    aktualisiert_am = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_chat_konversationen_user_kontakt", "user_id", "kontakt_typ", "kontakt_id", unique=True),
+        Index("idx_chat_konversationen_user_zeit", "user_id", "letzte_nachricht_am"),
+    )
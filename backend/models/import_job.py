@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, Text
+
+from ..database import Base
+
+
+class ImportJob(Base):
+    """
+    Repräsentiert einen CSV-Lead-Import.
+    Der Fortschritt wird nach jedem Batch aktualisiert und kann abgefragt werden.
+    verarbeitete_zeilen wird zusammen mit dem Batch committet und dient als
+    Wiederaufsetzpunkt, falls der Import abbricht (Absturz, Neustart).
+    """
+
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    dateiname = Column(String, nullable=False)
+    dateipfad = Column(String, nullable=True)  # Gespeicherte Upload-Datei unter uploads/imports/
+    batch_groesse = Column(Integer, nullable=True)  # None = IMPORT_BATCH_GROESSE aus der Config
+    duplikat_modus = Column(String, nullable=True)  # "skip", "merge" oder "flag" (None = IMPORT_DUPLIKAT_MODUS)
+
+    # Status: "wartend", "laeuft", "abgeschlossen", "fehlgeschlagen"
+    status = Column(String, nullable=False, default="wartend", index=True)
+
+    # Optional: Alle Leads dieses Imports einem festen Makler zuordnen
+    makler_id = Column(Integer, ForeignKey("makler.id", ondelete="SET NULL"), nullable=True)
+    created_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+
+    # Fortschritt
+    datei_groesse = Column(Integer, nullable=True)  # in Bytes
+    verarbeitete_bytes = Column(Integer, nullable=False, default=0)
+    verarbeitete_zeilen = Column(Integer, nullable=False, default=0)
+    importierte_leads = Column(Integer, nullable=False, default=0)
+    fehler_anzahl = Column(Integer, nullable=False, default=0)
+    duplikate_anzahl = Column(Integer, nullable=False, default=0)  # Übersprungene, zusammengeführte oder markierte Duplikate
+    fehler_details = Column(Text, nullable=True)  # JSON-Liste [{"row": 5, "error": "..."}], gekürzt
+    meldung = Column(Text, nullable=True)  # Fehlermeldung, falls der gesamte Import fehlschlägt
+
+    # Zeitstempel
+    erstellt_am = Column(DateTime, default=datetime.utcnow, nullable=False)
+    gestartet_am = Column(DateTime, nullable=True)
+    beendet_am = Column(DateTime, nullable=True)
+    aktualisiert_am = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)  # Heartbeat des Workers
@@ -99,6 +99,10 @@ class Lead(Base):
     favorit = Column(Integer, nullable=True, default=0)  # 0 oder 1 (Boolean) - Favoriten-Markierung für Makler
     makler_angesehen = Column(Integer, nullable=True, default=0)  # 0 oder 1 (Boolean) - Wurde der Lead vom Makler bereits geöffnet/angesehen
     
+    # Duplikat-Erkennung: Fingerprint aus normalisierter Telefonnummer, PLZ und Anbieter-Name
+    fingerprint = Column(String, nullable=True, index=True)
+    duplikat_von_lead_id = Column(Integer, ForeignKey("leads.id", ondelete="SET NULL"), nullable=True)  # Gesetzt, wenn als Duplikat markiert
+    
     makler = relationship("Makler", backref="leads")
     qualifiziert_von_user = relationship("User", foreign_keys=[qualifiziert_von_user_id], backref="qualifizierte_leads")
 
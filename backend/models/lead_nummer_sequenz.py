@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer
+
+from ..database import Base
+
+
+class LeadNummerSequenz(Base):
+    """
+    Zähler für die Vergabe von Lead-Nummern (genau eine Zeile mit id=1).
+    naechste_nummer ist die nächste noch nicht reservierte Nummer.
+    """
+
+    __tablename__ = "lead_nummer_sequenz"
+
+    id = Column(Integer, primary_key=True)
+    naechste_nummer = Column(Integer, nullable=False)
@@ -64,5 +64,9 @@ class Makler(Base):
     automatische_aufladung_aktiv = Column(Integer, nullable=False, default=0)  # 0 = deaktiviert, 1 = aktiviert
     automatische_aufladung_betrag = Column(Float, nullable=True)  # Betrag für automatische Aufladung
     automatische_aufladung_tag = Column(Integer, nullable=True)  # Tag des Monats (1-28) für automatische Aufladung
+    
+    # Laufender Credits-Stand (Summe aller makler_credits.betrag), wird bei jeder Buchung
+    # in derselben Transaktion mitgeführt (credits_service.buche_credits_transaktion)
+    credits_stand = Column(Float, nullable=False, default=0.0)
 
 
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+
+from ..database import Base
+
+
+class MaklerGebiet(Base):
+    """
+    Normalisierte Gebietszuordnung: Eine Zeile pro (PLZ, Makler).
+    Wird aus Makler.gebiet abgeleitet, Präfixe ("541*") und Bereiche ("54100-54199")
+    werden dabei in einzelne Postleitzahlen aufgelöst.
+    """
+
+    __tablename__ = "makler_gebiet"
+
+    id = Column(Integer, primary_key=True, index=True)
+    makler_id = Column(Integer, ForeignKey("makler.id", ondelete="CASCADE"), nullable=False, index=True)
+    plz = Column(String, nullable=False)
+
+    __table_args__ = (
+        # Haupt-Index für PLZ-Lookups (PLZ -> Makler) und Prefix-Suche
+        Index("idx_makler_gebiet_plz_makler", "plz", "makler_id", unique=True),
+    )
+
+
+class MaklerGebietVersion(Base):
+    """
+    Änderungszähler für makler_gebiet (genau eine Zeile mit id=1).
+    Wird bei jeder Gebietsänderung erhöht; Prozesse mit In-Memory-Gebiets-Index laden
+    den Index neu, sobald die Version von der beim Laden gelesenen abweicht.
+    """
+
+    __tablename__ = "makler_gebiet_version"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
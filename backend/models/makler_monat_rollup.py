@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Float, Integer, ForeignKey, Index
+
+from ..database import Base
+
+
+class MaklerMonatRollup(Base):
+    """
+    Vorberechnete Monatskennzahlen pro Makler (eine Zeile pro Makler/Jahr/Monat).
+    Lead-Zählungen beziehen sich auf den Monat von qualifiziert_am, Credits auf
+    erstellt_am der Transaktion, Umsatz auf die Rechnungen des Monats.
+    Wird bei Lead-Änderungen inkrementell aktualisiert (services/monats_rollup_service.py).
+    """
+
+    __tablename__ = "makler_monat_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    makler_id = Column(Integer, ForeignKey("makler.id", ondelete="CASCADE"), nullable=False)
+    jahr = Column(Integer, nullable=False)
+    monat = Column(Integer, nullable=False)
+
+    qualifiziert_anzahl = Column(Integer, nullable=False, default=0)
+    flexrecall_anzahl = Column(Integer, nullable=False, default=0)
+    storniert_anzahl = Column(Integer, nullable=False, default=0)
+
+    # Netto abgebuchte Credits (Lead-Abbuchungen abzüglich Erstattungen), positiver Betrag
+    credits_abgebucht = Column(Float, nullable=False, default=0.0)
+    # Brutto-Summe der Rechnungen (monatlich nach monat/jahr, Beteiligung nach erstellt_am)
+    umsatz = Column(Float, nullable=False, default=0.0)
+
+    aktualisiert_am = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_makler_monat_rollup_makler_jahr_monat", "makler_id", "jahr", "monat", unique=True),
+        Index("idx_makler_monat_rollup_jahr_monat", "jahr", "monat"),
+    )
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, Integer, String, ForeignKey, Index
+
+from ..database import Base
+
+
+class MaklerTagesplan(Base):
+    """
+    Tages-Verteilungsplan pro Makler (eine Zeile pro Makler und Tag).
+    Tagessatz (Ziel) und Monatswerte werden einmal pro Tag bzw. nach Änderungen am Makler
+    oder seinen Credits berechnet; geliefert wird bei jeder Qualifizierung hochgezählt.
+    Die Lead-Empfehlung liest den Rückstand (tagessatz - geliefert) direkt aus dieser Tabelle
+    (services/tagesplan_service.py).
+    """
+
+    __tablename__ = "makler_tagesplan"
+
+    id = Column(Integer, primary_key=True, index=True)
+    makler_id = Column(Integer, ForeignKey("makler.id", ondelete="CASCADE"), nullable=False)
+    datum = Column(Date, nullable=False)
+
+    # Ziel: Leads pro Tag (0 = kein fester Tagessatz, z.B. unbegrenzte Soll-Leads)
+    tagessatz = Column(Float, nullable=False, default=0.0)
+    # Heute bereits qualifizierte Leads
+    geliefert = Column(Integer, nullable=False, default=0)
+
+    # Noch benötigte Leads im Monat (None = unbegrenzt), wird bei Qualifizierungen mitgezählt
+    noch_benoetigt = Column(Integer, nullable=True)
+    ist_leads = Column(Integer, nullable=False, default=0)
+    soll_leads = Column(Integer, nullable=True)
+    arbeitstage_noch = Column(Integer, nullable=False, default=0)
+    prioritaet = Column(String, nullable=False, default="niedrig")  # "hoch", "normal", "niedrig"
+    kann_leads = Column(Boolean, nullable=False, default=False)
+
+    berechnet_am = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("idx_makler_tagesplan_datum_makler", "datum", "makler_id", unique=True),
+    )
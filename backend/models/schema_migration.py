@@ -0,0 +1,32 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String
+
+from ..database import Base
+
+
+class SchemaMigration(Base):
+    """
+    Angewendete Datenbank-Migrationen (eine Zeile pro Version aus backend/migrations).
+    Die höchste Version ist der aktuelle Schema-Stand der Datenbank.
+    """
+
+    __tablename__ = "schema_migrationen"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String, nullable=False)
+    angewendet_am = Column(DateTime, default=datetime.utcnow, nullable=False)
+    dauer_ms = Column(Integer, nullable=True)
+
+
+class SchemaMigrationSperre(Base):
+    """
+    Sperre für laufende Migrationen (höchstens eine Zeile).
+    Wer die Zeile einfügen kann, migriert; andere Prozesse warten, bis sie gelöscht ist.
+    """
+
+    __tablename__ = "schema_migration_sperre"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    gesperrt_von = Column(String, nullable=False)  # "hostname:pid"
+    gesperrt_seit = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -1,12 +1,13 @@
-from datetime import timedelta, datetime
+from datetime import timedelta
 from typing import List, Optional
-from sqlalchemy import func, or_, and_
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import or_, and_
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy.orm import Session
 
 from .. import schemas
-from ..database import get_db
+from ..database import SessionLocal, get_db
 from ..models.user import User, UserRole
 from ..models.chat import ChatMessage
 from ..models.makler import Makler
@@ -18,11 +19,25 @@ from ..services.auth_service import (
     get_password_hash,
     get_user_by_username,
     get_user_by_email,
+    get_current_user,
     get_current_active_user,
     require_admin,
     require_admin_or_manager,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from ..services.chat_konversation_service import (
+    aktualisiere_ungelesen_fuer_nachrichten,
+    baue_chat_konversationen_neu,
+    entferne_benutzer_aus_chat_konversationen,
+    lade_postfach,
+    trage_chat_nachrichten_ein
+)
+from ..services.chat_serialisierung_service import (
+    lade_gruppen_teilnehmer,
+    serialisiere_chat_nachricht,
+    serialisiere_chat_nachrichten
+)
+from ..services.chat_push_service import EMPFAENGER_USER, bediene_chat_websocket, get_push_metriken, token_ablauf
 from ..config import RATE_LIMIT_ENABLED, RATE_LIMIT_PER_MINUTE
 from fastapi import Request
 
@@ -57,6 +72,9 @@ def register(user_data: schemas.UserCreate, db: Session = Depends(get_db)):
             hashed_password=hashed_password
         )
         db.add(db_user)
+        db.flush()
+        # Makler-Nachrichten ohne Empfänger erscheinen auch im Postfach neuer Benutzer
+        baue_chat_konversationen_neu(db, user_id=db_user.id)
         db.commit()
         db.refresh(db_user)
         
@@ -241,6 +259,9 @@ def create_user(
             role=requested_role
         )
         db.add(db_user)
+        db.flush()
+        # Makler-Nachrichten ohne Empfänger erscheinen auch im Postfach neuer Benutzer
+        baue_chat_konversationen_neu(db, user_id=db_user.id)
         db.commit()
         db.refresh(db_user)
         
@@ -403,7 +424,10 @@ def delete_user(
         for gruppe in chat_gruppen_to_delete:
             db.delete(gruppe)
         
-        # 6. Jetzt kann der Benutzer gelöscht werden
+        # 6. Postfach-Einträge mit diesem Benutzer entfernen, seine Gruppen neu berechnen
+        entferne_benutzer_aus_chat_konversationen(db, user_id)
+        
+        # 7. Jetzt kann der Benutzer gelöscht werden
         db.delete(user)
         db.commit()
         
@@ -610,11 +634,12 @@ def send_chat_message(
         )
     
     db.add(message)
+    trage_chat_nachrichten_ein(db, [message])
     db.commit()
     db.refresh(message)
     
     # Lade zusätzliche Informationen
-    return load_chat_message_details(message, db)
+    return serialisiere_chat_nachricht(db, message)
 
 
 @router.get("/chat/conversations", response_model=List[schemas.ConversationSummary])
@@ -629,322 +654,52 @@ def get_conversations(
     - Nachrichten von Maklern werden nur für Manager und Admin angezeigt
     - Buchhalter und Telefonisten sehen nur Konversationen mit Manager/Admin
     """
-    # Hole alle Konversationen, an denen der Benutzer beteiligt ist
-    # Konversationen mit anderen Usern
-    user_conversations = db.query(
-        ChatMessage.to_user_id,
-        func.max(ChatMessage.erstellt_am).label('last_message_time')
-    ).filter(
-        ChatMessage.from_user_id == current_user.id,
-        ChatMessage.to_user_id.isnot(None)
-    ).group_by(ChatMessage.to_user_id).all()
-    
-    # Konversationen, in denen der Benutzer Empfänger ist
-    # Für Buchhalter/Telefonisten: Nur Konversationen mit Manager/Admin
-    received_user_filter = [
-        ChatMessage.to_user_id == current_user.id,
-        ChatMessage.from_user_id.isnot(None)
-    ]
-    
-    if current_user.role in [UserRole.BUCHHALTER, UserRole.TELEFONIST]:
-        # Nur Konversationen mit Manager oder Admin
-        manager_admin_ids = db.query(User.id).filter(
-            User.role.in_([UserRole.MANAGER, UserRole.ADMIN])
-        ).subquery()
-        received_user_filter.append(ChatMessage.from_user_id.in_(manager_admin_ids))
-    
-    received_user_conversations = db.query(
-        ChatMessage.from_user_id,
-        func.max(ChatMessage.erstellt_am).label('last_message_time')
-    ).filter(*received_user_filter).group_by(ChatMessage.from_user_id).all()
-    
-    # Konversationen mit Maklern - nur für Manager und Admin
-    makler_conversations = []
-    received_makler_conversations = []
-    
-    if current_user.role in [UserRole.MANAGER, UserRole.ADMIN]:
-        makler_conversations = db.query(
-            ChatMessage.to_makler_id,
-            func.max(ChatMessage.erstellt_am).label('last_message_time')
-        ).filter(
-            ChatMessage.from_user_id == current_user.id,
-            ChatMessage.to_makler_id.isnot(None)
-        ).group_by(ChatMessage.to_makler_id).all()
-        
-        received_makler_conversations = db.query(
-            ChatMessage.from_makler_id,
-            func.max(ChatMessage.erstellt_am).label('last_message_time')
-        ).filter(
-            or_(
-                ChatMessage.to_user_id == current_user.id,
-                ChatMessage.to_user_id.is_(None)  # Makler-Nachrichten ohne spezifischen Empfänger
-            ),
-            ChatMessage.from_makler_id.isnot(None)
-        ).group_by(ChatMessage.from_makler_id).all()
-    
-    # Kombiniere alle Konversationen
-    conversations = {}
-    
-    # User-Konversationen
-    # OPTIMIERUNG: Lade alle User-Rollen in einem Batch für Buchhalter/Telefonisten
-    user_contact_ids = [conv.to_user_id for conv in user_conversations]
-    user_roles_dict = {}
-    if current_user.role in [UserRole.BUCHHALTER, UserRole.TELEFONIST] and user_contact_ids:
-        users_with_roles = db.query(User.id, User.role).filter(User.id.in_(user_contact_ids)).all()
-        user_roles_dict = {u.id: u.role for u in users_with_roles}
-    
-    for conv in user_conversations:
-        contact_id = conv.to_user_id
-        # Für Buchhalter/Telefonisten: Nur Manager/Admin als Kontakte (nutze bereits geladene Daten)
-        if current_user.role in [UserRole.BUCHHALTER, UserRole.TELEFONIST]:
-            contact_role = user_roles_dict.get(contact_id)
-            if not contact_role or contact_role not in [UserRole.MANAGER, UserRole.ADMIN]:
-                continue
-        
-        key = f"user_{contact_id}"
-        if key not in conversations or conv.last_message_time > conversations[key]['last_message_time']:
-            conversations[key] = {
-                'contact_id': contact_id,
-                'contact_type': 'user',
-                'last_message_time': conv.last_message_time
-            }
-    
-    for conv in received_user_conversations:
-        contact_id = conv.from_user_id
-        key = f"user_{contact_id}"
-        if key not in conversations or conv.last_message_time > conversations[key]['last_message_time']:
-            conversations[key] = {
-                'contact_id': contact_id,
-                'contact_type': 'user',
-                'last_message_time': conv.last_message_time
-            }
-    
-    # Makler-Konversationen - nur für Manager und Admin
-    if current_user.role in [UserRole.MANAGER, UserRole.ADMIN]:
-        for conv in makler_conversations:
-            contact_id = conv.to_makler_id
-            key = f"makler_{contact_id}"
-            if key not in conversations or conv.last_message_time > conversations[key]['last_message_time']:
-                conversations[key] = {
-                    'contact_id': contact_id,
-                    'contact_type': 'makler',
-                    'last_message_time': conv.last_message_time
-                }
-        
-        for conv in received_makler_conversations:
-            contact_id = conv.from_makler_id
-            key = f"makler_{contact_id}"
-            if key not in conversations or conv.last_message_time > conversations[key]['last_message_time']:
-                conversations[key] = {
-                    'contact_id': contact_id,
-                    'contact_type': 'makler',
-                    'last_message_time': conv.last_message_time
-                }
-    
-    # Gruppen-Chats hinzufügen
-    from ..models import ChatGruppe, ChatGruppeTeilnehmer
-    gruppen_teilnahmen = db.query(ChatGruppeTeilnehmer.chat_gruppe_id).filter(
-        ChatGruppeTeilnehmer.user_id == current_user.id
-    ).all()
-    gruppen_ids = [g[0] for g in gruppen_teilnahmen]
-    
-    gruppen_conversations = []
-    if gruppen_ids:
-        gruppen_conversations = db.query(
-            ChatMessage.chat_gruppe_id,
-            func.max(ChatMessage.erstellt_am).label('last_message_time')
-        ).filter(
-            ChatMessage.chat_gruppe_id.in_(gruppen_ids)
-        ).group_by(ChatMessage.chat_gruppe_id).all()
-    
-    for conv in gruppen_conversations:
-        gruppe_id = conv.chat_gruppe_id
-        key = f"gruppe_{gruppe_id}"
-        if key not in conversations or conv.last_message_time > conversations[key]['last_message_time']:
-            conversations[key] = {
-                'contact_id': gruppe_id,
-                'contact_type': 'gruppe',
-                'last_message_time': conv.last_message_time
-            }
-    
-    # Optimierung: Lade alle Kontakte und Nachrichten in einem Batch
-    user_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'user']
-    makler_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'makler']
-    gruppen_ids_list = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'gruppe']
-    
-    # Lade alle User und Makler in einem Batch
-    users_dict = {}
-    if user_ids:
-        users = db.query(User).filter(User.id.in_(user_ids)).all()
-        users_dict = {u.id: u for u in users}
-    
-    makler_dict = {}
-    if makler_ids:
-        maklers = db.query(Makler).filter(Makler.id.in_(makler_ids)).all()
-        makler_dict = {m.id: m for m in maklers}
-    
-    # Lade alle Chat-Gruppen in einem Batch
-    gruppen_dict = {}
-    if gruppen_ids_list:
-        gruppen = db.query(ChatGruppe).filter(ChatGruppe.id.in_(gruppen_ids_list)).all()
-        gruppen_dict = {g.id: g for g in gruppen}
-    
-    # Filtere geschlossene Ticket-Chats aus
-    from ..models import Ticket
-    if gruppen_ids_list:
-        # Finde alle Tickets, die zu diesen Chat-Gruppen gehören
-        tickets = db.query(Ticket).filter(
-            Ticket.chat_gruppe_id.in_(gruppen_ids_list),
-            Ticket.geschlossen == 1
-        ).all()
-        geschlossene_ticket_gruppen_ids = {t.chat_gruppe_id for t in tickets}
-        
-        # Entferne geschlossene Ticket-Chats aus der Konversationsliste
-        conversations_to_remove = []
-        for key, conv in conversations.items():
-            if conv['contact_type'] == 'gruppe' and conv['contact_id'] in geschlossene_ticket_gruppen_ids:
-                conversations_to_remove.append(key)
-        
-        for key in conversations_to_remove:
-            del conversations[key]
-        
-        # Aktualisiere gruppen_ids_list nach dem Filtern
-        gruppen_ids_list = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'gruppe']
-    
-    # OPTIMIERUNG: Lade nur die neueste Nachricht pro Konversation (effizienter)
-    last_messages_dict = {}
-    if conversations:
-        # User-Konversationen: Lade nur die neueste Nachricht pro Konversation
-        user_conv_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'user']
-        if user_conv_ids:
-            # Für jede Konversation die neueste Nachricht direkt laden (effizienter als alle zu laden)
-            for contact_id in user_conv_ids:
-                latest_msg = db.query(ChatMessage).filter(
-                    or_(
-                        and_(ChatMessage.from_user_id == current_user.id, ChatMessage.to_user_id == contact_id),
-                        and_(ChatMessage.from_user_id == contact_id, ChatMessage.to_user_id == current_user.id)
-                    )
-                ).order_by(ChatMessage.erstellt_am.desc()).first()
-                
-                if latest_msg:
-                    key = f"user_{contact_id}"
-                    last_messages_dict[key] = latest_msg
-        
-        # Makler-Konversationen: Lade nur die neueste Nachricht pro Konversation
-        makler_conv_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'makler']
-        if makler_conv_ids:
-            for makler_id in makler_conv_ids:
-                latest_msg = db.query(ChatMessage).filter(
-                    or_(
-                        and_(ChatMessage.from_user_id == current_user.id, ChatMessage.to_makler_id == makler_id),
-                        and_(
-                            ChatMessage.from_makler_id == makler_id,
-                            or_(
-                                ChatMessage.to_user_id == current_user.id,
-                                ChatMessage.to_user_id.is_(None)
-                            )
-                        )
-                    )
-                ).order_by(ChatMessage.erstellt_am.desc()).first()
-                
-                if latest_msg:
-                    key = f"makler_{makler_id}"
-                    last_messages_dict[key] = latest_msg
-        
-        # Gruppen-Chats: Lade nur die neueste Nachricht pro Konversation
-        gruppen_conv_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'gruppe']
-        if gruppen_conv_ids:
-            for gruppe_id in gruppen_conv_ids:
-                latest_msg = db.query(ChatMessage).filter(
-                    ChatMessage.chat_gruppe_id == gruppe_id
-                ).order_by(ChatMessage.erstellt_am.desc()).first()
-                
-                if latest_msg:
-                    key = f"gruppe_{gruppe_id}"
-                    last_messages_dict[key] = latest_msg
-    
-    # OPTIMIERUNG: Berechne alle unread_counts in einem Batch
-    unread_counts_dict = {}
-    if conversations:
-        # User-Konversationen: Ungelesene Nachrichten
-        user_conv_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'user']
-        if user_conv_ids:
-            unread_user = db.query(
-                ChatMessage.from_user_id,
-                func.count(ChatMessage.id).label('count')
-            ).filter(
-                ChatMessage.from_user_id.in_(user_conv_ids),
-                ChatMessage.to_user_id == current_user.id,
-                ChatMessage.gelesen == False
-            ).group_by(ChatMessage.from_user_id).all()
-            
-            for row in unread_user:
-                unread_counts_dict[f"user_{row.from_user_id}"] = row.count
-        
-        # Makler-Konversationen: Ungelesene Nachrichten
-        makler_conv_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'makler']
-        if makler_conv_ids:
-            unread_makler = db.query(
-                ChatMessage.from_makler_id,
-                func.count(ChatMessage.id).label('count')
-            ).filter(
-                ChatMessage.from_makler_id.in_(makler_conv_ids),
-                or_(
-                    ChatMessage.to_user_id == current_user.id,
-                    ChatMessage.to_user_id.is_(None)
-                ),
-                ChatMessage.gelesen == False
-            ).group_by(ChatMessage.from_makler_id).all()
-            
-            for row in unread_makler:
-                unread_counts_dict[f"makler_{row.from_makler_id}"] = row.count
-        
-        # Gruppen-Chats: Ungelesene Nachrichten
-        gruppen_conv_ids = [conv['contact_id'] for key, conv in conversations.items() if conv['contact_type'] == 'gruppe']
-        if gruppen_conv_ids:
-            unread_gruppen = db.query(
-                ChatMessage.chat_gruppe_id,
-                func.count(ChatMessage.id).label('count')
-            ).filter(
-                ChatMessage.chat_gruppe_id.in_(gruppen_conv_ids),
-                ChatMessage.from_user_id != current_user.id,  # Nur Nachrichten von anderen
-                ChatMessage.gelesen == False
-            ).group_by(ChatMessage.chat_gruppe_id).all()
-            
-            for row in unread_gruppen:
-                unread_counts_dict[f"gruppe_{row.chat_gruppe_id}"] = row.count
-    
-    # Lade Details für jede Konversation (ohne separate Queries!)
-    result = []
-    for key, conv in conversations.items():
-        # Nutze bereits geladene Daten
-        last_msg = last_messages_dict.get(key)
-        unread_count = unread_counts_dict.get(key, 0)
-        
-        if conv['contact_type'] == 'user':
-            contact = users_dict.get(conv['contact_id'])
-            contact_name = contact.username if contact else f"User {conv['contact_id']}"
-        elif conv['contact_type'] == 'makler':
-            contact = makler_dict.get(conv['contact_id'])
-            contact_name = contact.firmenname if contact else f"Makler {conv['contact_id']}"
-        else:  # gruppe
-            gruppe = gruppen_dict.get(conv['contact_id'])
-            contact_name = gruppe.name if gruppe else f"Gruppe {conv['contact_id']}"
-        
-        result.append({
-            "contact_id": conv['contact_id'],
-            "contact_type": conv['contact_type'],
-            "contact_name": contact_name,
-            "last_message": last_msg.nachricht if last_msg else None,
-            "last_message_time": last_msg.erstellt_am if last_msg else None,
-            "unread_count": unread_count,
-            "is_gruppe": conv['contact_type'] == 'gruppe'
-        })
-    
-    # Sortiere nach letzter Nachricht (neueste zuerst)
-    result.sort(key=lambda x: x['last_message_time'] or datetime.min, reverse=True)
-    
-    return result
+    # Vorberechnete Postfach-Zeilen (chat_konversationen), eine Abfrage unabhängig von der Nachrichtenmenge
+    return lade_postfach(db, current_user)
+
+
+def _chat_push_empfaenger(token: str):
+    """Prüft das Token wie get_current_active_user (eigene Session nur für die Prüfung)"""
+    db = SessionLocal()
+    try:
+        user = get_current_user(token, db)
+        return (EMPFAENGER_USER, user.id) if user.is_active else None
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+@router.websocket("/chat/ws")
+async def chat_push(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Echtzeit-Kanal für den Chat (ersetzt das Polling von Postfach und Badge).
+    Authentifizierung mit dem Access-Token als Query-Parameter (?token=...).
+    
+    Ereignisse (JSON, Feld "typ"):
+    - nachricht: neue Nachricht ("nachricht") mit der Postfach-Zeile ("konversation")
+    - gelesen: eigene Nachrichten wurden gelesen ("nachricht_ids")
+    - ungelesen: neuer Gesamtzähler ungelesener Nachrichten ("gesamt")
+    - neu_laden: Ereignisse gingen verloren, Stand per REST neu laden
+    - ping: Lebenszeichen
+    Bei abgelaufenem Token wird die Verbindung mit Code 1008 geschlossen.
+    """
+    empfaenger = await run_in_threadpool(_chat_push_empfaenger, token) if token else None
+    if empfaenger is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await bediene_chat_websocket(websocket, empfaenger, token_ablauf(token))
+
+
+@router.get("/chat/push-metriken")
+def chat_push_metriken(
+    current_user: User = Depends(require_admin)
+):
+    """
+    Gibt die offenen Chat-Verbindungen und zugestellten Ereignisse dieses Prozesses zurück.
+    """
+    return get_push_metriken()
 
 
 @router.get("/chat/conversations/{contact_type}/{contact_id}", response_model=List[schemas.ChatMessageRead])
@@ -974,10 +729,7 @@ def get_conversation_messages(
                 )
         
         # OPTIMIERUNG: Limit und Pagination für bessere Performance
-        query = db.query(ChatMessage).options(
-            joinedload(ChatMessage.from_user),
-            joinedload(ChatMessage.to_user)
-        ).filter(
+        query = db.query(ChatMessage).filter(
             or_(
                 and_(ChatMessage.from_user_id == current_user.id, ChatMessage.to_user_id == contact_id),
                 and_(ChatMessage.from_user_id == contact_id, ChatMessage.to_user_id == current_user.id)
@@ -995,6 +747,7 @@ def get_conversation_messages(
         unread_ids = [m.id for m in messages if not m.gelesen and m.from_user_id == contact_id]
         if unread_ids:
             db.query(ChatMessage).filter(ChatMessage.id.in_(unread_ids)).update({ChatMessage.gelesen: True}, synchronize_session=False)
+            aktualisiere_ungelesen_fuer_nachrichten(db, [m for m in messages if m.id in unread_ids])
             db.commit()
     elif contact_type == "makler":
         # Nur Manager und Admin können Makler-Konversationen sehen
@@ -1005,12 +758,7 @@ def get_conversation_messages(
             )
         
         # OPTIMIERUNG: Limit und Pagination für bessere Performance
-        query = db.query(ChatMessage).options(
-            joinedload(ChatMessage.from_user),
-            joinedload(ChatMessage.to_user),
-            joinedload(ChatMessage.from_makler),
-            joinedload(ChatMessage.to_makler)
-        ).filter(
+        query = db.query(ChatMessage).filter(
             or_(
                 and_(ChatMessage.from_user_id == current_user.id, ChatMessage.to_makler_id == contact_id),
                 and_(
@@ -1034,6 +782,7 @@ def get_conversation_messages(
         unread_ids = [m.id for m in messages if not m.gelesen and m.from_makler_id == contact_id]
         if unread_ids:
             db.query(ChatMessage).filter(ChatMessage.id.in_(unread_ids)).update({ChatMessage.gelesen: True}, synchronize_session=False)
+            aktualisiere_ungelesen_fuer_nachrichten(db, [m for m in messages if m.id in unread_ids])
             db.commit()
     elif contact_type == "gruppe":
         # Prüfe ob Benutzer Teilnehmer der Gruppe ist
@@ -1052,10 +801,7 @@ def get_conversation_messages(
             )
         
         # OPTIMIERUNG: Limit und Pagination für bessere Performance
-        query = db.query(ChatMessage).options(
-            joinedload(ChatMessage.from_user),
-            joinedload(ChatMessage.chat_gruppe)
-        ).filter(
+        query = db.query(ChatMessage).filter(
             ChatMessage.chat_gruppe_id == contact_id
         )
         
@@ -1070,6 +816,7 @@ def get_conversation_messages(
         unread_ids = [m.id for m in messages if not m.gelesen and m.from_user_id != current_user.id]
         if unread_ids:
             db.query(ChatMessage).filter(ChatMessage.id.in_(unread_ids)).update({ChatMessage.gelesen: True}, synchronize_session=False)
+            aktualisiere_ungelesen_fuer_nachrichten(db, [m for m in messages if m.id in unread_ids])
             db.commit()
     else:
         raise HTTPException(
@@ -1077,80 +824,8 @@ def get_conversation_messages(
             detail="contact_type muss 'user', 'makler' oder 'gruppe' sein"
         )
     
-    return [load_chat_message_details(msg) for msg in messages]
-
-
-def load_chat_message_details(message: ChatMessage, db: Session = None):
-    """Hilfsfunktion zum Laden der Details einer Nachricht (optimiert mit Eager Loading)"""
-    from_user_username = None
-    from_makler_firmenname = None
-    to_user_username = None
-    to_makler_firmenname = None
-    
-    # Wenn ein User an einen Makler schreibt, wird es als "LeadGate" angezeigt
-    if message.from_user_id and message.to_makler_id:
-        from_user_username = "LeadGate"
-    elif message.from_user_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'from_user') and message.from_user:
-            from_user_username = message.from_user.username
-        elif db:
-            user = db.query(User).filter(User.id == message.from_user_id).first()
-            from_user_username = user.username if user else None
-    
-    if message.from_makler_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'from_makler') and message.from_makler:
-            from_makler_firmenname = message.from_makler.firmenname
-        elif db:
-            makler = db.query(Makler).filter(Makler.id == message.from_makler_id).first()
-            from_makler_firmenname = makler.firmenname if makler else None
-    
-    if message.to_user_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'to_user') and message.to_user:
-            to_user_username = message.to_user.username
-        elif db:
-            user = db.query(User).filter(User.id == message.to_user_id).first()
-            to_user_username = user.username if user else None
-    
-    if message.to_makler_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'to_makler') and message.to_makler:
-            to_makler_firmenname = message.to_makler.firmenname
-        elif db:
-            makler = db.query(Makler).filter(Makler.id == message.to_makler_id).first()
-            to_makler_firmenname = makler.firmenname if makler else None
-    
-    # Lade Chat-Gruppen-Name falls vorhanden
-    if message.chat_gruppe_id:
-        if hasattr(message, 'chat_gruppe') and message.chat_gruppe:
-            chat_gruppe_name = message.chat_gruppe.name
-        elif db:
-            from ..models import ChatGruppe
-            gruppe = db.query(ChatGruppe).filter(ChatGruppe.id == message.chat_gruppe_id).first()
-            chat_gruppe_name = gruppe.name if gruppe else None
-        else:
-            chat_gruppe_name = None
-    else:
-        chat_gruppe_name = None
-    
-    return schemas.ChatMessageRead(
-        id=message.id,
-        from_user_id=message.from_user_id,
-        from_makler_id=message.from_makler_id,
-        to_user_id=message.to_user_id,
-        to_makler_id=message.to_makler_id,
-        chat_gruppe_id=message.chat_gruppe_id,
-        nachricht=message.nachricht,
-        erstellt_am=message.erstellt_am,
-        gelesen=message.gelesen,
-        from_user_username=from_user_username,
-        from_makler_firmenname=from_makler_firmenname,
-        to_user_username=to_user_username,
-        to_makler_firmenname=to_makler_firmenname,
-        chat_gruppe_name=chat_gruppe_name
-    )
+    # Namen aller Nachrichten gebündelt laden (eine Abfrage pro Entitätstyp)
+    return serialisiere_chat_nachrichten(db, messages)
 
 
 @router.get("/chat/gruppen/{gruppe_id}/teilnehmer")
@@ -1180,21 +855,8 @@ def get_gruppen_teilnehmer(
         )
     
     # Lade alle Teilnehmer der Gruppe
-    teilnehmer = db.query(ChatGruppeTeilnehmer).options(
-        joinedload(ChatGruppeTeilnehmer.user)
-    ).filter(
-        ChatGruppeTeilnehmer.chat_gruppe_id == gruppe_id
-    ).all()
-    
     return {
         "gruppe_id": gruppe_id,
-        "teilnehmer": [
-            {
-                "id": t.user.id,
-                "username": t.user.username,
-                "email": t.user.email
-            }
-            for t in teilnehmer
-        ]
+        "teilnehmer": lade_gruppen_teilnehmer(db, gruppe_id)
     }
 
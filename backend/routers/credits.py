@@ -1,6 +1,5 @@
 from typing import List, Optional
 from datetime import datetime
-from sqlalchemy import func
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
@@ -10,23 +9,13 @@ from ..database import get_db
 from ..models import Makler, MaklerCredits, User, CreditsRueckzahlungAnfrage, ChatMessage
 from ..models.user import UserRole
 from ..services.auth_service import get_current_active_user, require_admin_or_manager
+from ..services.chat_konversation_service import trage_chat_nachrichten_ein
+from ..services.credits_service import berechne_credits_stand, buche_credits_transaktion
 
 
 router = APIRouter()
 
 
-def berechne_credits_stand(db: Session, makler_id: int) -> float:
-    """
-    Berechnet den aktuellen Credits-Stand eines Maklers.
-    Summiert alle Transaktionen (positive = Aufladung, negative = Abbuchung).
-    """
-    result = db.query(func.sum(MaklerCredits.betrag)).filter(
-        MaklerCredits.makler_id == makler_id
-    ).scalar()
-    
-    return float(result) if result is not None else 0.0
-
-
 @router.get("/makler/{makler_id}/credits/stand", response_model=schemas.MaklerCreditsStand)
 def get_credits_stand(
     makler_id: int,
@@ -128,7 +117,7 @@ def credits_aufladen(
         erstellt_von_user_id=current_user.id
     )
     
-    db.add(transaktion)
+    buche_credits_transaktion(db, transaktion)
     db.commit()
     db.refresh(transaktion)
     
@@ -168,7 +157,7 @@ def credits_manuelle_anpassung(
         erstellt_von_user_id=current_user.id
     )
     
-    db.add(transaktion)
+    buche_credits_transaktion(db, transaktion)
     db.commit()
     db.refresh(transaktion)
     
@@ -309,6 +298,7 @@ def bearbeite_rueckzahlung_anfrage(
         gelesen=False
     )
     db.add(chat_message)
+    trage_chat_nachrichten_ein(db, [chat_message])
     db.commit()
     
     # Lade zusätzliche Informationen
@@ -455,6 +445,7 @@ def fuehre_rueckzahlung_durch(
             gelesen=False
         )
         db.add(chat_message)
+        trage_chat_nachrichten_ein(db, [chat_message])
         db.commit()
         
     except ValueError as e:
@@ -1,17 +1,30 @@
 from datetime import timedelta
 from typing import List, Union, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Query, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc, nulls_last, extract
+from sqlalchemy.orm import Session
+from sqlalchemy import extract
 from jose import JWTError, jwt
 
 from .. import schemas
-from ..database import get_db
+from ..database import SessionLocal, get_db
 from ..models.makler import Makler
 from ..models.user import User, UserRole
 from ..models.lead import Lead
 from ..models.chat import ChatMessage
+from ..services.chat_konversation_service import (
+    aktualisiere_ungelesen_fuer_nachrichten,
+    melde_gelesene_nachrichten,
+    trage_chat_nachrichten_ein
+)
+from ..services.chat_serialisierung_service import serialisiere_chat_nachricht, serialisiere_chat_nachrichten
+from ..services.chat_push_service import EMPFAENGER_MAKLER, EMPFAENGER_USER, bediene_chat_websocket, token_ablauf
+from ..services.zeitraum_service import im_jahr, im_monat
+from ..services.monats_rollup_service import aktualisiere_rollup_fuer_lead, lead_rollup_schluessel
+from ..services.pagination_service import filtere_nach_cursor, schneide_seite_ab, sortiere_keyset
+from ..services.tagesplan_service import aktualisiere_tagesplan_fuer_lead, lead_tagesplan_schluessel
+from ..services.telefonist_cache_service import markiere_telefonist_cache_veraltet
 from ..services.auth_service import (
     create_access_token,
     authenticate_user,
@@ -226,8 +239,11 @@ def get_gatelink_user_info(current_user: Union[User, Makler] = Depends(get_curre
 
 @router.get("/leads", response_model=List[schemas.LeadRead])
 def get_gatelink_leads(
+    response: Response,
     jahr: Optional[int] = None,
     monat: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximale Anzahl zurückzugebender Leads (ohne Angabe: alle)"),
+    cursor: Optional[str] = Query(None, description="Cursor aus dem Header X-Next-Cursor der vorherigen Seite"),
     current_user: Union[User, Makler] = Depends(get_current_gatelink_user),
     db: Session = Depends(get_db)
 ):
@@ -239,6 +255,9 @@ def get_gatelink_leads(
     Filter:
     - jahr: Filter nach Jahr (basierend auf qualifiziert_am)
     - monat: Filter nach Monat (1-12, basierend auf qualifiziert_am)
+    
+    Pagination: Mit limit wird seitenweise geliefert, der Cursor der nächsten Seite
+    steht im Response-Header X-Next-Cursor.
     """
     # Basis-Filter: Qualifizierte ODER flexrecall-Leads mit zugewiesenem Makler
     from sqlalchemy import or_
@@ -247,31 +266,39 @@ def get_gatelink_leads(
         Lead.makler_id.isnot(None)
     )
     
-    # Jahr-Filter (basierend auf qualifiziert_am)
-    if jahr is not None:
-        query = query.filter(extract('year', Lead.qualifiziert_am) == jahr)
+    if monat is not None and (monat < 1 or monat > 12):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Monat muss zwischen 1 und 12 liegen"
+        )
     
-    # Monat-Filter (basierend auf qualifiziert_am)
-    if monat is not None:
-        if monat < 1 or monat > 12:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Monat muss zwischen 1 und 12 liegen"
-            )
+    # Jahr-/Monat-Filter (basierend auf qualifiziert_am) als Datumsbereich, damit der Index greift
+    if jahr is not None and monat is not None:
+        query = query.filter(im_monat(Lead.qualifiziert_am, monat, jahr))
+    elif jahr is not None:
+        query = query.filter(im_jahr(Lead.qualifiziert_am, jahr))
+    elif monat is not None:
+        # Monat ohne Jahr (über alle Jahre) lässt sich nicht als ein Bereich ausdrücken
         query = query.filter(extract('month', Lead.qualifiziert_am) == monat)
     
-    if isinstance(current_user, User):
-        # Admin/Manager sehen alle qualifizierten Leads mit Makler-Zuordnung
-        # Sortiert nach Qualifizierungsdatum (neueste zuerst)
-        leads = query.order_by(nulls_last(desc(Lead.qualifiziert_am))).all()
-    else:
+    if not isinstance(current_user, User):
         # Makler sehen nur ihre eigenen qualifizierten Leads
-        # Sortiert nach Qualifizierungsdatum (neueste zuerst)
-        leads = query.filter(Lead.makler_id == current_user.id).order_by(nulls_last(desc(Lead.qualifiziert_am))).all()
+        # (Admin/Manager sehen alle qualifizierten Leads mit Makler-Zuordnung)
+        query = query.filter(Lead.makler_id == current_user.id)
+    
+    try:
+        query = filtere_nach_cursor(query, cursor, Lead.qualifiziert_am, Lead.id, nullable=True)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    # Sortiert nach Qualifizierungsdatum (neueste zuerst), ID als eindeutiger Tie-Breaker
+    query = sortiere_keyset(query, Lead.qualifiziert_am, Lead.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    leads = schneide_seite_ab(query.all(), limit, response, "qualifiziert_am")
     
     # Lade Lead-Details mit qualifiziert_von_username
-    from .leads import load_lead_details
-    return [load_lead_details(lead, db) for lead in leads]
+    from .leads import load_lead_details_batch
+    return load_lead_details_batch(leads, db)
 
 
 @router.put("/leads/{lead_id}", response_model=schemas.LeadRead)
@@ -292,6 +319,8 @@ def update_gatelink_lead(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Lead nicht gefunden"
         )
+    alter_rollup_schluessel = lead_rollup_schluessel(lead)
+    alter_tagesplan_schluessel = lead_tagesplan_schluessel(lead)
     
     # Prüfe ob Makler nur seinen eigenen Lead aktualisiert
     if isinstance(current_user, Makler):
@@ -364,6 +393,9 @@ def update_gatelink_lead(
         setattr(lead, key, value)
         print(f"DEBUG: Setze {key} = {value} (Typ: {type(value)})")
     
+    aktualisiere_rollup_fuer_lead(db, lead, alter_rollup_schluessel)
+    aktualisiere_tagesplan_fuer_lead(db, lead, alter_tagesplan_schluessel)
+    markiere_telefonist_cache_veraltet(db)
     db.commit()
     db.refresh(lead)
     print(f"DEBUG: Nach Commit - Status: {lead.status}, termin_vereinbart = {lead.termin_vereinbart}, absage = {lead.absage}, maklervertrag_unterschrieben = {lead.maklervertrag_unterschrieben}, immobilie_verkauft = {lead.immobilie_verkauft}")
@@ -408,10 +440,15 @@ def reklamiere_lead(
             )
     
     # Setze Status auf reklamiert und entferne qualifiziert_von_user_id
+    alter_rollup_schluessel = lead_rollup_schluessel(lead)
+    alter_tagesplan_schluessel = lead_tagesplan_schluessel(lead)
     lead.status = "reklamiert"
     lead.qualifiziert_von_user_id = None
     lead.qualifiziert_am = None
     
+    aktualisiere_rollup_fuer_lead(db, lead, alter_rollup_schluessel)
+    aktualisiere_tagesplan_fuer_lead(db, lead, alter_tagesplan_schluessel)
+    markiere_telefonist_cache_veraltet(db)
     db.commit()
     db.refresh(lead)
     from .leads import load_lead_details
@@ -460,10 +497,11 @@ def send_chat_message(
         )
     
     db.add(message)
+    trage_chat_nachrichten_ein(db, [message])
     db.commit()
     db.refresh(message)
     
-    return load_gatelink_message_details(message, db)
+    return serialisiere_chat_nachricht(db, message, leadgate_als_absender=False)
 
 
 @router.get("/credits/preis-pro-lead")
@@ -702,6 +740,7 @@ def erstelle_rueckzahlung_anfrage(
         f"{data.beschreibung or 'Keine zusätzliche Beschreibung'}"
     )
     
+    chat_messages = []
     for user in leadgate_users:
         chat_message = ChatMessage(
             from_makler_id=makler.id,
@@ -710,6 +749,8 @@ def erstelle_rueckzahlung_anfrage(
             gelesen=False
         )
         db.add(chat_message)
+        chat_messages.append(chat_message)
+    trage_chat_nachrichten_ein(db, chat_messages)
     
     db.commit()
     
@@ -819,28 +860,62 @@ def create_gatelink_stripe_payment_intent(
 
 @router.get("/chat", response_model=List[schemas.ChatMessageRead])
 def get_chat_messages(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximale Anzahl zurückzugebender Nachrichten (ohne Angabe: alle)"),
+    cursor: Optional[str] = Query(None, description="Cursor aus dem Header X-Next-Cursor der vorherigen Seite"),
+    after_id: Optional[int] = Query(None, description="Nur Nachrichten nach dieser ID (inkrementelles Nachladen)"),
+    before_id: Optional[int] = Query(None, description="Nur Nachrichten vor dieser ID, mit limit die neuesten davon (ältere Nachrichten nachladen)"),
+    makler_id: Optional[int] = Query(None, description="Nur die Konversation mit diesem Makler (für Manager/Admin)"),
     current_user: Union[User, Makler] = Depends(get_current_gatelink_user),
     db: Session = Depends(get_db)
 ):
     """
-    Ruft Chat-Nachrichten ab.
+    Ruft Chat-Nachrichten ab (chronologisch aufsteigend).
     - Makler sehen nur ihre Konversation mit LeadGate
-    - Nur Manager und Admin sehen Konversationen mit Maklern
+    - Nur Manager und Admin sehen Konversationen mit Maklern (mit makler_id nur die eines Maklers)
     - Telefonisten/Buchhalter sehen keine Makler-Konversationen
+    
+    Mit limit wird seitenweise geliefert, der Cursor der nächsten Seite steht im Header X-Next-Cursor.
+    Zum Aktualisieren eines geöffneten Chats after_id (letzte bekannte Nachricht) angeben, dann
+    kostet der Abruf nur so viel wie die neuen Nachrichten; before_id lädt ältere Nachrichten nach.
+    Als gelesen markiert werden nur die ausgelieferten Nachrichten.
     """
+    if before_id is not None and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="before_id und cursor können nicht kombiniert werden"
+        )
+    
+    def lade_seite(query):
+        if after_id is not None:
+            query = query.filter(ChatMessage.id > after_id)
+        if before_id is not None:
+            # Die neuesten limit Nachrichten vor before_id, aufsteigend zurückgegeben
+            query = sortiere_keyset(query.filter(ChatMessage.id < before_id), ChatMessage.erstellt_am, ChatMessage.id, absteigend=True)
+            if limit is not None:
+                query = query.limit(limit)
+            return list(reversed(query.all()))
+        try:
+            query = filtere_nach_cursor(query, cursor, ChatMessage.erstellt_am, ChatMessage.id, absteigend=False)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        query = sortiere_keyset(query, ChatMessage.erstellt_am, ChatMessage.id, absteigend=False)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        return schneide_seite_ab(query.all(), limit, response, "erstellt_am")
+    
     if isinstance(current_user, User):
         # Prüfe Berechtigung: Nur Manager und Admin können Makler-Nachrichten sehen
         if current_user.role in [UserRole.MANAGER, UserRole.ADMIN]:
             # User (Manager/Admin): Alle Nachrichten mit Maklern
-            messages = db.query(ChatMessage).options(
-                joinedload(ChatMessage.from_user),
-                joinedload(ChatMessage.to_user),
-                joinedload(ChatMessage.from_makler),
-                joinedload(ChatMessage.to_makler)
-            ).filter(
+            query = db.query(ChatMessage).filter(
                 ((ChatMessage.from_user_id == current_user.id) & (ChatMessage.to_makler_id.isnot(None))) |
                 ((ChatMessage.to_user_id == current_user.id) & (ChatMessage.from_makler_id.isnot(None)))
-            ).order_by(ChatMessage.erstellt_am.asc()).all()
+            )
+            if makler_id is not None:
+                # Konversation mit einem Makler
+                query = query.filter((ChatMessage.to_makler_id == makler_id) | (ChatMessage.from_makler_id == makler_id))
+            messages = lade_seite(query)
         else:
             # Telefonisten/Buchhalter: Keine Makler-Nachrichten
             messages = []
@@ -849,79 +924,50 @@ def get_chat_messages(
         unread_ids = [m.id for m in messages if not m.gelesen and m.from_makler_id is not None]
         if unread_ids:
             db.query(ChatMessage).filter(ChatMessage.id.in_(unread_ids)).update({ChatMessage.gelesen: True}, synchronize_session=False)
+            aktualisiere_ungelesen_fuer_nachrichten(db, [m for m in messages if m.id in unread_ids])
             db.commit()
     else:
         # Makler: Nur Nachrichten mit LeadGate (wo from_makler_id == current_user.id oder to_makler_id == current_user.id)
-        messages = db.query(ChatMessage).options(
-            joinedload(ChatMessage.from_user),
-            joinedload(ChatMessage.to_user),
-            joinedload(ChatMessage.from_makler),
-            joinedload(ChatMessage.to_makler)
-        ).filter(
+        messages = lade_seite(db.query(ChatMessage).filter(
             (ChatMessage.from_makler_id == current_user.id) |
             (ChatMessage.to_makler_id == current_user.id)
-        ).order_by(ChatMessage.erstellt_am.asc()).all()
+        ))
         
         # Markiere Nachrichten als gelesen (bulk update für bessere Performance)
         unread_ids = [m.id for m in messages if not m.gelesen and m.from_user_id is not None]
         if unread_ids:
             db.query(ChatMessage).filter(ChatMessage.id.in_(unread_ids)).update({ChatMessage.gelesen: True}, synchronize_session=False)
+            melde_gelesene_nachrichten(db, [m for m in messages if m.id in unread_ids])
             db.commit()
     
-    return [load_gatelink_message_details(msg) for msg in messages]
-
-
-def load_gatelink_message_details(message: ChatMessage, db: Session = None):
-    """Hilfsfunktion zum Laden der Details einer Nachricht für GateLink (optimiert mit Eager Loading)"""
-    from_user_username = None
-    from_makler_firmenname = None
-    to_user_username = None
-    to_makler_firmenname = None
-    
-    if message.from_user_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'from_user') and message.from_user:
-            from_user_username = message.from_user.username
-        elif db:
-            user = db.query(User).filter(User.id == message.from_user_id).first()
-            from_user_username = user.username if user else None
-    
-    if message.from_makler_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'from_makler') and message.from_makler:
-            from_makler_firmenname = message.from_makler.firmenname
-        elif db:
-            makler = db.query(Makler).filter(Makler.id == message.from_makler_id).first()
-            from_makler_firmenname = makler.firmenname if makler else None
-    
-    if message.to_user_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'to_user') and message.to_user:
-            to_user_username = message.to_user.username
-        elif db:
-            user = db.query(User).filter(User.id == message.to_user_id).first()
-            to_user_username = user.username if user else None
-    
-    if message.to_makler_id:
-        # Nutze bereits geladene Relationship falls vorhanden
-        if hasattr(message, 'to_makler') and message.to_makler:
-            to_makler_firmenname = message.to_makler.firmenname
-        elif db:
-            makler = db.query(Makler).filter(Makler.id == message.to_makler_id).first()
-            to_makler_firmenname = makler.firmenname if makler else None
-    
-    return {
-        "id": message.id,
-        "from_user_id": message.from_user_id,
-        "from_makler_id": message.from_makler_id,
-        "to_user_id": message.to_user_id,
-        "to_makler_id": message.to_makler_id,
-        "nachricht": message.nachricht,
-        "erstellt_am": message.erstellt_am,
-        "gelesen": message.gelesen,
-        "from_user_username": from_user_username,
-        "from_makler_firmenname": from_makler_firmenname,
-        "to_user_username": to_user_username,
-        "to_makler_firmenname": to_makler_firmenname
-    }
+    # Namen aller Nachrichten gebündelt laden (eine Abfrage pro Entitätstyp)
+    return serialisiere_chat_nachrichten(db, messages, leadgate_als_absender=False)
 
+
+def _chat_push_empfaenger(token: str):
+    """Prüft das Token wie get_current_gatelink_user (eigene Session nur für die Prüfung)"""
+    db = SessionLocal()
+    try:
+        current_user = get_current_gatelink_user(token, db)
+        if isinstance(current_user, User):
+            return (EMPFAENGER_USER, current_user.id)
+        return (EMPFAENGER_MAKLER, current_user.id)
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+@router.websocket("/chat/ws")
+async def chat_push(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Echtzeit-Kanal für den GateLink-Chat (ersetzt das Polling von /chat).
+    Authentifizierung mit dem GateLink-Token als Query-Parameter (?token=...).
+    Ereignisse wie bei /api/auth/chat/ws: nachricht, gelesen, ungelesen, neu_laden, ping.
+    """
+    empfaenger = await run_in_threadpool(_chat_push_empfaenger, token) if token else None
+    if empfaenger is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    await bediene_chat_websocket(websocket, empfaenger, token_ablauf(token))
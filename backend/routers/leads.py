@@ -1,9 +1,8 @@
-from typing import List
-from datetime import datetime
+from typing import List, Optional
+from datetime import date, datetime
 from sqlalchemy import func
-import random
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -12,87 +11,112 @@ from ..database import get_db
 from ..models import Lead, Makler, User
 from ..models.user import UserRole
 from ..services.auth_service import get_current_active_user, require_admin_or_manager, require_manager_or_telefonist
+from ..services.gebiet_index_service import finde_makler_ids_fuer_plz
+from ..services.lead_nummer_service import naechste_lead_nummer, reserviere_lead_nummern
+from ..services.lead_suche_service import suche_leads
+from ..services.monats_rollup_service import aktualisiere_rollup, aktualisiere_rollup_fuer_lead, lead_rollup_schluessel
+from ..services.pagination_service import filtere_nach_cursor, schneide_seite_ab, sortiere_keyset
+from ..services.tagesplan_service import aktualisiere_tagesplan_fuer_lead, lead_tagesplan_schluessel, verwerfe_tagesplan
+from ..services.telefonist_cache_service import markiere_telefonist_cache_veraltet
+from ..services.duplikat_service import (
+    DUPLIKAT_MODI,
+    DUPLIKAT_MODUS_FLAG,
+    DUPLIKAT_MODUS_MERGE,
+    DUPLIKAT_MODUS_SKIP,
+    berechne_fingerprint,
+    finde_duplikat,
+    finde_duplikat_gruppen,
+    fingerprint_fuer_lead,
+    fuehre_lead_zusammen
+)
 
 router = APIRouter()
 
 
 def generate_unique_lead_nummer(db: Session) -> int:
     """
-    Generiert eine eindeutige, zufällige Lead-Nummer.
-    Die Nummer liegt zwischen 10000 und 99999 (5-stellig).
-    Prüft, ob die Nummer bereits existiert und generiert bei Bedarf eine neue.
+    Vergibt eine eindeutige Lead-Nummer über den Lead-Nummern-Service.
+    Die Nummern werden blockweise reserviert, es wird keine Lead-Tabelle mehr durchsucht.
     """
-    max_attempts = 1000  # Maximal 1000 Versuche, um eine eindeutige Nummer zu finden
-    existing_numbers = set(db.query(Lead.lead_nummer).filter(Lead.lead_nummer.isnot(None)).all())
-    existing_numbers = {num[0] for num in existing_numbers}  # Konvertiere zu Set von Integers
-    
-    for _ in range(max_attempts):
-        # Generiere zufällige 5-stellige Nummer zwischen 10000 und 99999
-        nummer = random.randint(10000, 99999)
-        if nummer not in existing_numbers:
-            return nummer
-    
-    # Falls nach 1000 Versuchen keine eindeutige Nummer gefunden wurde (extrem unwahrscheinlich),
-    # verwende einen größeren Bereich
-    for _ in range(max_attempts):
-        nummer = random.randint(100000, 999999)  # 6-stellig
-        if nummer not in existing_numbers:
-            return nummer
-    
-    # Letzter Fallback: Verwende Timestamp-basierte Nummer
-    import time
-    nummer = int(time.time() * 100) % 1000000  # Timestamp-basiert, aber 6-stellig
-    while nummer in existing_numbers:
-        nummer = (nummer + 1) % 1000000
-    return nummer
+    return naechste_lead_nummer()
 
 
 def find_makler_by_postleitzahl(db: Session, postleitzahl: str) -> List[int]:
     """
     Findet alle Makler, die für die gegebene Postleitzahl zuständig sind.
-    Gibt eine Liste von Makler-IDs zurück.
+    Gibt eine Liste von Makler-IDs zurück (nutzt den Gebiets-Index).
+    """
+    return finde_makler_ids_fuer_plz(db, postleitzahl)
+
+
+def load_lead_details_batch(leads: List[Lead], db: Session) -> List[dict]:
     """
-    if not postleitzahl or not postleitzahl.strip():
+    Lädt die Details für eine ganze Liste von Leads mit einer festen Anzahl an Queries.
+    
+    Statt pro Lead User, Makler und PLZ-Zuständigkeiten einzeln nachzuladen, werden
+    alle benötigten User-Namen und Makler-Firmennamen für die Seite gesammelt geladen
+    (max. 2 Queries, unabhängig von der Anzahl der Leads). PLZ-Zuständigkeiten kommen
+    aus dem Gebiets-Index (höchstens eine Versionsabfrage pro Transaktion).
+    Abgesichert durch tests/test_lead_details_batch.py.
+    """
+    if not leads:
         return []
     
-    plz = postleitzahl.strip()
+    # Sammle alle benötigten IDs und Postleitzahlen der Seite
+    user_ids = set()
+    makler_ids = set()
+    postleitzahlen = set()
+    for lead in leads:
+        if lead.qualifiziert_von_user_id:
+            user_ids.add(lead.qualifiziert_von_user_id)
+        if lead.bearbeitet_von_user_id:
+            user_ids.add(lead.bearbeitet_von_user_id)
+        if lead.makler_id:
+            makler_ids.add(lead.makler_id)
+        if lead.postleitzahl and lead.postleitzahl.strip():
+            postleitzahlen.add(lead.postleitzahl.strip())
     
-    # Hole alle Makler mit Gebiet-Informationen
-    makler = db.query(Makler).filter(Makler.gebiet.isnot(None)).all()
+    # Query 1: Alle User-Namen in einem Batch
+    usernames = {}
+    if user_ids:
+        usernames = {
+            u.id: u.username
+            for u in db.query(User.id, User.username).filter(User.id.in_(list(user_ids))).all()
+        }
     
-    matching_makler_ids = []
+    # Query 2: Firmennamen der zugeordneten Makler
+    makler_firmennamen = {}
+    if makler_ids:
+        makler_firmennamen = {
+            m.id: m.firmenname
+            for m in db.query(Makler.id, Makler.firmenname).filter(Makler.id.in_(list(makler_ids))).all()
+        }
     
-    for m in makler:
-        if not m.gebiet:
-            continue
-        
-        # Parse Gebiet: Kommagetrennte Liste von PLZ (z.B. "10115, 10117, 10119")
-        gebiet_plz = [p.strip() for p in m.gebiet.split(',')]
-        
-        # Prüfe ob die PLZ des Leads in der Gebiet-Liste ist
-        if plz in gebiet_plz:
-            matching_makler_ids.append(m.id)
+    # PLZ-Zuständigkeiten aus dem Gebiets-Index (ohne Queries pro PLZ)
+    plz_zu_makler_ids = {plz: finde_makler_ids_fuer_plz(db, plz) for plz in postleitzahlen}
     
-    return matching_makler_ids
+    return [
+        _lead_to_dict(lead, usernames, makler_firmennamen, plz_zu_makler_ids)
+        for lead in leads
+    ]
 
 
 def load_lead_details(lead: Lead, db: Session):
     """Hilfsfunktion zum Laden der Details eines Leads mit qualifiziert_von_username"""
-    qualifiziert_von_username = None
-    if lead.qualifiziert_von_user_id:
-        user = db.query(User).filter(User.id == lead.qualifiziert_von_user_id).first()
-        qualifiziert_von_username = user.username if user else None
+    return load_lead_details_batch([lead], db)[0]
+
+
+def _lead_to_dict(lead: Lead, usernames: dict, makler_firmennamen: dict, plz_zu_makler_ids: dict) -> dict:
+    """Serialisiert einen Lead anhand bereits geladener User-, Makler- und PLZ-Daten (ohne Queries)"""
+    qualifiziert_von_username = usernames.get(lead.qualifiziert_von_user_id) if lead.qualifiziert_von_user_id else None
     
     # Lade auch bearbeitet_von_username für Locking-Info
-    bearbeitet_von_username = None
-    if lead.bearbeitet_von_user_id:
-        user = db.query(User).filter(User.id == lead.bearbeitet_von_user_id).first()
-        bearbeitet_von_username = user.username if user else None
+    bearbeitet_von_username = usernames.get(lead.bearbeitet_von_user_id) if lead.bearbeitet_von_user_id else None
     
     # Berechne moegliche_makler_ids dynamisch basierend auf aktuellen Makler-Gebieten
     moegliche_makler_ids_list = []
     if lead.postleitzahl:
-        moegliche_makler_ids_list = find_makler_by_postleitzahl(db, lead.postleitzahl)
+        moegliche_makler_ids_list = plz_zu_makler_ids.get(lead.postleitzahl.strip(), [])
     
     # Konvertiere zu kommagetrenntem String (wie in der Datenbank gespeichert)
     moegliche_makler_ids_str = ', '.join(map(str, moegliche_makler_ids_list)) if moegliche_makler_ids_list else None
@@ -151,14 +175,13 @@ def load_lead_details(lead: Lead, db: Session):
         "immobilie_verkauft_preis": lead.immobilie_verkauft_preis,
         "beteiligungs_prozent": lead.beteiligungs_prozent,
         "favorit": lead.favorit,
-        "makler_angesehen": lead.makler_angesehen
+        "makler_angesehen": lead.makler_angesehen,
+        "duplikat_von_lead_id": lead.duplikat_von_lead_id
     }
     
     # Füge Makler-Firmenname hinzu, falls vorhanden
-    if lead.makler_id:
-        makler = db.query(Makler).filter(Makler.id == lead.makler_id).first()
-        if makler:
-            lead_dict["makler_firmenname"] = makler.firmenname
+    if lead.makler_id and lead.makler_id in makler_firmennamen:
+        lead_dict["makler_firmenname"] = makler_firmennamen[lead.makler_id]
     
     return lead_dict
 
@@ -171,20 +194,96 @@ class BulkLeadCreate(BaseModel):
 
 @router.get("/", response_model=List[schemas.LeadRead])
 def list_leads(
-    skip: int = Query(0, ge=0, description="Anzahl zu überspringender Einträge"),
+    response: Response,
+    skip: int = Query(0, ge=0, description="Anzahl zu überspringender Einträge (nur ohne cursor)"),
     limit: int = Query(100, ge=1, le=1000, description="Maximale Anzahl zurückzugebender Einträge"),
+    cursor: Optional[str] = Query(None, description="Cursor aus dem Header X-Next-Cursor der vorherigen Seite"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
     Liefert alle Leads zurück (mit Pagination).
+    Für tiefe Seiten cursor statt skip verwenden: Der Cursor der nächsten Seite steht im
+    Response-Header X-Next-Cursor (fehlt der Header, ist dies die letzte Seite).
     """
-    leads = db.query(Lead).order_by(Lead.erstellt_am.desc()).offset(skip).limit(limit).all()
-    lead_dicts = [load_lead_details(lead, db) for lead in leads]
+    query = db.query(Lead)
+    try:
+        query = filtere_nach_cursor(query, cursor, Lead.erstellt_am, Lead.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    query = sortiere_keyset(query, Lead.erstellt_am, Lead.id)
+    if not cursor:
+        query = query.offset(skip)
+    # Einen Eintrag mehr laden, um zu erkennen, ob es eine nächste Seite gibt
+    leads = schneide_seite_ab(query.limit(limit + 1).all(), limit, response, "erstellt_am")
+    lead_dicts = load_lead_details_batch(leads, db)
     # Konvertiere Dictionaries explizit zu Pydantic-Modellen
     return [schemas.LeadRead(**lead_dict) for lead_dict in lead_dicts]
 
 
+@router.get("/suche", response_model=List[schemas.LeadRead])
+def search_leads(
+    response: Response,
+    q: Optional[str] = Query(None, description="Volltextsuche über Anbieter-Name, Ort und Beschreibung"),
+    status_filter: Optional[List[str]] = Query(None, alias="status", description="Lead-Status (mehrfach möglich)"),
+    makler_id: Optional[List[int]] = Query(None, description="Makler-IDs (mehrfach möglich)"),
+    qualifiziert_von_user_id: Optional[List[int]] = Query(None, description="Qualifiziert von User-IDs (mehrfach möglich)"),
+    postleitzahl: Optional[str] = Query(None, description="PLZ oder PLZ-Präfix"),
+    ort: Optional[str] = Query(None, description="Ort (Teilstring)"),
+    makler_status: Optional[str] = Query(None, description="Vom Makler gesetzter Status"),
+    datum_feld: str = Query("erstellt_am", description="Bezugsfeld für datum_von/datum_bis: erstellt_am oder qualifiziert_am"),
+    datum_von: Optional[date] = Query(None, description="Zeitraum ab (inklusive)"),
+    datum_bis: Optional[date] = Query(None, description="Zeitraum bis (inklusive)"),
+    sortierung: str = Query("erstellt_am", description="erstellt_am, qualifiziert_am, lead_nummer, postleitzahl, ort, anbieter_name oder relevanz"),
+    richtung: str = Query("desc", pattern="^(asc|desc)$", description="Sortierrichtung"),
+    skip: int = Query(0, ge=0, description="Anzahl zu überspringender Einträge"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximale Anzahl zurückzugebender Einträge"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Sucht und filtert Leads serverseitig (statt alle Leads zu laden und im Frontend zu filtern).
+    Die Gesamtanzahl der Treffer steht im Response-Header X-Total-Count.
+    """
+    try:
+        leads, gesamt = suche_leads(
+            db,
+            suchtext=q,
+            status=status_filter,
+            makler_ids=makler_id,
+            qualifiziert_von_user_ids=qualifiziert_von_user_id,
+            postleitzahl=postleitzahl,
+            ort=ort,
+            makler_status=makler_status,
+            datum_feld=datum_feld,
+            datum_von=datum_von,
+            datum_bis=datum_bis,
+            sortierung=sortierung,
+            absteigend=richtung == "desc",
+            skip=skip,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    response.headers["X-Total-Count"] = str(gesamt)
+    lead_dicts = load_lead_details_batch(leads, db)
+    return [schemas.LeadRead(**lead_dict) for lead_dict in lead_dicts]
+
+
+@router.get("/duplikate")
+def get_duplikate(
+    limit: int = Query(100, ge=1, le=1000, description="Maximale Anzahl zurückzugebender Duplikat-Gruppen"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin_or_manager)
+):
+    """
+    Findet Gruppen doppelter Leads (gleiche Telefonnummer, PLZ und Anbieter-Name).
+    Nutzt den Fingerprint-Index statt eines paarweisen Vergleichs (nur Admin oder Manager).
+    """
+    return finde_duplikat_gruppen(db, limit)
+
+
 @router.get("/{lead_id}", response_model=schemas.LeadRead)
 def get_lead(
     lead_id: int,
@@ -204,13 +303,25 @@ def get_lead(
 @router.post("/", response_model=schemas.LeadRead, status_code=status.HTTP_201_CREATED)
 def create_lead(
     data: schemas.LeadCreate,
+    duplikat_modus: str = Query(DUPLIKAT_MODUS_FLAG, description="Verhalten bei Duplikaten: skip, merge oder flag"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_manager_or_telefonist)
 ):
     """
     Erstellt einen neuen Lead (nur für Manager oder Telefonist).
     Buchhalter können keine Leads erstellen.
+    
+    Existiert bereits ein Lead mit gleicher Telefonnummer, PLZ und Anbieter-Name:
+    - skip: 409, es wird kein Lead angelegt
+    - merge: leere Felder des vorhandenen Leads werden ergänzt, dieser wird zurückgegeben
+    - flag (Standard): Lead wird angelegt und als Duplikat markiert
     """
+    if duplikat_modus not in DUPLIKAT_MODI:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ungültiger duplikat_modus. Erlaubt: {', '.join(DUPLIKAT_MODI)}",
+        )
+
     # Validierung: Makler muss existieren (falls angegeben)
     makler = None
     if data.makler_id:
@@ -221,7 +332,21 @@ def create_lead(
                 detail="Makler für diesen Lead existiert nicht",
             )
 
-    # Generiere eindeutige zufällige Lead-Nummer
+    # Duplikat-Prüfung über den Fingerprint-Index
+    fingerprint = berechne_fingerprint(data.telefonnummer, data.postleitzahl, data.anbieter_name)
+    duplikat_von_lead_id = finde_duplikat(db, fingerprint)
+    if duplikat_von_lead_id and duplikat_modus == DUPLIKAT_MODUS_SKIP:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Lead existiert bereits (Lead-ID {duplikat_von_lead_id})",
+        )
+    if duplikat_von_lead_id and duplikat_modus == DUPLIKAT_MODUS_MERGE:
+        fuehre_lead_zusammen(db, duplikat_von_lead_id, data.model_dump())
+        db.commit()
+        vorhandener_lead = db.query(Lead).filter(Lead.id == duplikat_von_lead_id).first()
+        return schemas.LeadRead(**load_lead_details(vorhandener_lead, db))
+
+    # Vergebe eindeutige Lead-Nummer
     lead_nummer = generate_unique_lead_nummer(db)
     
     lead = Lead(
@@ -241,7 +366,9 @@ def create_lead(
         immobilien_typ=data.immobilien_typ,
         baujahr=data.baujahr,
         lage=data.lage,
-        beschreibung=data.beschreibung
+        beschreibung=data.beschreibung,
+        fingerprint=fingerprint,
+        duplikat_von_lead_id=duplikat_von_lead_id
     )
     db.add(lead)
     db.commit()
@@ -269,19 +396,19 @@ def update_lead(
         )
 
     update_data = data.dict(exclude_unset=True)
+    # Monats-Rollup vor der Änderung merken (Status/Makler/qualifiziert_am können sich ändern)
+    alter_rollup_schluessel = lead_rollup_schluessel(lead)
+    alter_tagesplan_schluessel = lead_tagesplan_schluessel(lead)
     
-    # Locking-System: Prüfe ob Lead von einem anderen Telefonisten bearbeitet wird
+    # Locking-System: Lead atomar für diesen Telefonisten sperren (bedingtes UPDATE),
+    # schlägt fehl, wenn ein anderer Telefonist einen gültigen Lock hält
     if current_user.role == "telefonist" and lead.status == "unqualifiziert":
-        from ..services.lead_empfehlung_service import ist_lead_gesperrt
-        if ist_lead_gesperrt(lead, aktueller_user_id=current_user.id):
+        from ..services.lead_empfehlung_service import beanspruche_lead
+        if not beanspruche_lead(db, lead.id, current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Dieser Lead wird gerade von einem anderen Telefonisten bearbeitet"
             )
-        
-        # Setze Lock: Dieser Telefonist bearbeitet jetzt den Lead
-        lead.bearbeitet_von_user_id = current_user.id
-        lead.bearbeitet_seit = datetime.utcnow()
     
     # Makler-Zuordnung (Telefonisten, Manager, Admin)
     # Wird benötigt wenn Status auf flexrecall oder qualifiziert gesetzt wird
@@ -544,6 +671,20 @@ def update_lead(
                 detail="Nur Telefonisten, Manager und Admins können den Eigentümer ändern"
             )
         lead.anbieter_name = update_data["anbieter_name"]
+
+    # Telefonnummer/PLZ-Korrektur (Telefonisten, Manager, Admin)
+    for feld in ("telefonnummer", "postleitzahl"):
+        if feld in update_data:
+            if current_user.role not in [UserRole.TELEFONIST, UserRole.MANAGER, UserRole.ADMIN]:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Nur Telefonisten, Manager und Admins können Kontaktdaten ändern"
+                )
+            setattr(lead, feld, update_data[feld])
+
+    # Fingerprint folgt allen Feldern, aus denen er berechnet wird
+    if update_data.keys() & {"telefonnummer", "postleitzahl", "anbieter_name"}:
+        lead.fingerprint = fingerprint_fuer_lead(lead)
     
     # Preis-Update (Telefonisten, Manager, Admin)
     if "preis" in update_data:
@@ -581,6 +722,10 @@ def update_lead(
             )
         lead.kontakt_zeitraum = update_data["kontakt_zeitraum"]
 
+    aktualisiere_rollup_fuer_lead(db, lead, alter_rollup_schluessel)
+    aktualisiere_tagesplan_fuer_lead(db, lead, alter_tagesplan_schluessel)
+    # Status/Lock/Makler geändert: Telefonisten-Dashboard und Lead-Empfehlung neu berechnen
+    markiere_telefonist_cache_veraltet(db)
     db.commit()
     db.refresh(lead)
     return load_lead_details(lead, db)
@@ -601,7 +746,13 @@ def delete_lead(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Lead nicht gefunden"
         )
+    rollup_schluessel = lead_rollup_schluessel(lead)
+    tagesplan_schluessel = lead_tagesplan_schluessel(lead)
     db.delete(lead)
+    aktualisiere_rollup(db, [rollup_schluessel])
+    if tagesplan_schluessel is not None:
+        verwerfe_tagesplan(db, [tagesplan_schluessel[0]])
+    markiere_telefonist_cache_veraltet(db)
     db.commit()
     return None
 
@@ -623,9 +774,11 @@ def create_bulk_leads(
             detail="Makler für diese Leads existiert nicht",
         )
     
+    # Alle Lead-Nummern in einem Block reservieren
+    lead_nummern = reserviere_lead_nummern(data.anzahl)
+    
     leads = []
-    for _ in range(data.anzahl):
-        lead_nummer = generate_unique_lead_nummer(db)
+    for lead_nummer in lead_nummern:
         lead = Lead(
             lead_nummer=lead_nummer,
             makler_id=data.makler_id,
@@ -641,14 +794,13 @@ def create_bulk_leads(
             beschreibung=None
         )
         db.add(lead)
-        db.flush()  # Flush um sicherzustellen, dass die Nummer verwendet wird
         leads.append(lead)
     
     db.commit()
     for lead in leads:
         db.refresh(lead)
     
-    lead_dicts = [load_lead_details(lead, db) for lead in leads]
+    lead_dicts = load_lead_details_batch(leads, db)
     return [schemas.LeadRead(**lead_dict) for lead_dict in lead_dicts]
 
 
@@ -11,9 +11,13 @@ from sqlalchemy.orm import Session
 
 from .. import schemas
 from ..database import get_db
-from ..models import Makler, User, MaklerDokument
+from ..models import Makler, User, MaklerDokument, MaklerTagesplan
 from ..models.user import UserRole
 from ..services.auth_service import get_current_active_user, require_admin_or_manager
+from ..services.monats_rollup_service import entferne_makler_aus_rollup
+from ..services.gebiet_index_service import synchronisiere_makler_gebiet
+from ..services.tagesplan_service import verwerfe_tagesplan
+from ..services.telefonist_cache_service import invalidiere_telefonist_cache
 from ..logging_config import get_logger
 
 logger = get_logger("makler")
@@ -53,10 +57,11 @@ def get_makler_controlling(
     """
     from typing import Dict, Any
     from datetime import datetime
-    from sqlalchemy import extract, func, or_
+    from sqlalchemy import func, or_
     from ..models.lead import Lead
     from ..models.rechnung import Rechnung
-    from ..services.abrechnung_service import berechne_vertragsmonat, bestimme_preis_pro_lead, ist_makler_in_monat_aktiv
+    from ..services.abrechnung_service import berechne_vertragsmonat, bestimme_preis_pro_lead
+    from ..services.monats_rollup_service import ist_makler_aktiv_laut_rollup, lade_makler_monat_rollup
     
     makler = db.query(Makler).filter(Makler.id == makler_id).first()
     if not makler:
@@ -86,7 +91,8 @@ def get_makler_controlling(
     # Monatsstatistik (aktueller Monat)
     vertragsmonat = berechne_vertragsmonat(makler.vertragsstart_datum, aktueller_monat, aktuelles_jahr)
     preis_pro_lead = bestimme_preis_pro_lead(makler, vertragsmonat)
-    ist_aktiv = ist_makler_in_monat_aktiv(makler, aktueller_monat, aktuelles_jahr, db)
+    monats_rollup = lade_makler_monat_rollup(db, makler.id, aktueller_monat, aktuelles_jahr)
+    ist_aktiv = ist_makler_aktiv_laut_rollup(makler, aktueller_monat, aktuelles_jahr, monats_rollup)
     
     if makler.monatliche_soll_leads is not None:
         soll_leads = makler.monatliche_soll_leads
@@ -95,17 +101,7 @@ def get_makler_controlling(
     else:
         soll_leads = None
     
-    ist_leads = (
-        db.query(Lead)
-        .filter(
-            Lead.makler_id == makler.id,
-            Lead.status == "qualifiziert",
-            Lead.qualifiziert_am.isnot(None),
-            extract("month", Lead.qualifiziert_am) == aktueller_monat,
-            extract("year", Lead.qualifiziert_am) == aktuelles_jahr,
-        )
-        .count()
-    ) if ist_aktiv else 0
+    ist_leads = (monats_rollup.qualifiziert_anzahl if monats_rollup else 0) if ist_aktiv else 0
     
     # Berechne Lieferung in Prozent
     lieferung_prozent = None
@@ -134,8 +130,8 @@ def get_makler_controlling(
     ).order_by(Lead.erstellt_am.desc()).limit(20).all()
     
     # Lade Lead-Details
-    from .leads import load_lead_details
-    leads_details = [load_lead_details(lead, db) for lead in letzte_leads]
+    from .leads import load_lead_details_batch
+    leads_details = load_lead_details_batch(letzte_leads, db)
     
     # Dokumente
     dokumente = db.query(MaklerDokument).filter(
@@ -260,6 +256,8 @@ def create_makler(
     
     db.add(makler)
     try:
+        db.flush()  # Um die ID für die Gebietszuordnung zu erhalten
+        synchronisiere_makler_gebiet(db, makler.id, makler.gebiet)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -272,6 +270,8 @@ def create_makler(
     db.refresh(makler)
     logger.info(f"Makler erstellt: ID={makler.id}, Firmenname={makler.firmenname}")
     
+    invalidiere_telefonist_cache()
+    
     return makler
 
 
@@ -300,9 +300,18 @@ def update_makler(
         setattr(makler, key, value)
     
     makler.modified_by_user_id = current_user.id
+    
+    # Normalisierte Gebietszuordnung in derselben Transaktion aktualisieren
+    if "gebiet" in update_data:
+        synchronisiere_makler_gebiet(db, makler.id, makler.gebiet)
+    # Soll-Leads, Pausierung usw. ändern den Tagessatz: Tagesplan neu berechnen lassen
+    verwerfe_tagesplan(db, [makler.id])
 
     db.commit()
     db.refresh(makler)
+    
+    # Soll-Leads, Pausierung, Rechnungssystem usw. fließen in Dashboard und Lead-Empfehlung ein
+    invalidiere_telefonist_cache()
     return makler
 
 
@@ -345,8 +354,13 @@ def delete_makler(
                 detail=f"Makler kann nicht gelöscht werden: {anzahl_leads} Lead(s) und {anzahl_rechnungen} Rechnung(en) vorhanden. Bitte zuerst löschen oder mit cascade=true löschen."
             )
     
+    synchronisiere_makler_gebiet(db, makler_id, None)
+    db.query(MaklerTagesplan).filter(MaklerTagesplan.makler_id == makler_id).delete()
+    entferne_makler_aus_rollup(db, makler_id)
     db.delete(makler)
     db.commit()
+    
+    invalidiere_telefonist_cache()
     return None
 
 
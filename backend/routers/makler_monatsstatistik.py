@@ -1,13 +1,13 @@
 from typing import List, Dict, Any
 from datetime import datetime, date
-from sqlalchemy import extract, func
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..models import Makler, Lead, User
-from ..services.abrechnung_service import berechne_vertragsmonat, bestimme_preis_pro_lead, ist_makler_in_monat_aktiv
+from ..models import Makler, User
+from ..services.abrechnung_service import berechne_vertragsmonat, bestimme_preis_pro_lead
 from ..services.auth_service import get_current_active_user
+from ..services.monats_rollup_service import ist_makler_aktiv_laut_rollup, lade_monats_rollup
 
 router = APIRouter()
 
@@ -31,13 +31,17 @@ def get_makler_monatsstatistik(
             jahr = jetzt.year
         
         makler_list = db.query(Makler).all()
+        # Vorberechnete Monatswerte aller Makler (makler_monat_rollup) statt Zählung pro Makler
+        monats_rollup = lade_monats_rollup(db, monat, jahr)
         result = []
         
         for makler in makler_list:
             try:
+                rollup = monats_rollup.get(makler.id)
+                
                 # Prüfe, ob Makler im Abrechnungsmonat aktiv ist (für Abrechnungszwecke)
                 # WICHTIG: Bereits gelieferte Leads werden berücksichtigt, auch wenn pausiert
-                ist_aktiv = ist_makler_in_monat_aktiv(makler, monat, jahr, db)
+                ist_aktiv = ist_makler_aktiv_laut_rollup(makler, monat, jahr, rollup)
                 
                 # Berechne Vertragsmonat
                 if makler.vertragsstart_datum:
@@ -77,17 +81,7 @@ def get_makler_monatsstatistik(
                 # Ist: Qualifizierte Leads im Monat (nur Leads mit Status "qualifiziert" und qualifiziert_am im Monat)
                 # WICHTIG: Bereits gelieferte Leads werden immer gezählt, auch wenn pausiert
                 # (ist_aktiv berücksichtigt bereits gelieferte Leads, daher können wir immer zählen)
-                ist_leads = (
-                    db.query(Lead)
-                    .filter(
-                        Lead.makler_id == makler.id,
-                        Lead.status == "qualifiziert",
-                        Lead.qualifiziert_am.isnot(None),
-                        extract("month", Lead.qualifiziert_am) == monat,
-                        extract("year", Lead.qualifiziert_am) == jahr,
-                    )
-                    .count()
-                )
+                ist_leads = rollup.qualifiziert_anzahl if rollup else 0
                 
                 # Preis pro Lead berechnen
                 preis_pro_lead = bestimme_preis_pro_lead(makler, vertragsmonat)
@@ -3,14 +3,27 @@ API-Endpunkte für das Organisations- und Koordinationssystem.
 """
 
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
 from ..database import get_db
-from ..models import User
-from ..services.auth_service import get_current_active_user
+from ..models import Lead, User
+from ..services.auth_service import get_current_active_user, require_admin
 from ..services.organisation_service import get_telefonist_dashboard, berechne_makler_status
-from ..services.lead_empfehlung_service import get_lead_empfehlung_fuer_telefonist
+from ..services.lead_empfehlung_service import (
+    beanspruche_naechsten_lead,
+    get_lead_empfehlung_fuer_telefonist,
+    gib_lead_frei,
+    lock_ablauf,
+    verlaengere_lead_lock
+)
+from ..services.telefonist_cache_service import (
+    BEREICH_DASHBOARD,
+    BEREICH_LEAD_EMPFEHLUNG,
+    get_cache_metriken,
+    hole_oder_berechne,
+    markiere_telefonist_cache_veraltet
+)
 
 router = APIRouter()
 
@@ -26,12 +39,17 @@ def telefonist_dashboard(
     """
     Gibt das Dashboard für Telefonisten zurück.
     Zeigt alle Makler mit Status, Verfügbarkeit und Priorität.
+    Die Antwort wird pro Filter-Kombination kurz zwischengespeichert.
     """
-    return get_telefonist_dashboard(
-        db=db,
-        filter_status=filter_status,
-        filter_system=filter_system,
-        suche=suche
+    return hole_oder_berechne(
+        BEREICH_DASHBOARD,
+        (filter_status, filter_system, suche),
+        lambda: get_telefonist_dashboard(
+            db=db,
+            filter_status=filter_status,
+            filter_system=filter_system,
+            suche=suche
+        )
     )
 
 
@@ -82,6 +100,77 @@ def telefonist_lead_empfehlung(
     Gibt eine Lead-Empfehlung für den Telefonisten zurück.
     Zeigt, welchen Lead er als nächstes anrufen soll.
     Berücksichtigt Locking (verhindert, dass mehrere Telefonisten am selben Lead arbeiten).
+    Die Antwort wird pro Telefonist kurz zwischengespeichert (Locks sind benutzerabhängig).
+    """
+    ergebnis = hole_oder_berechne(
+        BEREICH_LEAD_EMPFEHLUNG,
+        current_user.id,
+        lambda: get_lead_empfehlung_fuer_telefonist(db, aktueller_user_id=current_user.id)
+    )
+    # Neu berechnete Tagesplan-Zeilen speichern
+    db.commit()
+    return ergebnis
+
+
+@router.post("/telefonist/lead-beanspruchen")
+def telefonist_lead_beanspruchen(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Sperrt den nächsten empfohlenen Lead atomar für den Telefonisten (Lease).
+    Gleichzeitig anfragende Telefonisten erhalten verschiedene Leads.
+    Der Lock läuft nach LOCK_TIMEOUT_MINUTEN ab und wird per Heartbeat verlängert.
+    """
+    empfehlung = beanspruche_naechsten_lead(db, current_user.id)
+    if empfehlung is not None:
+        markiere_telefonist_cache_veraltet(db)
+    db.commit()
+    return {"empfehlung": empfehlung}
+
+
+@router.post("/telefonist/leads/{lead_id}/heartbeat")
+def telefonist_lead_heartbeat(
+    lead_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Verlängert den Lock des Telefonisten auf einen Lead.
+    409, wenn der Lead nicht (mehr) vom Telefonisten gesperrt ist.
+    """
+    if not verlaengere_lead_lock(db, lead_id, current_user.id):
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lead ist nicht (mehr) von Ihnen gesperrt"
+        )
+    db.commit()
+    return {"lead_id": lead_id, "gesperrt_bis": lock_ablauf(db.get(Lead, lead_id))}
+
+
+@router.delete("/telefonist/leads/{lead_id}/lock", status_code=status.HTTP_204_NO_CONTENT)
+def telefonist_lead_freigeben(
+    lead_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Gibt den eigenen Lock auf einen Lead wieder frei (z.B. wenn der Telefonist den Lead überspringt).
+    """
+    if gib_lead_frei(db, lead_id, current_user.id):
+        markiere_telefonist_cache_veraltet(db)
+    db.commit()
+    return None
+
+
+@router.get("/telefonist/cache-metriken")
+def telefonist_cache_metriken(
+    current_user: User = Depends(require_admin)
+):
+    """
+    Gibt Treffer/Fehlschläge des Antwort-Caches für Dashboard und Lead-Empfehlung zurück
+    (zum Einstellen von TELEFONIST_CACHE_TTL_SEKUNDEN).
     """
-    return get_lead_empfehlung_fuer_telefonist(db, aktueller_user_id=current_user.id)
+    return get_cache_metriken()
 
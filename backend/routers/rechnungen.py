@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import List
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
@@ -9,6 +10,7 @@ from ..database import get_db
 from ..models import Makler, Rechnung, User
 from ..models.user import UserRole
 from ..services.abrechnung_service import finde_oder_erzeuge_rechnung
+from ..services.monats_rollup_service import aktualisiere_rollup, rollup_schluessel
 from ..services.pdf_service import generiere_rechnung_pdf
 from ..services.auth_service import get_current_active_user, require_buchhalter, require_not_telefonist
 
@@ -61,10 +63,10 @@ def get_verkaufte_leads(
     # Filtere Leads mit bestehender Beteiligungsrechnung heraus
     verkaufte_leads = [l for l in verkaufte_leads if l.id not in existing_lead_ids]
     
-    # Verwende load_lead_details aus leads.py, um konsistente Serialisierung zu gewährleisten
+    # Verwende load_lead_details_batch aus leads.py, um konsistente Serialisierung zu gewährleisten
     try:
-        from .leads import load_lead_details
-        lead_dicts = [load_lead_details(lead, db) for lead in verkaufte_leads]
+        from .leads import load_lead_details_batch
+        lead_dicts = load_lead_details_batch(verkaufte_leads, db)
         return [schemas.LeadRead(**lead_dict) for lead_dict in lead_dicts]
     except Exception as e:
         # Fallback: Wenn Import fehlschlägt, verwende einfache Serialisierung
@@ -204,6 +206,7 @@ def create_beteiligungsabrechnung(
     )
     
     db.add(rechnung)
+    aktualisiere_rollup(db, [rollup_schluessel(lead.makler_id, datetime.utcnow())])
     db.commit()
     db.refresh(rechnung)
     
@@ -2,13 +2,15 @@ from datetime import datetime, date
 from typing import List, Optional
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_, and_
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 
 from ..database import get_db
 from ..models import User, Ticket, TicketTeilnehmer, TicketDringlichkeit, ChatMessage, ChatGruppe, ChatGruppeTeilnehmer, ChatGruppe, ChatGruppeTeilnehmer
 from ..models.user import UserRole
 from ..schemas import TicketCreate, TicketRead, TicketUpdate, TicketTeilnehmerHinzufuegen
 from ..routers.auth import get_current_active_user, require_admin_or_manager
+from ..services.chat_konversation_service import trage_chat_nachrichten_ein
+from ..services.pagination_service import filtere_nach_cursor, schneide_seite_ab, sortiere_keyset
 
 router = APIRouter(prefix="/tickets", tags=["tickets"])
 
@@ -127,6 +129,7 @@ def erstelle_ticket(
         gelesen=False
     )
     db.add(chat_message)
+    trage_chat_nachrichten_ein(db, [chat_message])
     
     # Verknüpfe Ticket mit Chat-Gruppe
     ticket.chat_gruppe_id = chat_gruppe.id
@@ -140,35 +143,38 @@ def erstelle_ticket(
 
 @router.get("", response_model=List[TicketRead])
 def get_tickets(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Maximale Anzahl zurückzugebender Tickets (ohne Angabe: alle)"),
+    cursor: Optional[str] = Query(None, description="Cursor aus dem Header X-Next-Cursor der vorherigen Seite"),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     """
     Gibt alle Tickets zurück, auf die der aktuelle Benutzer Zugriff hat.
+    Mit limit wird seitenweise geliefert, der Cursor der nächsten Seite steht im Header X-Next-Cursor.
     """
-    # Finde alle Tickets, bei denen der Benutzer Teilnehmer ist oder Ersteller
-    ticket_ids = db.query(TicketTeilnehmer.ticket_id).filter(
+    # Tickets, bei denen der Benutzer Teilnehmer oder Ersteller ist (als Subquery, ohne ID-Liste in Python)
+    teilnehmer_ticket_ids = db.query(TicketTeilnehmer.ticket_id).filter(
         TicketTeilnehmer.user_id == current_user.id
-    ).all()
-    ticket_ids = [t[0] for t in ticket_ids]
-    
-    # Füge Tickets hinzu, die der Benutzer erstellt hat
-    erstellte_tickets = db.query(Ticket.id).filter(
-        Ticket.erstellt_von_user_id == current_user.id
-    ).all()
-    ticket_ids.extend([t[0] for t in erstellte_tickets])
-    
-    # Entferne Duplikate
-    ticket_ids = list(set(ticket_ids))
-    
-    if not ticket_ids:
-        return []
+    )
     
-    # Lade alle Tickets mit Teilnehmern
-    tickets = db.query(Ticket).options(
+    # Lade Tickets mit Teilnehmern
+    query = db.query(Ticket).options(
         joinedload(Ticket.teilnehmer).joinedload(TicketTeilnehmer.user),
         joinedload(Ticket.erstellt_von)
-    ).filter(Ticket.id.in_(ticket_ids)).order_by(Ticket.erstellt_am.desc()).all()
+    ).filter(or_(
+        Ticket.id.in_(teilnehmer_ticket_ids),
+        Ticket.erstellt_von_user_id == current_user.id
+    ))
+    try:
+        query = filtere_nach_cursor(query, cursor, Ticket.erstellt_am, Ticket.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    query = sortiere_keyset(query, Ticket.erstellt_am, Ticket.id)
+    if limit is not None:
+        # Einen Eintrag mehr laden, um zu erkennen, ob es eine nächste Seite gibt
+        query = query.limit(limit + 1)
+    tickets = schneide_seite_ab(query.all(), limit, response, "erstellt_am")
     
     return [lade_ticket_details(ticket, db) for ticket in tickets]
 
@@ -321,6 +327,7 @@ def fuege_teilnehmer_hinzu(
                     gelesen=False
                 )
                 db.add(chat_message)
+                trage_chat_nachrichten_ein(db, [chat_message])
     
     db.commit()
     db.refresh(ticket)
@@ -398,6 +405,7 @@ def schliesse_ticket(
             gelesen=False
         )
         db.add(chat_message)
+        trage_chat_nachrichten_ein(db, [chat_message])
     
     db.commit()
     db.refresh(ticket)
@@ -146,6 +146,8 @@ class LeadUpdate(BaseModel):
     status: Optional[LeadStatus] = None
     makler_id: Optional[int] = None  # Makler-Zuordnung
     anbieter_name: Optional[str] = None  # Eigentümer/Anbieter Name (bearbeitbar)
+    telefonnummer: Optional[str] = None
+    postleitzahl: Optional[str] = None
     beschreibung: Optional[str] = None  # Telefonisten können Beschreibungen hinzufügen
     preis: Optional[float] = None  # Preis des Leads
     kontakt_datum: Optional[date] = None  # Datum, an dem der Makler den Lead kontaktieren kann
@@ -182,6 +184,7 @@ class LeadUpdate(BaseModel):
 
 class LeadRead(LeadBase):
     id: int
+    duplikat_von_lead_id: Optional[int] = None  # Gesetzt, wenn der Lead als Duplikat markiert wurde
     qualifiziert_von_user_id: Optional[int] = None
     qualifiziert_von_username: Optional[str] = None  # Username des Users, der den Lead qualifiziert hat
 
@@ -441,3 +444,25 @@ class TicketTeilnehmerHinzufuegen(BaseModel):
     user_ids: list[int]  # Liste der User-IDs, die hinzugefügt werden sollen
 
 
+
+
+# Import-Job Schemas
+class ImportJobRead(BaseModel):
+    id: int
+    dateiname: str
+    status: str  # wartend, laeuft, abgeschlossen, fehlgeschlagen
+    makler_id: Optional[int] = None
+    created_by_user_id: Optional[int] = None
+    datei_groesse: Optional[int] = None
+    verarbeitete_bytes: int = 0
+    verarbeitete_zeilen: int = 0
+    importierte_leads: int = 0
+    fehler_anzahl: int = 0
+    duplikat_modus: Optional[str] = None
+    duplikate_anzahl: int = 0
+    fortschritt_prozent: Optional[float] = None
+    fehler_details: list[dict] = []
+    meldung: Optional[str] = None
+    erstellt_am: datetime
+    gestartet_am: Optional[datetime] = None
+    beendet_am: Optional[datetime] = None
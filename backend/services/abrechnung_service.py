@@ -5,6 +5,7 @@ from calendar import monthrange
 from sqlalchemy.orm import Session
 
 from ..models import Lead, Makler, Rechnung
+from .zeitraum_service import im_monat
 
 
 def berechne_vertragsmonat(vertragsstart: date, abrechnungsmonat: int, jahr: int) -> int:
@@ -161,16 +162,13 @@ def ermittle_anzahl_gelieferter_leads(
     - Einem Makler zugeordnet ist
     - Im angegebenen Monat qualifiziert wurde (qualifiziert_am)
     """
-    from sqlalchemy import extract, and_
-
     return (
         db.query(Lead)
         .filter(
             Lead.makler_id == makler_id,
             Lead.status == "qualifiziert",
             Lead.qualifiziert_am.isnot(None),
-            extract("month", Lead.qualifiziert_am) == monat,
-            extract("year", Lead.qualifiziert_am) == jahr,
+            im_monat(Lead.qualifiziert_am, monat, jahr),
         )
         .count()
     )
@@ -261,6 +259,8 @@ def finde_oder_erzeuge_rechnung(
         rechnung.preis_pro_lead = preis_pro_lead
         rechnung.gesamtbetrag = gesamtbetrag
 
+    from .monats_rollup_service import aktualisiere_rollup
+    aktualisiere_rollup(db, [(makler.id, jahr, monat)])
     db.commit()
     db.refresh(rechnung)
     return rechnung, created
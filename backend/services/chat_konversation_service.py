@@ -0,0 +1,559 @@
+"""
+Service für die Postfach-Tabelle chat_konversationen.
+Das Postfach (GET /api/auth/chat/conversations) liest pro Benutzer nur noch seine
+Konversationszeilen mit letzter Nachricht und Ungelesen-Zähler (eine indizierte Abfrage),
+statt bei jedem Abruf alle Nachrichten zu gruppieren und pro Konversation die neueste
+Nachricht und die ungelesenen Nachrichten zu zählen.
+
+Beim Senden übernehmen die betroffenen Zeilen die neue Nachricht und zählen ungelesen hoch,
+beim Als-gelesen-Markieren werden die Ungelesen-Zähler neu gezählt. Neue Konversationen und
+gelöschte Benutzer werden wie beim Monats-Rollup aus chat_messages berechnet;
+baue_chat_konversationen_neu() berechnet die Tabelle oder die Zeilen eines Benutzers
+vollständig neu.
+
+Die Sichtbarkeit nach Rolle (Makler-Konversationen nur für Manager/Admin, Buchhalter und
+Telefonisten nur mit Manager/Admin) und geschlossene Ticket-Chats werden beim Lesen
+gefiltert, damit Rollenwechsel und geschlossene Tickets keine Neuberechnung brauchen.
+
+Verbundene Chat-Seiten (services/chat_push_service.py) erhalten beim Senden die neue
+Nachricht mit ihrer Postfach-Zeile und beim Lesen Lesebestätigungen, jeweils mit dem neuen
+Ungelesen-Gesamtzähler; berechnet wird das nur für verbundene Empfänger.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, case, exists, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import ChatGruppe, ChatGruppeTeilnehmer, ChatKonversation, ChatMessage, Makler, Ticket, User
+from ..models.user import UserRole
+from .chat_push_service import EMPFAENGER_MAKLER, EMPFAENGER_USER, hat_abonnenten, merke_chat_ereignis
+
+KONTAKT_USER = "user"
+KONTAKT_MAKLER = "makler"
+KONTAKT_GRUPPE = "gruppe"
+
+# Gespeicherte Länge der Nachrichten-Vorschau (das Frontend zeigt davon die ersten 50 Zeichen)
+VORSCHAU_LAENGE = 200
+
+# (user_id, kontakt_typ, kontakt_id)
+KonversationSchluessel = Tuple[int, str, int]
+
+
+def _alle_user_ids(db: Session) -> List[int]:
+    return [user_id for (user_id,) in db.query(User.id).all()]
+
+
+def _gruppen_schluessel(db: Session, gruppe_id: int) -> Set[KonversationSchluessel]:
+    """Zeilen einer Chat-Gruppe: aktuelle Teilnehmer und bereits vorhandene Einträge"""
+    user_ids = {
+        user_id for (user_id,) in db.query(ChatGruppeTeilnehmer.user_id).filter(
+            ChatGruppeTeilnehmer.chat_gruppe_id == gruppe_id
+        )
+    }
+    user_ids.update(
+        user_id for (user_id,) in db.query(ChatKonversation.user_id).filter(
+            ChatKonversation.kontakt_typ == KONTAKT_GRUPPE,
+            ChatKonversation.kontakt_id == gruppe_id,
+        )
+    )
+    return {(user_id, KONTAKT_GRUPPE, gruppe_id) for user_id in user_ids}
+
+
+def konversations_schluessel(db: Session, nachrichten: Iterable[ChatMessage]) -> Set[KonversationSchluessel]:
+    """Postfach-Zeilen, in denen die Nachrichten als letzte oder ungelesene Nachricht zählen"""
+    schluessel = set()
+    gruppen_ids = set()
+    makler_an_alle = set()
+    for nachricht in nachrichten:
+        if nachricht.chat_gruppe_id is not None:
+            gruppen_ids.add(nachricht.chat_gruppe_id)
+        if nachricht.from_user_id is not None:
+            if nachricht.to_user_id is not None:
+                schluessel.add((nachricht.from_user_id, KONTAKT_USER, nachricht.to_user_id))
+                schluessel.add((nachricht.to_user_id, KONTAKT_USER, nachricht.from_user_id))
+            if nachricht.to_makler_id is not None:
+                schluessel.add((nachricht.from_user_id, KONTAKT_MAKLER, nachricht.to_makler_id))
+        if nachricht.from_makler_id is not None:
+            if nachricht.to_user_id is not None:
+                schluessel.add((nachricht.to_user_id, KONTAKT_MAKLER, nachricht.from_makler_id))
+            else:
+                makler_an_alle.add(nachricht.from_makler_id)
+
+    if makler_an_alle:
+        # Makler-Nachrichten ohne Empfänger sehen alle LeadGate-Benutzer (gefiltert nach Rolle beim Lesen)
+        for user_id in _alle_user_ids(db):
+            schluessel.update((user_id, KONTAKT_MAKLER, makler_id) for makler_id in makler_an_alle)
+    for gruppe_id in gruppen_ids:
+        schluessel |= _gruppen_schluessel(db, gruppe_id)
+    return schluessel
+
+
+def _nachrichten_filter(user_id: int, kontakt_typ: str, kontakt_id: int):
+    """(Filter für alle Nachrichten der Konversation, Filter für die für user_id ungelesenen)"""
+    if kontakt_typ == KONTAKT_USER:
+        empfangen = and_(ChatMessage.from_user_id == kontakt_id, ChatMessage.to_user_id == user_id)
+        alle = or_(
+            and_(ChatMessage.from_user_id == user_id, ChatMessage.to_user_id == kontakt_id),
+            empfangen,
+        )
+    elif kontakt_typ == KONTAKT_MAKLER:
+        empfangen = and_(
+            ChatMessage.from_makler_id == kontakt_id,
+            or_(
+                ChatMessage.to_user_id == user_id,
+                ChatMessage.to_user_id.is_(None)  # Makler-Nachrichten ohne spezifischen Empfänger
+            ),
+        )
+        alle = or_(
+            and_(ChatMessage.from_user_id == user_id, ChatMessage.to_makler_id == kontakt_id),
+            empfangen,
+        )
+    else:
+        alle = ChatMessage.chat_gruppe_id == kontakt_id
+        empfangen = and_(alle, ChatMessage.from_user_id != user_id)
+    return alle, and_(empfangen, ChatMessage.gelesen == False)
+
+
+def _berechne_zeile(db: Session, user_id: int, kontakt_typ: str, kontakt_id: int) -> Optional[Dict[str, Any]]:
+    """Letzte Nachricht und Anzahl ungelesener Nachrichten, None ohne Nachrichten"""
+    alle, ungelesen = _nachrichten_filter(user_id, kontakt_typ, kontakt_id)
+    letzte = (
+        db.query(ChatMessage.id, ChatMessage.erstellt_am, ChatMessage.nachricht)
+        .filter(alle)
+        .order_by(ChatMessage.erstellt_am.desc(), ChatMessage.id.desc())
+        .first()
+    )
+    if letzte is None:
+        return None
+    return {
+        "letzte_nachricht_id": letzte.id,
+        "letzte_nachricht_am": letzte.erstellt_am,
+        "letzte_nachricht_vorschau": letzte.nachricht[:VORSCHAU_LAENGE],
+        "ungelesen": db.query(ChatMessage.id).filter(ungelesen).count(),
+    }
+
+
+def aktualisiere_chat_konversationen(db: Session, schluessel: Iterable[KonversationSchluessel]) -> None:
+    """
+    Berechnet die angegebenen Postfach-Zeilen neu; Zeilen ohne Nachrichten (oder von
+    Gruppen, in denen der Benutzer nicht mehr Teilnehmer ist) werden gelöscht.
+    Flusht ausstehende Änderungen vorher, committet nicht.
+    """
+    eindeutig = set(schluessel)
+    if not eindeutig:
+        return
+    db.flush()
+
+    # Vorhandene Zeilen und Gruppen-Teilnehmer gebündelt pro Kontakt laden
+    pro_kontakt = defaultdict(set)
+    for user_id, kontakt_typ, kontakt_id in eindeutig:
+        pro_kontakt[(kontakt_typ, kontakt_id)].add(user_id)
+    vorhandene = {}
+    teilnehmer = {}
+    for (kontakt_typ, kontakt_id), user_ids in pro_kontakt.items():
+        for zeile in db.query(ChatKonversation).filter(
+            ChatKonversation.kontakt_typ == kontakt_typ,
+            ChatKonversation.kontakt_id == kontakt_id,
+            ChatKonversation.user_id.in_(user_ids),
+        ):
+            vorhandene[(zeile.user_id, kontakt_typ, kontakt_id)] = zeile
+        if kontakt_typ == KONTAKT_GRUPPE:
+            teilnehmer[kontakt_id] = {
+                user_id for (user_id,) in db.query(ChatGruppeTeilnehmer.user_id).filter(
+                    ChatGruppeTeilnehmer.chat_gruppe_id == kontakt_id
+                )
+            }
+
+    jetzt = datetime.utcnow()
+    for user_id, kontakt_typ, kontakt_id in eindeutig:
+        zeile = vorhandene.get((user_id, kontakt_typ, kontakt_id))
+        werte = None
+        if kontakt_typ != KONTAKT_GRUPPE or user_id in teilnehmer[kontakt_id]:
+            werte = _berechne_zeile(db, user_id, kontakt_typ, kontakt_id)
+        if werte is None:
+            if zeile is not None:
+                db.delete(zeile)
+            continue
+        werte["aktualisiert_am"] = jetzt
+        if zeile is None:
+            zeile = ChatKonversation(user_id=user_id, kontakt_typ=kontakt_typ, kontakt_id=kontakt_id, **werte)
+            try:
+                with db.begin_nested():
+                    db.add(zeile)
+                continue
+            except IntegrityError:
+                # Parallel von einer anderen Anfrage angelegt - deren Zeile aktualisieren
+                zeile = db.query(ChatKonversation).filter(
+                    ChatKonversation.user_id == user_id,
+                    ChatKonversation.kontakt_typ == kontakt_typ,
+                    ChatKonversation.kontakt_id == kontakt_id,
+                ).one()
+        for spalte, wert in werte.items():
+            setattr(zeile, spalte, wert)
+
+
+def _zaehlt_als_ungelesen(nachricht: ChatMessage, user_id: int, kontakt_typ: str, kontakt_id: int) -> bool:
+    """Ob die Nachricht in der Zeile (user_id, kontakt_typ, kontakt_id) als ungelesen zählt (wie _nachrichten_filter)"""
+    if nachricht.gelesen:
+        return False
+    if kontakt_typ == KONTAKT_USER:
+        return nachricht.from_user_id == kontakt_id and nachricht.to_user_id == user_id
+    if kontakt_typ == KONTAKT_MAKLER:
+        return nachricht.from_makler_id == kontakt_id and nachricht.to_user_id in (user_id, None)
+    return nachricht.from_user_id is not None and nachricht.from_user_id != user_id
+
+
+def trage_chat_nachrichten_ein(db: Session, nachrichten: Iterable[ChatMessage]) -> None:
+    """
+    Aktualisiert das Postfach nach neuen Nachrichten (auch noch nicht geflusht): vorhandene
+    Zeilen übernehmen die Nachricht als letzte und zählen ungelesen hoch (ein UPDATE pro
+    Kontakt, unabhängig von der Nachrichtenmenge), fehlende Zeilen werden aus chat_messages
+    berechnet. Committet nicht.
+    """
+    nachrichten = list(nachrichten)
+    if not nachrichten:
+        return
+    db.flush()
+    jetzt = datetime.utcnow()
+    fehlende = set()
+    gemeldet = []
+    for nachricht in sorted(nachrichten, key=lambda n: (n.erstellt_am, n.id)):
+        schluessel = konversations_schluessel(db, [nachricht])
+        gemeldet.append((nachricht, schluessel))
+        # (kontakt_typ, kontakt_id) -> {Zuwachs ungelesen: [user_ids]}
+        pro_kontakt = defaultdict(lambda: defaultdict(list))
+        for user_id, kontakt_typ, kontakt_id in schluessel:
+            zuwachs = int(_zaehlt_als_ungelesen(nachricht, user_id, kontakt_typ, kontakt_id))
+            pro_kontakt[(kontakt_typ, kontakt_id)][zuwachs].append(user_id)
+
+        # Eine parallel gesendete, neuere Nachricht bleibt die letzte
+        ist_neuer = or_(
+            ChatKonversation.letzte_nachricht_am.is_(None),
+            ChatKonversation.letzte_nachricht_am <= nachricht.erstellt_am,
+        )
+        for (kontakt_typ, kontakt_id), nach_zuwachs in pro_kontakt.items():
+            kontakt_filter = (ChatKonversation.kontakt_typ == kontakt_typ, ChatKonversation.kontakt_id == kontakt_id)
+            alle_ids = [user_id for user_ids in nach_zuwachs.values() for user_id in user_ids]
+            vorhandene = {
+                user_id for (user_id,) in db.query(ChatKonversation.user_id).filter(
+                    *kontakt_filter, ChatKonversation.user_id.in_(alle_ids)
+                )
+            }
+            fehlende.update((user_id, kontakt_typ, kontakt_id) for user_id in alle_ids if user_id not in vorhandene)
+            for zuwachs, user_ids in nach_zuwachs.items():
+                user_ids = [user_id for user_id in user_ids if user_id in vorhandene]
+                if not user_ids:
+                    continue
+                db.execute(
+                    update(ChatKonversation)
+                    .where(*kontakt_filter, ChatKonversation.user_id.in_(user_ids))
+                    .values(
+                        letzte_nachricht_id=case((ist_neuer, nachricht.id), else_=ChatKonversation.letzte_nachricht_id),
+                        letzte_nachricht_vorschau=case(
+                            (ist_neuer, nachricht.nachricht[:VORSCHAU_LAENGE]),
+                            else_=ChatKonversation.letzte_nachricht_vorschau,
+                        ),
+                        letzte_nachricht_am=case((ist_neuer, nachricht.erstellt_am), else_=ChatKonversation.letzte_nachricht_am),
+                        ungelesen=ChatKonversation.ungelesen + zuwachs,
+                        aktualisiert_am=jetzt,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+    # Erste Nachricht einer Konversation: Zeile aus chat_messages berechnen
+    aktualisiere_chat_konversationen(db, fehlende)
+    _melde_neue_nachrichten(db, gemeldet)
+
+
+def aktualisiere_ungelesen_fuer_nachrichten(db: Session, nachrichten: Iterable[ChatMessage]) -> None:
+    """
+    Nach dem Als-gelesen-Markieren: zählt die ungelesenen Nachrichten der Zeilen neu, in
+    denen die Nachrichten zählen (indizierte Zählung über gelesen == False). Committet nicht.
+    """
+    nachrichten = list(nachrichten)
+    db.flush()
+    jetzt = datetime.utcnow()
+    schluessel = konversations_schluessel(db, nachrichten)
+    for user_id, kontakt_typ, kontakt_id in schluessel:
+        _, ungelesen = _nachrichten_filter(user_id, kontakt_typ, kontakt_id)
+        db.execute(
+            update(ChatKonversation)
+            .where(
+                ChatKonversation.user_id == user_id,
+                ChatKonversation.kontakt_typ == kontakt_typ,
+                ChatKonversation.kontakt_id == kontakt_id,
+            )
+            .values(ungelesen=db.query(ChatMessage.id).filter(ungelesen).count(), aktualisiert_am=jetzt)
+            .execution_options(synchronize_session=False)
+        )
+    _melde_gelesene(db, nachrichten, schluessel)
+
+
+def _alle_schluessel(db: Session, user_id: Optional[int] = None) -> Set[KonversationSchluessel]:
+    """Alle Postfach-Zeilen laut chat_messages (nur die von user_id, falls angegeben)"""
+    schluessel = set()
+
+    paare = db.query(ChatMessage.from_user_id, ChatMessage.to_user_id).filter(
+        ChatMessage.from_user_id.isnot(None), ChatMessage.to_user_id.isnot(None)
+    )
+    an_makler = db.query(ChatMessage.from_user_id, ChatMessage.to_makler_id).filter(
+        ChatMessage.from_user_id.isnot(None), ChatMessage.to_makler_id.isnot(None)
+    )
+    von_makler = db.query(ChatMessage.to_user_id, ChatMessage.from_makler_id).filter(
+        ChatMessage.from_makler_id.isnot(None), ChatMessage.to_user_id.isnot(None)
+    )
+    teilnahmen = db.query(ChatGruppeTeilnehmer.user_id, ChatGruppeTeilnehmer.chat_gruppe_id)
+    if user_id is not None:
+        paare = paare.filter(or_(ChatMessage.from_user_id == user_id, ChatMessage.to_user_id == user_id))
+        an_makler = an_makler.filter(ChatMessage.from_user_id == user_id)
+        von_makler = von_makler.filter(ChatMessage.to_user_id == user_id)
+        teilnahmen = teilnahmen.filter(ChatGruppeTeilnehmer.user_id == user_id)
+
+    for von, an in paare.distinct():
+        schluessel.add((von, KONTAKT_USER, an))
+        schluessel.add((an, KONTAKT_USER, von))
+    schluessel.update((von, KONTAKT_MAKLER, makler_id) for von, makler_id in an_makler.distinct())
+    schluessel.update((an, KONTAKT_MAKLER, makler_id) for an, makler_id in von_makler.distinct())
+    schluessel.update((teilnehmer_id, KONTAKT_GRUPPE, gruppe_id) for teilnehmer_id, gruppe_id in teilnahmen)
+
+    makler_an_alle = [
+        makler_id for (makler_id,) in db.query(ChatMessage.from_makler_id).filter(
+            ChatMessage.from_makler_id.isnot(None), ChatMessage.to_user_id.is_(None)
+        ).distinct()
+    ]
+    if makler_an_alle:
+        user_ids = [user_id] if user_id is not None else _alle_user_ids(db)
+        schluessel.update((u, KONTAKT_MAKLER, m) for u in user_ids for m in makler_an_alle)
+
+    if user_id is not None:
+        schluessel = {s for s in schluessel if s[0] == user_id}
+    return schluessel
+
+
+def baue_chat_konversationen_neu(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Berechnet alle Postfach-Zeilen (oder die eines Benutzers) aus chat_messages neu und
+    entfernt verwaiste Zeilen. Gibt die Anzahl der Konversationen zurück. Committet nicht.
+    """
+    schluessel = _alle_schluessel(db, user_id)
+    veraltet = db.query(ChatKonversation)
+    if user_id is not None:
+        veraltet = veraltet.filter(ChatKonversation.user_id == user_id)
+    for zeile in veraltet.all():
+        if (zeile.user_id, zeile.kontakt_typ, zeile.kontakt_id) not in schluessel:
+            db.delete(zeile)
+    aktualisiere_chat_konversationen(db, schluessel)
+    return len(schluessel)
+
+
+def entferne_benutzer_aus_chat_konversationen(db: Session, user_id: int) -> None:
+    """
+    Für das Löschen eines Benutzers (nach dem Löschen seiner Nachrichten, Teilnahmen und
+    Gruppen): entfernt seine Zeilen, die Konversationen mit ihm und mit gelöschten Gruppen
+    und berechnet seine übrigen Gruppen neu.
+    Committet nicht.
+    """
+    db.flush()
+    gruppen_ids = [
+        kontakt_id for (kontakt_id,) in db.query(ChatKonversation.kontakt_id).filter(
+            ChatKonversation.user_id == user_id,
+            ChatKonversation.kontakt_typ == KONTAKT_GRUPPE,
+        )
+    ]
+    db.query(ChatKonversation).filter(
+        or_(
+            ChatKonversation.user_id == user_id,
+            and_(ChatKonversation.kontakt_typ == KONTAKT_USER, ChatKonversation.kontakt_id == user_id),
+            # Vom Benutzer erstellte Gruppen werden mitgelöscht
+            and_(
+                ChatKonversation.kontakt_typ == KONTAKT_GRUPPE,
+                ~exists().where(ChatGruppe.id == ChatKonversation.kontakt_id),
+            ),
+        )
+    ).delete(synchronize_session=False)
+    schluessel = set()
+    for gruppe_id in gruppen_ids:
+        schluessel |= _gruppen_schluessel(db, gruppe_id)
+    aktualisiere_chat_konversationen(db, schluessel)
+
+
+def _postfach_query(db: Session, user: User):
+    """Konversationszeilen des Benutzers mit Kontaktnamen, gefiltert nach Rolle und ohne geschlossene Ticket-Chats"""
+    query = (
+        db.query(ChatKonversation, User.username, User.role, Makler.firmenname, ChatGruppe.name)
+        .outerjoin(User, and_(ChatKonversation.kontakt_typ == KONTAKT_USER, User.id == ChatKonversation.kontakt_id))
+        .outerjoin(Makler, and_(ChatKonversation.kontakt_typ == KONTAKT_MAKLER, Makler.id == ChatKonversation.kontakt_id))
+        .outerjoin(ChatGruppe, and_(ChatKonversation.kontakt_typ == KONTAKT_GRUPPE, ChatGruppe.id == ChatKonversation.kontakt_id))
+        .filter(
+            ChatKonversation.user_id == user.id,
+            or_(
+                ChatKonversation.kontakt_typ != KONTAKT_GRUPPE,
+                ~exists().where(Ticket.chat_gruppe_id == ChatKonversation.kontakt_id, Ticket.geschlossen == 1),
+            ),
+        )
+    )
+    if user.role in [UserRole.BUCHHALTER, UserRole.TELEFONIST]:
+        # Nur Konversationen mit Manager oder Admin (und Gruppen)
+        query = query.filter(or_(
+            ChatKonversation.kontakt_typ == KONTAKT_GRUPPE,
+            and_(ChatKonversation.kontakt_typ == KONTAKT_USER, User.role.in_([UserRole.MANAGER, UserRole.ADMIN])),
+        ))
+    elif user.role not in [UserRole.MANAGER, UserRole.ADMIN]:
+        # Makler-Konversationen nur für Manager und Admin
+        query = query.filter(ChatKonversation.kontakt_typ != KONTAKT_MAKLER)
+    return query
+
+
+def _postfach_eintrag(
+    zeile: ChatKonversation,
+    username: Optional[str],
+    firmenname: Optional[str],
+    gruppen_name: Optional[str]
+) -> Dict[str, Any]:
+    """Konversationszeile im Format von schemas.ConversationSummary"""
+    if zeile.kontakt_typ == KONTAKT_USER:
+        contact_name = username or f"User {zeile.kontakt_id}"
+    elif zeile.kontakt_typ == KONTAKT_MAKLER:
+        contact_name = firmenname or f"Makler {zeile.kontakt_id}"
+    else:
+        contact_name = gruppen_name or f"Gruppe {zeile.kontakt_id}"
+    return {
+        "contact_id": zeile.kontakt_id,
+        "contact_type": zeile.kontakt_typ,
+        "contact_name": contact_name,
+        "last_message": zeile.letzte_nachricht_vorschau,
+        "last_message_time": zeile.letzte_nachricht_am,
+        "unread_count": zeile.ungelesen,
+        "is_gruppe": zeile.kontakt_typ == KONTAKT_GRUPPE,
+    }
+
+
+def lade_postfach(db: Session, user: User) -> List[Dict[str, Any]]:
+    """
+    Postfach-Ansicht des Benutzers (neueste Konversation zuerst) in einer Abfrage:
+    Konversationszeilen mit Kontaktnamen, gefiltert nach Rolle und ohne geschlossene Ticket-Chats.
+    """
+    query = _postfach_query(db, user).order_by(ChatKonversation.letzte_nachricht_am.desc(), ChatKonversation.id.desc())
+    return [
+        _postfach_eintrag(zeile, username, firmenname, gruppen_name)
+        for zeile, username, _, firmenname, gruppen_name in query
+    ]
+
+
+def _nachricht_daten(nachricht: ChatMessage) -> Dict[str, Any]:
+    """Felder der Nachricht für Push-Ereignisse (Namen lädt der Client bei Bedarf per REST)"""
+    return {
+        "id": nachricht.id,
+        "from_user_id": nachricht.from_user_id,
+        "from_makler_id": nachricht.from_makler_id,
+        "to_user_id": nachricht.to_user_id,
+        "to_makler_id": nachricht.to_makler_id,
+        "chat_gruppe_id": nachricht.chat_gruppe_id,
+        "nachricht": nachricht.nachricht,
+        "erstellt_am": nachricht.erstellt_am,
+        "gelesen": nachricht.gelesen,
+    }
+
+
+def _verbundene_user(db: Session, user_ids: Iterable[int]) -> List[User]:
+    """Die Benutzer aus user_ids, die gerade per WebSocket verbunden sind"""
+    verbunden = [user_id for user_id in set(user_ids) if hat_abonnenten((EMPFAENGER_USER, user_id))]
+    if not verbunden:
+        return []
+    return db.query(User).filter(User.id.in_(verbunden)).all()
+
+
+def ungelesen_gesamt(db: Session, user: User) -> int:
+    """Summe der Ungelesen-Zähler im Postfach des Benutzers (wie das Chat-Badge der Seiten)"""
+    return _postfach_query(db, user).with_entities(
+        func.coalesce(func.sum(ChatKonversation.ungelesen), 0)
+    ).scalar()
+
+
+def makler_ungelesen(db: Session, makler_id: int) -> int:
+    """Ungelesene Nachrichten von LeadGate an den Makler (wie das Chat-Badge im GateLink-Dashboard)"""
+    return db.query(ChatMessage.id).filter(
+        ChatMessage.to_makler_id == makler_id,
+        ChatMessage.from_user_id.isnot(None),
+        ChatMessage.gelesen == False,
+    ).count()
+
+
+def _melde_ungelesen(db: Session, users: Iterable[User], makler_ids: Iterable[int]) -> None:
+    for user in users:
+        merke_chat_ereignis(db, (EMPFAENGER_USER, user.id), {"typ": "ungelesen", "gesamt": ungelesen_gesamt(db, user)})
+    for makler_id in set(makler_ids):
+        if hat_abonnenten((EMPFAENGER_MAKLER, makler_id)):
+            merke_chat_ereignis(
+                db, (EMPFAENGER_MAKLER, makler_id), {"typ": "ungelesen", "gesamt": makler_ungelesen(db, makler_id)}
+            )
+
+
+def _melde_neue_nachrichten(db: Session, gemeldet: List[Tuple[ChatMessage, Set[KonversationSchluessel]]]) -> None:
+    """
+    Merkt für verbundene Empfänger die neuen Nachrichten vor: Benutzer erhalten sie mit ihrer
+    Postfach-Zeile (nur wenn die Konversation in ihrem Postfach sichtbar ist), Makler ihre
+    GateLink-Nachrichten; danach jeweils den neuen Ungelesen-Gesamtzähler.
+    """
+    if not hat_abonnenten():
+        return
+    betroffene_user = {}
+    betroffene_makler = set()
+    for nachricht, schluessel in gemeldet:
+        daten = _nachricht_daten(nachricht)
+        users = {user.id: user for user in _verbundene_user(db, (user_id for user_id, _, _ in schluessel))}
+        for user_id, kontakt_typ, kontakt_id in schluessel:
+            user = users.get(user_id)
+            if user is None:
+                continue
+            treffer = _postfach_query(db, user).filter(
+                ChatKonversation.kontakt_typ == kontakt_typ,
+                ChatKonversation.kontakt_id == kontakt_id,
+            ).populate_existing().first()
+            if treffer is None:
+                continue
+            zeile, username, _, firmenname, gruppen_name = treffer
+            merke_chat_ereignis(db, (EMPFAENGER_USER, user_id), {
+                "typ": "nachricht",
+                "nachricht": daten,
+                "konversation": _postfach_eintrag(zeile, username, firmenname, gruppen_name),
+            })
+            betroffene_user[user_id] = user
+        for makler_id in {nachricht.from_makler_id, nachricht.to_makler_id} - {None}:
+            if hat_abonnenten((EMPFAENGER_MAKLER, makler_id)):
+                merke_chat_ereignis(db, (EMPFAENGER_MAKLER, makler_id), {"typ": "nachricht", "nachricht": daten})
+                betroffene_makler.add(makler_id)
+    _melde_ungelesen(db, betroffene_user.values(), betroffene_makler)
+
+
+def _melde_gelesene(db: Session, nachrichten: List[ChatMessage], schluessel: Set[KonversationSchluessel]) -> None:
+    if not nachrichten or not hat_abonnenten():
+        return
+    bestaetigt = defaultdict(list)
+    for nachricht in nachrichten:
+        if nachricht.from_user_id is not None:
+            bestaetigt[(EMPFAENGER_USER, nachricht.from_user_id)].append(nachricht.id)
+        if nachricht.from_makler_id is not None:
+            bestaetigt[(EMPFAENGER_MAKLER, nachricht.from_makler_id)].append(nachricht.id)
+    for empfaenger, nachricht_ids in bestaetigt.items():
+        if hat_abonnenten(empfaenger):
+            merke_chat_ereignis(db, empfaenger, {"typ": "gelesen", "nachricht_ids": sorted(nachricht_ids)})
+    _melde_ungelesen(
+        db,
+        _verbundene_user(db, (user_id for user_id, _, _ in schluessel)),
+        (nachricht.to_makler_id for nachricht in nachrichten if nachricht.to_makler_id is not None),
+    )
+
+
+def melde_gelesene_nachrichten(db: Session, nachrichten: Iterable[ChatMessage]) -> None:
+    """
+    Nach dem Als-gelesen-Markieren von Nachrichten, die in keinem Postfach zählen (Makler liest
+    Nachrichten von LeadGate): Lesebestätigungen an die Absender und neuer Zähler an den Makler.
+    Committet nicht.
+    """
+    nachrichten = list(nachrichten)
+    if hat_abonnenten():
+        _melde_gelesene(db, nachrichten, konversations_schluessel(db, nachrichten))
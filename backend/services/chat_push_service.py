@@ -0,0 +1,183 @@
+"""
+Service für die Echtzeit-Zustellung von Chat-Ereignissen (WebSocket statt Polling).
+Browser verbinden sich mit /api/auth/chat/ws bzw. /api/gatelink/chat/ws (Token als
+Query-Parameter, da Browser bei WebSockets keine Header setzen können) und erhalten
+neue Nachrichten, Lesebestätigungen und geänderte Ungelesen-Zähler als JSON-Ereignisse.
+Mit Verbindung gleichen die Chat-Seiten nur noch einmal pro Minute per REST ab.
+
+Ereignisse aus einer laufenden Transaktion: merke_chat_ereignis(db, ...) merkt sie an der
+Session vor, zugestellt wird erst nach dem Commit (bei Rollback werden sie verworfen),
+wie beim Telefonisten-Cache. Hinweis: Der Verteiler lebt pro Prozess - bei mehreren
+Workern erreichen Ereignisse nur die Verbindungen des Workers, der die Nachricht
+gespeichert hat; die übrigen Seiten sehen Änderungen beim nächsten Abgleich.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.encoders import jsonable_encoder
+from jose import jwt
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+EMPFAENGER_USER = "user"
+EMPFAENGER_MAKLER = "makler"
+
+# ("user", user_id) oder ("makler", makler_id)
+Empfaenger = Tuple[str, int]
+
+# Maximale Anzahl wartender Ereignisse pro Verbindung; bei Überlauf wird die Warteschlange
+# verworfen und der Client mit "neu_laden" aufgefordert, den Stand per REST zu holen
+MAX_WARTESCHLANGE = 100
+# Ping-Intervall, damit Proxys ruhende Verbindungen nicht schließen
+PING_SEKUNDEN = 25
+
+# Schlüssel in Session.info für vorgemerkte Ereignisse
+_SESSION_EREIGNISSE = "chat_push_ereignisse"
+
+
+class ChatAbo:
+    """Eine WebSocket-Verbindung: Warteschlange in der Event-Loop der Verbindung"""
+
+    def __init__(self, empfaenger: Empfaenger, loop: asyncio.AbstractEventLoop):
+        self.empfaenger = empfaenger
+        self.loop = loop
+        self.warteschlange: asyncio.Queue = asyncio.Queue(maxsize=MAX_WARTESCHLANGE)
+
+    def _stelle_zu(self, ereignis: Dict[str, Any]) -> None:
+        """Legt ein Ereignis in die Warteschlange (nur in self.loop aufrufen)"""
+        global _ueberlaeufe
+        try:
+            self.warteschlange.put_nowait(ereignis)
+        except asyncio.QueueFull:
+            while not self.warteschlange.empty():
+                self.warteschlange.get_nowait()
+            self.warteschlange.put_nowait({"typ": "neu_laden"})
+            with _lock:
+                _ueberlaeufe += 1
+
+
+# empfaenger -> Verbindungen (mehrere Tabs/Geräte pro Empfänger)
+_abos: Dict[Empfaenger, Set[ChatAbo]] = {}
+_zugestellt = 0
+_ueberlaeufe = 0
+_lock = threading.Lock()
+
+
+def abonniere(empfaenger: Empfaenger) -> ChatAbo:
+    """Meldet eine Verbindung an (aus der Event-Loop der Verbindung aufrufen)"""
+    abo = ChatAbo(empfaenger, asyncio.get_running_loop())
+    with _lock:
+        _abos.setdefault(empfaenger, set()).add(abo)
+    return abo
+
+
+def kuendige(abo: ChatAbo) -> None:
+    """Meldet eine Verbindung ab"""
+    with _lock:
+        abos = _abos.get(abo.empfaenger)
+        if abos is not None:
+            abos.discard(abo)
+            if not abos:
+                del _abos[abo.empfaenger]
+
+
+def hat_abonnenten(empfaenger: Optional[Empfaenger] = None) -> bool:
+    """Ob der Empfänger (ohne Angabe: irgendjemand) verbunden ist - sonst müssen keine Ereignisse berechnet werden"""
+    with _lock:
+        if empfaenger is None:
+            return bool(_abos)
+        return empfaenger in _abos
+
+
+def veroeffentliche(empfaenger: Empfaenger, ereignis: Dict[str, Any]) -> None:
+    """Stellt ein Ereignis sofort an alle Verbindungen des Empfängers zu (threadsicher)"""
+    global _zugestellt
+    with _lock:
+        abos = list(_abos.get(empfaenger, ()))
+        _zugestellt += len(abos)
+    for abo in abos:
+        try:
+            abo.loop.call_soon_threadsafe(abo._stelle_zu, ereignis)
+        except RuntimeError:
+            # Event-Loop bereits beendet (Verbindung beim Herunterfahren)
+            kuendige(abo)
+
+
+def merke_chat_ereignis(db: Session, empfaenger: Empfaenger, ereignis: Dict[str, Any]) -> None:
+    """Merkt ein Ereignis an der Session vor; es wird nach dem nächsten Commit zugestellt"""
+    db.info.setdefault(_SESSION_EREIGNISSE, []).append((empfaenger, ereignis))
+
+
+@event.listens_for(Session, "after_commit")
+def _nach_commit(session: Session) -> None:
+    for empfaenger, ereignis in session.info.pop(_SESSION_EREIGNISSE, ()):
+        veroeffentliche(empfaenger, ereignis)
+
+
+@event.listens_for(Session, "after_rollback")
+def _nach_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_EREIGNISSE, None)
+
+
+def token_ablauf(token: str) -> Optional[float]:
+    """Ablaufzeitpunkt (Unix-Zeit) eines bereits geprüften JWT, None ohne exp"""
+    ablauf = jwt.get_unverified_claims(token).get("exp")
+    return float(ablauf) if ablauf is not None else None
+
+
+async def _warte_auf_trennung(websocket: WebSocket) -> None:
+    """Liest (und ignoriert) Client-Nachrichten bis zur Trennung"""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+async def bediene_chat_websocket(websocket: WebSocket, empfaenger: Empfaenger, ablauf: Optional[float]) -> None:
+    """
+    Stellt die Ereignisse des Empfängers über die (bereits angenommene) Verbindung zu, bis der
+    Client trennt oder das Token abläuft (Close-Code 1008, der Client verbindet sich mit neuem Token).
+    """
+    abo = abonniere(empfaenger)
+    trennung = asyncio.create_task(_warte_auf_trennung(websocket))
+    try:
+        await websocket.send_json({"typ": "verbunden"})
+        while True:
+            wartezeit = PING_SEKUNDEN
+            if ablauf is not None:
+                wartezeit = min(wartezeit, ablauf - time.time())
+                if wartezeit <= 0:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token abgelaufen")
+                    break
+            naechstes = asyncio.ensure_future(abo.warteschlange.get())
+            fertig, _ = await asyncio.wait({naechstes, trennung}, timeout=wartezeit, return_when=asyncio.FIRST_COMPLETED)
+            if naechstes not in fertig:
+                naechstes.cancel()
+            if trennung in fertig:
+                break
+            if naechstes in fertig:
+                await websocket.send_json(jsonable_encoder(naechstes.result()))
+            elif ablauf is None or time.time() < ablauf:
+                await websocket.send_json({"typ": "ping"})
+    except (WebSocketDisconnect, RuntimeError):
+        # Verbindung während des Sendens geschlossen
+        pass
+    finally:
+        kuendige(abo)
+        trennung.cancel()
+
+
+def get_push_metriken() -> Dict[str, Any]:
+    """Anzahl Verbindungen und Empfänger, zugestellte Ereignisse und Überläufe"""
+    with _lock:
+        return {
+            "verbindungen": sum(len(abos) for abos in _abos.values()),
+            "empfaenger": len(_abos),
+            "zugestellt": _zugestellt,
+            "ueberlaeufe": _ueberlaeufe,
+        }
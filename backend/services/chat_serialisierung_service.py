@@ -0,0 +1,126 @@
+"""
+Service für die Ausgabe von Chat-Nachrichten (Postfach und GateLink).
+Statt pro Nachricht Absender, Empfänger und Chat-Gruppe einzeln nachzuladen, werden für
+eine ganze Seite die Namen mit einer Abfrage pro Entitätstyp (User, Makler, ChatGruppe)
+aufgelöst. Nachrichten, die nach einem Commit abgelaufen sind (z.B. nach dem
+Als-gelesen-Markieren), werden gemeinsam mit einer Abfrage neu gelesen statt einzeln.
+"""
+
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from ..models import ChatGruppe, ChatGruppeTeilnehmer, ChatMessage, Makler, User
+
+# Anzeigename des Absenders bei Nachrichten von LeadGate-Benutzern an Makler
+LEADGATE_ABSENDER = "LeadGate"
+
+# Höchstzahl IDs pro IN-Abfrage (unter dem Variablen-Limit von SQLite)
+IN_BLOCKGROESSE = 500
+
+_SPALTEN = (
+    ChatMessage.id,
+    ChatMessage.from_user_id,
+    ChatMessage.from_makler_id,
+    ChatMessage.to_user_id,
+    ChatMessage.to_makler_id,
+    ChatMessage.chat_gruppe_id,
+    ChatMessage.nachricht,
+    ChatMessage.erstellt_am,
+    ChatMessage.gelesen,
+)
+
+
+class ChatNamen(NamedTuple):
+    """Anzeigenamen der an einer Seite Nachrichten beteiligten Benutzer, Makler und Gruppen"""
+    usernamen: Dict[int, str]
+    firmennamen: Dict[int, str]
+    gruppen_namen: Dict[int, str]
+
+
+def _in_bloecken(ids: Iterable[int]) -> Iterable[List[int]]:
+    ids = sorted(set(ids))
+    for start in range(0, len(ids), IN_BLOCKGROESSE):
+        yield ids[start:start + IN_BLOCKGROESSE]
+
+
+def _lade_namen(db: Session, spalte_id, spalte_name, ids: Iterable[int]) -> Dict[int, str]:
+    namen = {}
+    for block in _in_bloecken(i for i in ids if i is not None):
+        namen.update(db.query(spalte_id, spalte_name).filter(spalte_id.in_(block)).all())
+    return namen
+
+
+def _nachrichten_werte(db: Session, nachrichten: List[ChatMessage]) -> List[Dict[str, Any]]:
+    """
+    Spaltenwerte der Nachrichten in der übergebenen Reihenfolge. Abgelaufene Objekte werden
+    gemeinsam neu gelesen (aktueller Stand, z.B. gelesen nach dem Markieren).
+    """
+    if any(inspect(nachricht).expired for nachricht in nachrichten):
+        ids = [inspect(nachricht).identity[0] for nachricht in nachrichten]
+        zeilen = {}
+        for block in _in_bloecken(ids):
+            zeilen.update((zeile.id, zeile._asdict()) for zeile in db.query(*_SPALTEN).filter(ChatMessage.id.in_(block)))
+        return [zeilen[nachricht_id] for nachricht_id in ids if nachricht_id in zeilen]
+    return [{spalte.key: getattr(nachricht, spalte.key) for spalte in _SPALTEN} for nachricht in nachrichten]
+
+
+def lade_chat_namen(db: Session, werte: List[Dict[str, Any]]) -> ChatNamen:
+    """Löst alle Namen einer Seite auf (je eine Abfrage für User, Makler und Chat-Gruppen)"""
+    return ChatNamen(
+        usernamen=_lade_namen(db, User.id, User.username, (
+            user_id for w in werte for user_id in (w["from_user_id"], w["to_user_id"])
+        )),
+        firmennamen=_lade_namen(db, Makler.id, Makler.firmenname, (
+            makler_id for w in werte for makler_id in (w["from_makler_id"], w["to_makler_id"])
+        )),
+        gruppen_namen=_lade_namen(db, ChatGruppe.id, ChatGruppe.name, (w["chat_gruppe_id"] for w in werte)),
+    )
+
+
+def serialisiere_chat_nachrichten(
+    db: Session,
+    nachrichten: Iterable[ChatMessage],
+    leadgate_als_absender: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Nachrichten im Format von schemas.ChatMessageRead mit Anzeigenamen.
+    leadgate_als_absender: Nachrichten von Benutzern an Makler zeigen "LeadGate" als Absender
+    (Postfach); im GateLink wird der echte Benutzername angezeigt.
+    """
+    werte = _nachrichten_werte(db, list(nachrichten))
+    if not werte:
+        return []
+    namen = lade_chat_namen(db, werte)
+    ergebnis = []
+    for w in werte:
+        if leadgate_als_absender and w["from_user_id"] and w["to_makler_id"]:
+            from_user_username = LEADGATE_ABSENDER
+        else:
+            from_user_username = namen.usernamen.get(w["from_user_id"])
+        ergebnis.append({
+            **w,
+            "from_user_username": from_user_username,
+            "from_makler_firmenname": namen.firmennamen.get(w["from_makler_id"]),
+            "to_user_username": namen.usernamen.get(w["to_user_id"]),
+            "to_makler_firmenname": namen.firmennamen.get(w["to_makler_id"]),
+            "chat_gruppe_name": namen.gruppen_namen.get(w["chat_gruppe_id"]),
+        })
+    return ergebnis
+
+
+def serialisiere_chat_nachricht(db: Session, nachricht: ChatMessage, leadgate_als_absender: bool = True) -> Dict[str, Any]:
+    """Eine Nachricht (z.B. Antwort beim Senden), siehe serialisiere_chat_nachrichten"""
+    return serialisiere_chat_nachrichten(db, [nachricht], leadgate_als_absender)[0]
+
+
+def lade_gruppen_teilnehmer(db: Session, gruppe_id: int) -> List[Dict[str, Any]]:
+    """Teilnehmer einer Chat-Gruppe mit ID, Benutzername und E-Mail (eine Abfrage)"""
+    return [
+        {"id": user_id, "username": username, "email": email}
+        for user_id, username, email in db.query(User.id, User.username, User.email)
+        .join(ChatGruppeTeilnehmer, ChatGruppeTeilnehmer.user_id == User.id)
+        .filter(ChatGruppeTeilnehmer.chat_gruppe_id == gruppe_id)
+        .order_by(ChatGruppeTeilnehmer.id)
+    ]
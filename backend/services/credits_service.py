@@ -1,14 +1,30 @@
 from datetime import date, datetime, timedelta
 from typing import Tuple, Optional, List, Dict, Any
-from sqlalchemy import func, extract
+from sqlalchemy import func, update
 from sqlalchemy.orm import Session
 
 from ..models import Makler, Lead, MaklerCredits
+from .telefonist_cache_service import markiere_telefonist_cache_veraltet
+from .zeitraum_service import im_monat
+
+
+# Toleranz für Rundungsdifferenzen zwischen laufendem Stand und Ledger-Summe
+KONSISTENZ_TOLERANZ = 0.005
 
 
 def berechne_credits_stand(db: Session, makler_id: int) -> float:
     """
-    Berechnet den aktuellen Credits-Stand eines Maklers.
+    Liefert den aktuellen Credits-Stand eines Maklers aus der laufenden Spalte Makler.credits_stand.
+    """
+    result = db.query(Makler.credits_stand).filter(Makler.id == makler_id).scalar()
+    
+    return float(result) if result is not None else 0.0
+
+
+def berechne_credits_stand_aus_ledger(db: Session, makler_id: int) -> float:
+    """
+    Berechnet den Credits-Stand eines Maklers aus allen Transaktionen (SUM über makler_credits).
+    Nur für Konsistenzprüfungen - für normale Abfragen berechne_credits_stand verwenden.
     """
     result = db.query(func.sum(MaklerCredits.betrag)).filter(
         MaklerCredits.makler_id == makler_id
@@ -17,6 +33,59 @@ def berechne_credits_stand(db: Session, makler_id: int) -> float:
     return float(result) if result is not None else 0.0
 
 
+def buche_credits_transaktion(db: Session, transaktion: MaklerCredits) -> MaklerCredits:
+    """
+    Fügt eine Credits-Transaktion hinzu und erhöht/verringert Makler.credits_stand um ihren Betrag.
+    Das UPDATE rechnet in SQL (credits_stand = credits_stand + betrag), läuft in derselben
+    Transaktion wie der Insert und geht daher bei einem Rollback mit verloren. Committet nicht.
+    Der Telefonisten-Cache wird nach dem Commit verworfen, der Tagesplan des Maklers neu berechnet.
+    """
+    from .tagesplan_service import verwerfe_tagesplan  # Import hier, um Zirkelimport zu vermeiden
+    
+    db.add(transaktion)
+    db.execute(
+        update(Makler)
+        .where(Makler.id == transaktion.makler_id)
+        .values(credits_stand=func.coalesce(Makler.credits_stand, 0.0) + transaktion.betrag)
+        .execution_options(synchronize_session="fetch")
+    )
+    verwerfe_tagesplan(db, [transaktion.makler_id])
+    markiere_telefonist_cache_veraltet(db)
+    return transaktion
+
+
+def pruefe_credits_konsistenz(db: Session, korrigieren: bool = False) -> List[Dict[str, Any]]:
+    """
+    Vergleicht Makler.credits_stand mit der Summe aller Transaktionen pro Makler.
+    Gibt die Abweichungen zurück; mit korrigieren=True wird der Stand auf die
+    Ledger-Summe gesetzt (Commit durch den Aufrufer).
+    """
+    ledger = dict(
+        db.query(MaklerCredits.makler_id, func.sum(MaklerCredits.betrag))
+        .group_by(MaklerCredits.makler_id)
+        .all()
+    )
+    abweichungen = []
+    for makler_id, credits_stand in db.query(Makler.id, Makler.credits_stand).all():
+        ledger_summe = float(ledger.get(makler_id) or 0.0)
+        stand = float(credits_stand or 0.0)
+        if abs(stand - ledger_summe) > KONSISTENZ_TOLERANZ:
+            abweichungen.append({
+                "makler_id": makler_id,
+                "credits_stand": stand,
+                "ledger_summe": ledger_summe,
+                "differenz": round(stand - ledger_summe, 2),
+            })
+            if korrigieren:
+                db.execute(
+                    update(Makler)
+                    .where(Makler.id == makler_id)
+                    .values(credits_stand=ledger_summe)
+                    .execution_options(synchronize_session="fetch")
+                )
+    return abweichungen
+
+
 def berechne_preis_fuer_lead(
     makler: Makler,
     lead_qualifiziert_am: datetime,
@@ -81,13 +150,29 @@ def zaehle_leads_im_monat(
             Lead.makler_id == makler_id,
             Lead.status == "qualifiziert",
             Lead.qualifiziert_am.isnot(None),
-            extract("month", Lead.qualifiziert_am) == monat,
-            extract("year", Lead.qualifiziert_am) == jahr,
+            im_monat(Lead.qualifiziert_am, monat, jahr),
         )
         .count()
     )
 
 
+def zaehle_leads_im_monat_pro_makler(db: Session, monat: int, jahr: int) -> Dict[int, int]:
+    """
+    Zählt die qualifizierten Leads aller Makler in einem Monat mit einer gruppierten Abfrage.
+    Gleiche Kriterien wie zaehle_leads_im_monat; Makler ohne Leads fehlen im Ergebnis.
+    """
+    return dict(
+        db.query(Lead.makler_id, func.count(Lead.id))
+        .filter(
+            Lead.makler_id.isnot(None),
+            Lead.status == "qualifiziert",
+            im_monat(Lead.qualifiziert_am, monat, jahr),
+        )
+        .group_by(Lead.makler_id)
+        .all()
+    )
+
+
 def pruefe_und_buche_credits_fuer_lead(
     db: Session,
     makler: Makler,
@@ -136,7 +221,7 @@ def pruefe_und_buche_credits_fuer_lead(
         beschreibung=f"Lead #{lead_id} - {preis:.2f}€"
     )
     
-    db.add(transaktion)
+    buche_credits_transaktion(db, transaktion)
     db.commit()
     
     return True, None, preis
@@ -179,7 +264,7 @@ def erstelle_erstattung_fuer_lead(
         beschreibung=beschreibung or f"Erstattung für Lead #{lead_id}"
     )
     
-    db.add(erstattung)
+    buche_credits_transaktion(db, erstattung)
     db.commit()
     db.refresh(erstattung)
     
@@ -362,7 +447,7 @@ def erstelle_rueckzahlung(
         zahlungsreferenz=str(transaktion_id)  # Verweise auf ursprüngliche Transaktion
     )
     
-    db.add(rueckzahlung)
+    buche_credits_transaktion(db, rueckzahlung)
     db.commit()
     db.refresh(rueckzahlung)
     
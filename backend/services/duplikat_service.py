@@ -0,0 +1,162 @@
+"""
+Service für die Duplikat-Erkennung bei Leads.
+Jeder Lead erhält einen Fingerprint aus normalisierter Telefonnummer, Postleitzahl
+und Anbieter-Name. Über den indizierten Fingerprint lassen sich Duplikate per
+Gleichheitsvergleich finden statt durch paarweisen Vergleich aller Leads.
+"""
+
+import hashlib
+import re
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models import Lead
+
+# Verhalten bei einem gefundenen Duplikat
+DUPLIKAT_MODUS_SKIP = "skip"    # Lead nicht anlegen
+DUPLIKAT_MODUS_MERGE = "merge"  # Leere Felder des vorhandenen Leads ergänzen, keinen neuen anlegen
+DUPLIKAT_MODUS_FLAG = "flag"    # Lead anlegen und als Duplikat markieren
+DUPLIKAT_MODI = [DUPLIKAT_MODUS_SKIP, DUPLIKAT_MODUS_MERGE, DUPLIKAT_MODUS_FLAG]
+
+# Felder, die beim Zusammenführen ergänzt werden (nur wenn beim vorhandenen Lead leer)
+ZUSAMMENFUEHRBARE_FELDER = [
+    'anbieter_name', 'ort', 'grundstuecksflaeche', 'wohnflaeche', 'preis', 'telefonnummer',
+    'features', 'immobilien_typ', 'baujahr', 'lage'
+]
+
+_UMLAUTE = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+
+def normalisiere_telefonnummer(telefonnummer: Optional[str]) -> str:
+    """Reduziert eine Telefonnummer auf Ziffern, internationale Vorwahl +49/0049 wird zu 0"""
+    if not telefonnummer:
+        return ""
+    ziffern = re.sub(r'\D', '', telefonnummer)
+    if telefonnummer.strip().startswith('+'):
+        ziffern = '00' + ziffern
+    if ziffern.startswith('0049'):
+        ziffern = '0' + ziffern[4:]
+    return ziffern
+
+
+def normalisiere_name(name: Optional[str]) -> str:
+    """Kleinschreibung, Umlaute ausgeschrieben, nur Buchstaben/Ziffern, einfache Leerzeichen"""
+    if not name:
+        return ""
+    name = name.lower().translate(_UMLAUTE)
+    name = re.sub(r'[^a-z0-9]+', ' ', name)
+    return name.strip()
+
+
+def berechne_fingerprint(
+    telefonnummer: Optional[str],
+    postleitzahl: Optional[str],
+    anbieter_name: Optional[str]
+) -> Optional[str]:
+    """
+    Berechnet den Fingerprint eines Leads.
+    Gibt None zurück, wenn weder Telefonnummer noch Name vorhanden sind
+    (solche Leads werden nicht als Duplikate erkannt).
+    """
+    telefon = normalisiere_telefonnummer(telefonnummer)
+    name = normalisiere_name(anbieter_name)
+    if not telefon and not name:
+        return None
+    plz = re.sub(r'\D', '', postleitzahl or '')
+    return hashlib.sha1(f"{telefon}|{plz}|{name}".encode('utf-8')).hexdigest()
+
+
+def fingerprint_fuer_lead(lead: Lead) -> Optional[str]:
+    return berechne_fingerprint(lead.telefonnummer, lead.postleitzahl, lead.anbieter_name)
+
+
+def finde_leads_nach_fingerprints(db: Session, fingerprints: Iterable[str]) -> Dict[str, int]:
+    """
+    Sucht zu mehreren Fingerprints den jeweils ältesten vorhandenen Lead (eine indizierte Query).
+    Gibt ein Dict fingerprint -> lead_id zurück.
+    """
+    fingerprints = [fp for fp in set(fingerprints) if fp]
+    if not fingerprints:
+        return {}
+    rows = (
+        db.query(Lead.fingerprint, func.min(Lead.id))
+        .filter(Lead.fingerprint.in_(fingerprints))
+        .group_by(Lead.fingerprint)
+        .all()
+    )
+    return {fp: lead_id for fp, lead_id in rows}
+
+
+def finde_duplikat(db: Session, fingerprint: Optional[str]) -> Optional[int]:
+    """Gibt die ID des ältesten Leads mit gleichem Fingerprint zurück (oder None)"""
+    if not fingerprint:
+        return None
+    return finde_leads_nach_fingerprints(db, [fingerprint]).get(fingerprint)
+
+
+def fuehre_lead_zusammen(db: Session, lead_id: int, daten: dict) -> None:
+    """
+    Ergänzt beim vorhandenen Lead alle leeren Felder mit den neuen Werten
+    (vorhandene Werte werden nie überschrieben). Committet nicht.
+    """
+    werte = {
+        getattr(Lead, feld): func.coalesce(getattr(Lead, feld), daten[feld])
+        for feld in ZUSAMMENFUEHRBARE_FELDER
+        if daten.get(feld) is not None
+    }
+    if werte:
+        db.query(Lead).filter(Lead.id == lead_id).update(werte, synchronize_session=False)
+
+
+def finde_duplikat_gruppen(db: Session, limit: int = 100) -> List[dict]:
+    """
+    Findet Gruppen von Leads mit gleichem Fingerprint (GROUP BY über den Index).
+    Gibt die größten Gruppen zuerst zurück.
+    """
+    anzahl = func.count(Lead.id)
+    gruppen = (
+        db.query(Lead.fingerprint, anzahl)
+        .filter(Lead.fingerprint.isnot(None))
+        .group_by(Lead.fingerprint)
+        .having(anzahl > 1)
+        .order_by(anzahl.desc(), Lead.fingerprint)
+        .limit(limit)
+        .all()
+    )
+    if not gruppen:
+        return []
+
+    leads_nach_fp: Dict[str, List[Lead]] = {}
+    for lead in (
+        db.query(Lead)
+        .filter(Lead.fingerprint.in_([fp for fp, _ in gruppen]))
+        .order_by(Lead.id)
+        .all()
+    ):
+        leads_nach_fp.setdefault(lead.fingerprint, []).append(lead)
+
+    return [
+        {
+            "fingerprint": fp,
+            "anzahl": count,
+            "lead_ids": [lead.id for lead in leads_nach_fp.get(fp, [])],
+            "leads": [
+                {
+                    "id": lead.id,
+                    "lead_nummer": lead.lead_nummer,
+                    "status": lead.status,
+                    "anbieter_name": lead.anbieter_name,
+                    "telefonnummer": lead.telefonnummer,
+                    "postleitzahl": lead.postleitzahl,
+                    "ort": lead.ort,
+                    "makler_id": lead.makler_id,
+                    "erstellt_am": lead.erstellt_am,
+                    "duplikat_von_lead_id": lead.duplikat_von_lead_id,
+                }
+                for lead in leads_nach_fp.get(fp, [])
+            ],
+        }
+        for fp, count in gruppen
+    ]
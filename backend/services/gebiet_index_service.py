@@ -0,0 +1,219 @@
+"""
+Service für den PLZ → Makler Gebiets-Index.
+Hält eine In-Memory-Zuordnung von Postleitzahl zu zuständigen Makler-IDs,
+damit PLZ-Abfragen nicht bei jedem Aufruf alle Makler-Gebiete neu parsen müssen.
+Die Zuordnung wird zusätzlich normalisiert in der Tabelle makler_gebiet gespeichert
+(für indizierte SQL-Abfragen).
+
+Aktualisierung: Jede Gebietsänderung erhöht den Zähler in makler_gebiet_version. Der
+Index vergleicht ihn einmal pro Transaktion (eine Abfrage) mit der Version beim Laden
+und lädt sich neu, sobald ein Gebiet geändert wurde - im eigenen wie in jedem anderen
+Prozess (ein Aktualisierungsweg für alle Worker).
+"""
+
+import threading
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import MaklerGebiet, MaklerGebietVersion
+from ..logging_config import get_logger
+
+logger = get_logger("gebiet_index")
+
+# Länge einer deutschen Postleitzahl (für Präfixe und Bereiche)
+PLZ_LAENGE = 5
+# Einzige Zeile in makler_gebiet_version
+VERSION_ID = 1
+
+# Schlüssel in Session.info: Version wurde in der laufenden Transaktion bereits geprüft
+_SESSION_GEPRUEFT = "gebiet_index_geprueft"
+
+
+# Index: normalisierte PLZ -> Set von Makler-IDs
+_plz_index: Dict[str, Set[int]] = {}
+# Umkehr-Index: Makler-ID -> Set seiner PLZ (für inkrementelle Updates)
+_makler_plz: Dict[int, Set[str]] = {}
+# Version aus makler_gebiet_version, mit der der Index geladen wurde (None = nicht geladen)
+_index_version: Optional[int] = None
+_lock = threading.RLock()
+
+
+def parse_gebiet(gebiet: Optional[str]) -> Set[str]:
+    """
+    Parst ein Makler-Gebiet in ein Set normalisierter Postleitzahlen.
+    Gebiet ist eine kommagetrennte Liste (z.B. "10115, 10117, 10119").
+    
+    Unterstützt zusätzlich:
+      - Präfixe: "541*" -> alle PLZ von 54100 bis 54199
+      - Bereiche: "54100-54199" -> alle PLZ im Bereich (inklusive)
+    """
+    if not gebiet:
+        return set()
+    
+    plz_set = set()
+    for eintrag in gebiet.split(","):
+        eintrag = eintrag.strip()
+        if not eintrag:
+            continue
+        
+        if eintrag.endswith("*"):
+            praefix = eintrag[:-1].strip()
+            # Mindestens eine Ziffer, sonst wäre das Gebiet ganz Deutschland
+            if praefix.isdigit() and 0 < len(praefix) <= PLZ_LAENGE:
+                rest = PLZ_LAENGE - len(praefix)
+                plz_set.update(f"{praefix}{i:0{rest}d}" if rest else praefix for i in range(10 ** rest))
+            else:
+                logger.warning(f"Ungültiger PLZ-Präfix im Gebiet ignoriert: '{eintrag}'")
+            continue
+        
+        if "-" in eintrag:
+            von, _, bis = (teil.strip() for teil in eintrag.partition("-"))
+            if von.isdigit() and bis.isdigit() and len(von) == len(bis) == PLZ_LAENGE and von <= bis:
+                plz_set.update(f"{i:0{PLZ_LAENGE}d}" for i in range(int(von), int(bis) + 1))
+            else:
+                logger.warning(f"Ungültiger PLZ-Bereich im Gebiet ignoriert: '{eintrag}'")
+            continue
+        
+        plz_set.add(eintrag)
+    
+    return plz_set
+
+
+def _setze_makler_plz(makler_id: int, plz_set: Set[str]) -> None:
+    """Ersetzt die PLZ eines Maklers im Index (ohne Lock, Aufrufer hält ihn)"""
+    for plz in _makler_plz.pop(makler_id, set()):
+        makler_ids = _plz_index.get(plz)
+        if makler_ids is not None:
+            makler_ids.discard(makler_id)
+            if not makler_ids:
+                del _plz_index[plz]
+
+    if plz_set:
+        _makler_plz[makler_id] = plz_set
+        for plz in plz_set:
+            _plz_index.setdefault(plz, set()).add(makler_id)
+
+
+def _lade_version(db: Session) -> int:
+    """Aktuelle Gebiets-Version aus der Datenbank (0, falls die Zeile noch fehlt)"""
+    return db.query(MaklerGebietVersion.version).filter(MaklerGebietVersion.id == VERSION_ID).scalar() or 0
+
+
+def _stelle_index_sicher(db: Session) -> None:
+    """
+    Lädt den Index aus der Datenbank, falls er noch nicht geladen ist oder ein Gebiet
+    seitdem geändert wurde. Die Version wird pro Transaktion der Session nur einmal gelesen.
+    """
+    global _index_version
+    if _index_version is not None and db.info.get(_SESSION_GEPRUEFT):
+        return
+
+    version = _lade_version(db)
+    db.info[_SESSION_GEPRUEFT] = True
+    with _lock:
+        if _index_version == version:
+            return
+        _plz_index.clear()
+        _makler_plz.clear()
+        # Index aus der normalisierten Tabelle laden (eine Query, kein String-Parsing)
+        makler_plz: Dict[int, Set[str]] = {}
+        for plz, makler_id in db.query(MaklerGebiet.plz, MaklerGebiet.makler_id).all():
+            makler_plz.setdefault(makler_id, set()).add(plz)
+        for makler_id, plz_set in makler_plz.items():
+            _setze_makler_plz(makler_id, plz_set)
+        _index_version = version
+
+
+@event.listens_for(Session, "after_commit")
+def _nach_commit(session: Session) -> None:
+    session.info.pop(_SESSION_GEPRUEFT, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _nach_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_GEPRUEFT, None)
+
+
+def finde_makler_ids_fuer_plz(db: Session, postleitzahl: Optional[str]) -> List[int]:
+    """
+    Findet alle Makler, die für die gegebene Postleitzahl zuständig sind.
+    Gibt eine aufsteigend sortierte Liste von Makler-IDs zurück.
+    """
+    if not postleitzahl or not postleitzahl.strip():
+        return []
+
+    _stelle_index_sicher(db)
+    with _lock:
+        return sorted(_plz_index.get(postleitzahl.strip(), ()))
+
+
+def get_plz_fuer_makler(db: Session, makler_id: int) -> Set[str]:
+    """Gibt die Postleitzahlen des Gebiets eines Maklers zurück (leeres Set = kein Gebiet)"""
+    _stelle_index_sicher(db)
+    with _lock:
+        return set(_makler_plz.get(makler_id, ()))
+
+
+def _erhoehe_version(db: Session) -> None:
+    """Erhöht die Gebiets-Version (atomares UPDATE, legt die Zeile bei Bedarf an)"""
+    ergebnis = db.execute(
+        update(MaklerGebietVersion)
+        .where(MaklerGebietVersion.id == VERSION_ID)
+        .values(version=MaklerGebietVersion.version + 1)
+    )
+    if ergebnis.rowcount:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(MaklerGebietVersion).values(id=VERSION_ID, version=1))
+    except IntegrityError:
+        # Parallel von einer anderen Anfrage angelegt
+        _erhoehe_version(db)
+
+
+def synchronisiere_makler_gebiet(db: Session, makler_id: int, gebiet: Optional[str]) -> int:
+    """
+    Schreibt das Gebiet eines Maklers normalisiert in die Tabelle makler_gebiet und erhöht
+    die Gebiets-Version (alle Prozesse laden ihren Index nach dem Commit neu). gebiet=None entfernt
+    die Zuordnung (z.B. beim Löschen des Maklers).
+    Committet nicht - muss in derselben Transaktion wie die Makler-Änderung laufen.
+    Gibt die Anzahl der zugeordneten Postleitzahlen zurück.
+    """
+    db.query(MaklerGebiet).filter(MaklerGebiet.makler_id == makler_id).delete(synchronize_session=False)
+    
+    plz_set = parse_gebiet(gebiet)
+    if plz_set:
+        db.execute(
+            insert(MaklerGebiet),
+            [{"makler_id": makler_id, "plz": plz} for plz in sorted(plz_set)]
+        )
+    _erhoehe_version(db)
+    return len(plz_set)
+
+
+def makler_ids_mit_plz_praefix(db: Session, praefix: str):
+    """
+    Gibt eine Subquery mit allen Makler-IDs zurück, deren Gebiet eine PLZ mit dem
+    gegebenen Präfix enthält (indizierte Range-Abfrage auf makler_gebiet.plz).
+    """
+    praefix = praefix.strip()
+    return (
+        db.query(MaklerGebiet.makler_id)
+        .filter(MaklerGebiet.plz >= praefix, MaklerGebiet.plz < praefix + "\uffff")
+        .distinct()
+    )
+
+
+def invalidiere_gebiet_index() -> None:
+    """
+    Verwirft den Index dieses Prozesses, er wird beim nächsten Zugriff neu aufgebaut.
+    Nach Gebietsänderungen nicht nötig, dafür sorgt die Gebiets-Version.
+    """
+    global _index_version
+    with _lock:
+        _plz_index.clear()
+        _makler_plz.clear()
+        _index_version = None
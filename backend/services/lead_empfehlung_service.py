@@ -4,169 +4,24 @@ Berechnet, welchen Lead ein Telefonist als nächstes anrufen soll.
 """
 
 from datetime import datetime, date, timedelta
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Set
 from sqlalchemy.orm import Session
-from sqlalchemy import extract, and_, or_
+from sqlalchemy import and_, or_, update
 
-from ..models import Makler, Lead
-from .organisation_service import berechne_makler_status
-from .abrechnung_service import ist_makler_in_monat_aktiv, berechne_vertragsmonat, kann_makler_neue_leads_bekommen
+from ..models import Makler, Lead, MaklerGebiet
+from .abrechnung_service import kann_makler_neue_leads_bekommen
+from .gebiet_index_service import get_plz_fuer_makler
+from .tagesplan_service import (  # noqa: F401 - Tagessatz-Berechnung liegt im Tagesplan-Service
+    berechne_arbeitstage_bis_monatsende,
+    berechne_tagessatz_fuer_makler,
+    lade_tagesplan,
+    tagesplan_info
+)
 
-
-def berechne_arbeitstage_bis_monatsende(aktuelles_datum: date) -> int:
-    """
-    Berechnet die Anzahl der Arbeitstage (Mo-Fr) bis zum Monatsende.
-    
-    Args:
-        aktuelles_datum: Das aktuelle Datum
-    
-    Returns:
-        Anzahl der Arbeitstage (ohne Wochenende)
-    """
-    # Letzter Tag des Monats
-    if aktuelles_datum.month == 12:
-        letzter_tag = date(aktuelles_datum.year + 1, 1, 1) - timedelta(days=1)
-    else:
-        letzter_tag = date(aktuelles_datum.year, aktuelles_datum.month + 1, 1) - timedelta(days=1)
-    
-    arbeitstage = 0
-    aktueller_tag = aktuelles_datum
-    
-    while aktueller_tag <= letzter_tag:
-        # 0 = Montag, 6 = Sonntag
-        wochentag = aktueller_tag.weekday()
-        if wochentag < 5:  # Montag bis Freitag
-            arbeitstage += 1
-        aktueller_tag += timedelta(days=1)
-    
-    return arbeitstage
-
-
-def berechne_tagessatz_fuer_makler(
-    db: Session,
-    makler: Makler,
-    monat: int,
-    jahr: int,
-    aktuelles_datum: date
-) -> Dict[str, Any]:
-    """
-    Berechnet den Tagessatz (wie viele Leads muss dieser Makler heute noch bekommen)
-    und die noch benötigten Leads für den Monat.
-    
-    Args:
-        db: Datenbank-Session
-        makler: Der Makler
-        monat: Monat (1-12)
-        jahr: Jahr
-        aktuelles_datum: Das aktuelle Datum
-    
-    Returns:
-        Dict mit tagessatz, noch_benoetigt, ist_leads, soll_leads, arbeitstage_noch
-    """
-    status_info = berechne_makler_status(db, makler, monat, jahr)
-    
-    # Prüfe ob Makler neue Leads bekommen kann (für Lead-Zuweisungen)
-    # WICHTIG: Verwendet kann_makler_neue_leads_bekommen statt ist_makler_in_monat_aktiv,
-    # da pausierte Makler keine neuen Leads bekommen sollen
-    if not kann_makler_neue_leads_bekommen(makler, monat, jahr):
-        return {
-            "tagessatz": 0,
-            "noch_benoetigt": 0,
-            "ist_leads": 0,
-            "soll_leads": None,
-            "arbeitstage_noch": 0,
-            "kann_leads": False
-        }
-    
-    ist_leads = status_info.get("ist_leads", 0)
-    arbeitstage_noch = berechne_arbeitstage_bis_monatsende(aktuelles_datum)
-    
-    # Altes System
-    if makler.rechnungssystem_typ == "alt" or (makler.rechnungssystem_typ is None):
-        vertragsmonat = berechne_vertragsmonat(makler.vertragsstart_datum, monat, jahr)
-        
-        # Soll-Leads bestimmen
-        if makler.monatliche_soll_leads is not None:
-            soll_leads = makler.monatliche_soll_leads
-        elif vertragsmonat == 1 and makler.testphase_leads > 0:
-            soll_leads = makler.testphase_leads
-        else:
-            soll_leads = None  # Unbegrenzt
-        
-        if soll_leads is None:
-            # Unbegrenzt: Kein Tagessatz, aber kann Leads bekommen
-            return {
-                "tagessatz": 0,  # Kein fester Tagessatz bei unbegrenzt
-                "noch_benoetigt": None,  # Unbegrenzt
-                "ist_leads": ist_leads,
-                "soll_leads": None,
-                "arbeitstage_noch": arbeitstage_noch,
-                "kann_leads": True,
-                "prioritaet": "normal"
-            }
-        else:
-            noch_benoetigt = max(0, soll_leads - ist_leads)
-            if noch_benoetigt == 0:
-                tagessatz = 0
-                prioritaet = "niedrig"
-            elif arbeitstage_noch > 0:
-                tagessatz = noch_benoetigt / arbeitstage_noch
-                prioritaet = "hoch" if tagessatz >= 1.0 else "normal"
-            else:
-                tagessatz = noch_benoetigt  # Heute noch alles
-                prioritaet = "hoch"
-            
-            return {
-                "tagessatz": tagessatz,
-                "noch_benoetigt": noch_benoetigt,
-                "ist_leads": ist_leads,
-                "soll_leads": soll_leads,
-                "arbeitstage_noch": arbeitstage_noch,
-                "kann_leads": noch_benoetigt > 0,
-                "prioritaet": prioritaet
-            }
-    
-    # Neues System (Credits)
-    else:
-        credits_stand = status_info.get("credits_stand", 0)
-        verfuegbare_leads = status_info.get("verfuegbare_leads", 0)
-        naechster_lead_preis = status_info.get("naechster_lead_preis", 0)
-        
-        if credits_stand < naechster_lead_preis:
-            # Keine Credits
-            return {
-                "tagessatz": 0,
-                "noch_benoetigt": 0,
-                "ist_leads": ist_leads,
-                "soll_leads": None,
-                "arbeitstage_noch": arbeitstage_noch,
-                "kann_leads": False,
-                "prioritaet": "niedrig"
-            }
-        
-        # Bei Credits-System: Verfuegbare Leads gleichmäßig verteilen
-        if verfuegbare_leads == 0:
-            tagessatz = 0
-            prioritaet = "niedrig"
-        elif arbeitstage_noch > 0:
-            # Gleichmäßige Verteilung der verfügbaren Leads
-            tagessatz = verfuegbare_leads / arbeitstage_noch
-            prioritaet = "hoch" if tagessatz >= 1.0 else "normal"
-        else:
-            tagessatz = verfuegbare_leads
-            prioritaet = "hoch"
-        
-        return {
-            "tagessatz": tagessatz,
-            "noch_benoetigt": verfuegbare_leads,
-            "ist_leads": ist_leads,
-            "soll_leads": None,  # Credits-System hat kein festes Soll
-            "arbeitstage_noch": arbeitstage_noch,
-            "kann_leads": verfuegbare_leads > 0,
-            "prioritaet": prioritaet,
-            "credits_stand": credits_stand,
-            "verfuegbare_leads": verfuegbare_leads
-        }
+# Nach wie vielen Minuten ein Lead-Lock automatisch abläuft
+LOCK_TIMEOUT_MINUTEN = 30
+# Gebiete bis zu dieser Anzahl PLZ werden als IN-Liste abgefragt, größere per Join
+GEBIET_IN_LISTE_MAX = 500
 
 
 def zaehle_leads_heute_fuer_makler(
@@ -204,71 +59,213 @@ def zaehle_leads_heute_fuer_makler(
     return anzahl
 
 
+def lead_nicht_gesperrt_filter(
+    aktueller_user_id: Optional[int] = None,
+    timeout_minuten: int = LOCK_TIMEOUT_MINUTEN
+):
+    """
+    SQL-Gegenstück zu ist_lead_gesperrt(): Filter-Ausdruck für Leads, die nicht von einem
+    anderen Telefonisten bearbeitet werden (kein Lock, eigener Lock oder Lock abgelaufen).
+    """
+    bedingungen = [
+        Lead.bearbeitet_von_user_id.is_(None),
+        Lead.bearbeitet_seit < datetime.utcnow() - timedelta(minutes=timeout_minuten),
+    ]
+    if aktueller_user_id:
+        bedingungen.append(Lead.bearbeitet_von_user_id == aktueller_user_id)
+    return or_(*bedingungen)
+
+
+def _freie_leads_query(
+    db: Session,
+    aktueller_user_id: Optional[int] = None,
+    makler_id: Optional[int] = None,
+    gebiet_plz: Optional[Set[str]] = None
+):
+    """
+    Query auf unqualifizierte, nicht gesperrte Leads ohne Makler-Zuordnung, älteste zuerst.
+    
+    Ohne makler_id nur nach Alter (Index idx_leads_status_erstellt_am). Mit makler_id nur
+    Leads, deren PLZ im Gebiet dieses Maklers liegt (gebiet_plz: PLZ aus dem Gebiets-Index,
+    sonst werden sie geladen). Kleine Gebiete werden als IN-Liste über den Index
+    idx_leads_status_plz_erstellt_am abgefragt - so bleibt die Abfrage auch dann schnell,
+    wenn im Gebiet kein freier Lead liegt. Große Gebiete per Join auf makler_gebiet.
+    Die PLZ wird so verglichen, wie sie gespeichert ist.
+    """
+    query = db.query(Lead)
+    if makler_id is not None:
+        if gebiet_plz is None:
+            gebiet_plz = get_plz_fuer_makler(db, makler_id)
+        if len(gebiet_plz) <= GEBIET_IN_LISTE_MAX:
+            query = query.filter(Lead.postleitzahl.in_(sorted(gebiet_plz)))
+        else:
+            query = query.join(
+                MaklerGebiet,
+                and_(MaklerGebiet.plz == Lead.postleitzahl, MaklerGebiet.makler_id == makler_id)
+            )
+    return (
+        query.filter(
+            Lead.status == "unqualifiziert",
+            Lead.makler_id.is_(None),
+            lead_nicht_gesperrt_filter(aktueller_user_id),
+        )
+        .order_by(Lead.erstellt_am, Lead.id)
+    )
+
+
+def finde_aeltesten_freien_lead(
+    db: Session,
+    aktueller_user_id: Optional[int] = None,
+    makler_id: Optional[int] = None,
+    gebiet_plz: Optional[Set[str]] = None
+) -> Optional[Lead]:
+    """
+    Liefert den ältesten unqualifizierten, nicht gesperrten Lead ohne Makler-Zuordnung
+    (optional im Gebiet eines Maklers, siehe _freie_leads_query).
+    """
+    return _freie_leads_query(db, aktueller_user_id, makler_id, gebiet_plz).first()
+
+
+def beanspruche_aeltesten_freien_lead(
+    db: Session,
+    aktueller_user_id: int,
+    makler_id: Optional[int] = None,
+    gebiet_plz: Optional[Set[str]] = None
+) -> Optional[Lead]:
+    """
+    Sperrt den ältesten freien Lead (wie finde_aeltesten_freien_lead) für den Telefonisten.
+    
+    Auswahl und Sperre laufen in einem einzigen bedingten UPDATE
+    (UPDATE leads ... WHERE id = (SELECT ... LIMIT 1) AND <nicht gesperrt>): Gleichzeitige
+    Aufrufe bekommen dadurch verschiedene Leads. Unter PostgreSQL überspringt die Auswahl
+    per FOR UPDATE SKIP LOCKED Zeilen, die gerade von einem anderen Aufruf gesperrt werden,
+    unter SQLite sind Schreibzugriffe ohnehin serialisiert.
+    Committet nicht. Gibt None zurück, wenn kein freier Lead vorhanden ist.
+    """
+    kandidat = (
+        _freie_leads_query(db, aktueller_user_id, makler_id, gebiet_plz)
+        .with_entities(Lead.id)
+        .limit(1)
+        .with_for_update(skip_locked=True, of=Lead)
+        .scalar_subquery()
+    )
+    lead_id = db.execute(
+        update(Lead)
+        .where(Lead.id == kandidat, lead_nicht_gesperrt_filter(aktueller_user_id))
+        .values(bearbeitet_von_user_id=aktueller_user_id, bearbeitet_seit=datetime.utcnow())
+        .returning(Lead.id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if lead_id is None:
+        return None
+    return db.get(Lead, lead_id, populate_existing=True)
+
+
+def beanspruche_lead(db: Session, lead_id: int, aktueller_user_id: int) -> bool:
+    """
+    Sperrt einen bestimmten Lead für den Telefonisten (bedingtes UPDATE, kein Lesen-Prüfen-Schreiben).
+    Gelingt, wenn der Lead frei ist, bereits vom Telefonisten gesperrt ist oder der Lock
+    eines anderen abgelaufen ist. Verlängert einen eigenen Lock. Committet nicht.
+    """
+    ergebnis = db.execute(
+        update(Lead)
+        .where(Lead.id == lead_id, lead_nicht_gesperrt_filter(aktueller_user_id))
+        .values(bearbeitet_von_user_id=aktueller_user_id, bearbeitet_seit=datetime.utcnow())
+        .execution_options(synchronize_session="fetch")
+    )
+    return ergebnis.rowcount == 1
+
+
+def verlaengere_lead_lock(db: Session, lead_id: int, aktueller_user_id: int) -> bool:
+    """
+    Heartbeat: Verlängert den Lock des Telefonisten auf einen unqualifizierten Lead um
+    LOCK_TIMEOUT_MINUTEN ab jetzt. Gibt False zurück, wenn der Lead inzwischen von einem
+    anderen Telefonisten übernommen (oder bereits bearbeitet) wurde. Committet nicht.
+    """
+    ergebnis = db.execute(
+        update(Lead)
+        .where(
+            Lead.id == lead_id,
+            Lead.status == "unqualifiziert",
+            Lead.bearbeitet_von_user_id == aktueller_user_id,
+        )
+        .values(bearbeitet_seit=datetime.utcnow())
+        .execution_options(synchronize_session="fetch")
+    )
+    return ergebnis.rowcount == 1
+
+
+def gib_lead_frei(db: Session, lead_id: int, aktueller_user_id: int) -> bool:
+    """Hebt den eigenen Lock auf einen Lead auf. Committet nicht."""
+    ergebnis = db.execute(
+        update(Lead)
+        .where(Lead.id == lead_id, Lead.bearbeitet_von_user_id == aktueller_user_id)
+        .values(bearbeitet_von_user_id=None, bearbeitet_seit=None)
+        .execution_options(synchronize_session="fetch")
+    )
+    return ergebnis.rowcount == 1
+
+
+def lock_ablauf(lead: Lead) -> Optional[datetime]:
+    """Zeitpunkt (UTC), zu dem der Lock auf den Lead abläuft (None, wenn nicht gesperrt)"""
+    if not lead.bearbeitet_von_user_id or not lead.bearbeitet_seit:
+        return None
+    return lead.bearbeitet_seit + timedelta(minutes=LOCK_TIMEOUT_MINUTEN)
+
+
 def finde_besten_lead_fuer_telefonist(
     db: Session,
-    unqualifizierte_leads: List[Lead],
     alle_makler: List[Makler],
-    aktueller_user_id: Optional[int] = None
+    aktueller_user_id: Optional[int] = None,
+    beanspruchen: bool = False
 ) -> Optional[Dict[str, Any]]:
     """
     Findet den besten Lead, den ein Telefonist als nächstes anrufen soll,
     und schlägt direkt einen Makler für die Qualifizierung vor.
     
     Algorithmus für gleichmäßige Verteilung:
-    1. Berechne für jeden Makler den Tagessatz (noch_benoetigt / arbeitstage_noch)
-    2. Zähle, wie viele Leads jeder Makler heute bereits bekommen hat
-    3. Berechne den "Rückstand" = tagessatz - leads_heute
+    1. Tagessatz (noch_benoetigt / arbeitstage_noch) pro Makler aus dem Tagesplan
+    2. Heute bereits gelieferte Leads pro Makler aus dem Tagesplan
+    3. "Rückstand" = tagessatz - leads_heute (siehe tagesplan_service.tagesplan_info)
     4. Priorisiere Makler mit höchstem Rückstand (braucht noch am meisten heute)
-    5. Finde Leads, die zu diesem Makler passen (PLZ/Gebiet)
-    6. Nimm den ältesten passenden Lead
+    5. Suche per indizierter Abfrage den ältesten freien Lead im Gebiet des Maklers
+       (Makler ohne Gebiet: ältester freier Lead überhaupt)
     
     WICHTIG: Der Algorithmus sorgt für gleichmäßige Verteilung über den Monat.
     
     Args:
         db: Datenbank-Session
-        unqualifizierte_leads: Liste aller unqualifizierten Leads
         alle_makler: Liste aller Makler
+        aktueller_user_id: ID des Telefonisten (eigene Locks gelten nicht als gesperrt)
+        beanspruchen: Empfohlenen Lead direkt für den Telefonisten sperren
+            (beanspruche_aeltesten_freien_lead, Commit durch den Aufrufer)
     
     Returns:
         Dict mit lead_id, makler_id, makler_name, grund, tagessatz oder None
     """
-    if not unqualifizierte_leads:
+    # Ältester freier Lead ohne Gebietsbedingung (auch Basis für die Fallbacks unten)
+    aeltester_lead = finde_aeltesten_freien_lead(db, aktueller_user_id)
+    if aeltester_lead is None:
         return None
     
-    jetzt = datetime.now()
-    aktuelles_datum = jetzt.date()
-    aktueller_monat = jetzt.month
-    aktuelles_jahr = jetzt.year
+    def hole_lead(makler_id: Optional[int] = None, gebiet_plz: Optional[Set[str]] = None) -> Optional[Lead]:
+        if beanspruchen:
+            return beanspruche_aeltesten_freien_lead(db, aktueller_user_id, makler_id, gebiet_plz)
+        if makler_id is None:
+            return aeltester_lead
+        return finde_aeltesten_freien_lead(db, aktueller_user_id, makler_id, gebiet_plz)
     
-    # Berechne Tagessatz und Rückstand für alle aktiven Makler
+    # Tagessatz und Rückstand aller Makler aus dem vorberechneten Tagesplan
+    tagesplan = lade_tagesplan(db)
     makler_tagessaetze = []
     
     for makler in alle_makler:
-        tagessatz_info = berechne_tagessatz_fuer_makler(
-            db, makler, aktueller_monat, aktuelles_jahr, aktuelles_datum
-        )
-        
+        zeile = tagesplan.get(makler.id)
+        if zeile is None:
+            continue
+        tagessatz_info = tagesplan_info(zeile)
         if tagessatz_info["kann_leads"]:
-            # Zähle Leads, die der Makler heute bereits bekommen hat
-            leads_heute = zaehle_leads_heute_fuer_makler(db, makler.id, aktuelles_datum)
-            
-            # Berechne Rückstand: Wie viele Leads fehlen noch heute?
-            tagessatz = tagessatz_info["tagessatz"]
-            if tagessatz is None or tagessatz == 0:
-                # Unbegrenzt oder kein Tagessatz: Rückstand = 1 (immer priorisieren)
-                rueckstand = 1.0
-            else:
-                rueckstand = max(0, tagessatz - leads_heute)
-            
-            makler_tagessaetze.append({
-                "makler": makler,
-                "tagessatz": tagessatz_info["tagessatz"],
-                "noch_benoetigt": tagessatz_info["noch_benoetigt"],
-                "prioritaet": tagessatz_info["prioritaet"],
-                "leads_heute": leads_heute,
-                "rueckstand": rueckstand,
-                **tagessatz_info
-            })
+            makler_tagessaetze.append({"makler": makler, **tagessatz_info})
     
     # Sortiere nach Rückstand (höchster zuerst) für gleichmäßige Verteilung
     # Makler mit höherem Rückstand werden zuerst bedient
@@ -281,37 +278,17 @@ def finde_besten_lead_fuer_telefonist(
     for makler_info in makler_tagessaetze:
         makler = makler_info["makler"]
         
-        # Parse Gebiet des Maklers
-        makler_plz_liste = []
-        if makler.gebiet:
-            makler_plz_liste = [plz.strip() for plz in makler.gebiet.split(",") if plz.strip()]
+        # Gebiet des Maklers aus dem Gebiets-Index (wird nicht pro Aufruf neu geparst)
+        makler_plz_liste = get_plz_fuer_makler(db, makler.id)
         
-        # Finde Leads, die zu diesem Makler passen
-        passende_leads = []
-        
-        for lead in unqualifizierte_leads:
-            # Prüfe ob Lead bereits einem Makler zugeordnet ist
-            if lead.makler_id:
-                continue
-            
-            # Prüfe PLZ-Match
-            if lead.postleitzahl:
-                lead_plz = lead.postleitzahl.strip()
-                if makler_plz_liste and lead_plz in makler_plz_liste:
-                    passende_leads.append(lead)
-                elif not makler_plz_liste:
-                    # Makler hat kein Gebiet definiert - kann alle Leads bekommen
-                    passende_leads.append(lead)
-            elif not makler_plz_liste:
-                # Lead hat keine PLZ, Makler hat kein Gebiet - passt
-                passende_leads.append(lead)
+        # Ältesten passenden Lead direkt in SQL suchen (Gebiet per Join auf makler_gebiet)
+        if makler_plz_liste:
+            bester_lead = hole_lead(makler.id, makler_plz_liste)
+        else:
+            # Makler hat kein Gebiet definiert - kann alle Leads bekommen
+            bester_lead = hole_lead()
         
-        # Wenn passende Leads gefunden, nimm den ältesten
-        if passende_leads:
-            # Sortiere nach Erstellungsdatum (ältester zuerst)
-            passende_leads.sort(key=lambda l: l.erstellt_am if l.erstellt_am else datetime.min)
-            bester_lead = passende_leads[0]
-            
+        if bester_lead is not None:
             # Formuliere klaren Grund mit Info zur gleichmäßigen Verteilung
             if makler_info["tagessatz"] and makler_info["tagessatz"] > 0:
                 leads_heute = makler_info.get("leads_heute", 0)
@@ -336,64 +313,54 @@ def finde_besten_lead_fuer_telefonist(
             }
     
     # Falls kein Makler mit passenden Leads gefunden wurde, aber es gibt Makler die Leads brauchen,
-    # nimm den ersten verfügbaren Makler und den ältesten Lead
-    if makler_tagessaetze and unqualifizierte_leads:
+    # nimm den ersten verfügbaren Makler und den ältesten Lead (ohne Makler-Zuordnung)
+    aeltester_lead = hole_lead()
+    if aeltester_lead is None:
+        return None
+    
+    if makler_tagessaetze:
         # Nimm den Makler mit höchster Priorität
         bester_makler_info = makler_tagessaetze[0]
         bester_makler = bester_makler_info["makler"]
         
-        # Nimm den ältesten unqualifizierten Lead (ohne Makler-Zuordnung)
-        unqualifizierte_ohne_makler = [l for l in unqualifizierte_leads if not l.makler_id]
-        if unqualifizierte_ohne_makler:
-            unqualifizierte_ohne_makler.sort(key=lambda l: l.erstellt_am if l.erstellt_am else datetime.min)
-            bester_lead = unqualifizierte_ohne_makler[0]
-            
-            grund = f"Qualifiziere für {bester_makler.firmenname} - passt zu Gebiet"
-            if bester_makler_info["tagessatz"] > 0:
-                grund += f" (benötigt {bester_makler_info['tagessatz']:.1f} Leads/Tag)"
-            
-            return {
-                "lead_id": bester_lead.id,
-                "lead_nummer": bester_lead.lead_nummer or bester_lead.id,
-                "makler_id": bester_makler.id,
-                "makler_name": bester_makler.firmenname,
-                "grund": grund,
-                "tagessatz": bester_makler_info["tagessatz"],
-                "noch_benoetigt": bester_makler_info["noch_benoetigt"],
-                "prioritaet": bester_makler_info["prioritaet"],
-                "postleitzahl": bester_lead.postleitzahl,
-                "ort": bester_lead.ort,
-                "empfehlung": f"Qualifiziere Lead #{bester_lead.lead_nummer or bester_lead.id} für {bester_makler.firmenname}"
-            }
+        grund = f"Qualifiziere für {bester_makler.firmenname} - passt zu Gebiet"
+        if bester_makler_info["tagessatz"] > 0:
+            grund += f" (benötigt {bester_makler_info['tagessatz']:.1f} Leads/Tag)"
+        
+        return {
+            "lead_id": aeltester_lead.id,
+            "lead_nummer": aeltester_lead.lead_nummer or aeltester_lead.id,
+            "makler_id": bester_makler.id,
+            "makler_name": bester_makler.firmenname,
+            "grund": grund,
+            "tagessatz": bester_makler_info["tagessatz"],
+            "noch_benoetigt": bester_makler_info["noch_benoetigt"],
+            "prioritaet": bester_makler_info["prioritaet"],
+            "postleitzahl": aeltester_lead.postleitzahl,
+            "ort": aeltester_lead.ort,
+            "empfehlung": f"Qualifiziere Lead #{aeltester_lead.lead_nummer or aeltester_lead.id} für {bester_makler.firmenname}"
+        }
     
     # Fallback: Nur Lead ohne Makler-Vorschlag (sollte selten vorkommen)
-    if unqualifizierte_leads:
-        unqualifizierte_ohne_makler = [l for l in unqualifizierte_leads if not l.makler_id]
-        if unqualifizierte_ohne_makler:
-            unqualifizierte_ohne_makler.sort(key=lambda l: l.erstellt_am if l.erstellt_am else datetime.min)
-            aeltester_lead = unqualifizierte_ohne_makler[0]
-            
-            return {
-                "lead_id": aeltester_lead.id,
-                "lead_nummer": aeltester_lead.lead_nummer or aeltester_lead.id,
-                "makler_id": None,
-                "makler_name": None,
-                "grund": "Kein Makler verfügbar - bitte manuell zuordnen",
-                "tagessatz": 0,
-                "noch_benoetigt": 0,
-                "prioritaet": "niedrig",
-                "postleitzahl": aeltester_lead.postleitzahl,
-                "ort": aeltester_lead.ort,
-                "empfehlung": f"Lead #{aeltester_lead.lead_nummer or aeltester_lead.id} anrufen - Makler manuell zuordnen"
-            }
-    
-    return None
+    return {
+        "lead_id": aeltester_lead.id,
+        "lead_nummer": aeltester_lead.lead_nummer or aeltester_lead.id,
+        "makler_id": None,
+        "makler_name": None,
+        "grund": "Kein Makler verfügbar - bitte manuell zuordnen",
+        "tagessatz": 0,
+        "noch_benoetigt": 0,
+        "prioritaet": "niedrig",
+        "postleitzahl": aeltester_lead.postleitzahl,
+        "ort": aeltester_lead.ort,
+        "empfehlung": f"Lead #{aeltester_lead.lead_nummer or aeltester_lead.id} anrufen - Makler manuell zuordnen"
+    }
 
 
 def ist_lead_gesperrt(
     lead: Lead,
     aktueller_user_id: Optional[int] = None,
-    timeout_minuten: int = 30
+    timeout_minuten: int = LOCK_TIMEOUT_MINUTEN
 ) -> bool:
     """
     Prüft, ob ein Lead gesperrt ist (von einem anderen Telefonisten bearbeitet wird).
@@ -414,20 +381,39 @@ def ist_lead_gesperrt(
         return False
     
     # Prüfe Timeout: Wenn Lock älter als timeout_minuten ist, gilt er als abgelaufen
+    # (bearbeitet_seit wird in UTC gespeichert)
     if lead.bearbeitet_seit:
-        lock_alter = (datetime.now() - lead.bearbeitet_seit).total_seconds() / 60
+        lock_alter = (datetime.utcnow() - lead.bearbeitet_seit).total_seconds() / 60
         if lock_alter > timeout_minuten:
             return False  # Lock ist abgelaufen
     
     return True  # Lead ist gesperrt
 
 
+def beanspruche_naechsten_lead(db: Session, aktueller_user_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Ermittelt den nächsten empfohlenen Lead wie get_lead_empfehlung_fuer_telefonist und sperrt
+    ihn atomar für den Telefonisten. Gleichzeitige Aufrufe erhalten verschiedene Leads.
+    Committet nicht.
+    
+    Returns:
+        Empfehlung (wie "empfehlung" der Lead-Empfehlung) mit gesperrt_bis, oder None
+    """
+    alle_makler = db.query(Makler).all()
+    empfehlung = finde_besten_lead_fuer_telefonist(db, alle_makler, aktueller_user_id, beanspruchen=True)
+    if empfehlung is None:
+        return None
+    lead = db.get(Lead, empfehlung["lead_id"])
+    return {**empfehlung, "gesperrt_bis": lock_ablauf(lead)}
+
+
 def get_lead_empfehlung_fuer_telefonist(
     db: Session,
     aktueller_user_id: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Hauptfunktion: Gibt eine Lead-Empfehlung für den Telefonisten zurück.
+    Committet nicht (fehlende Tagesplan-Zeilen werden angelegt, siehe lade_tagesplan).
     
     Args:
         db: Datenbank-Session
@@ -441,34 +427,25 @@ def get_lead_empfehlung_fuer_telefonist(
     aktueller_monat = jetzt.month
     aktuelles_jahr = jetzt.year
     
-    # Hole alle unqualifizierten Leads, die nicht von anderen Telefonisten bearbeitet werden
-    unqualifizierte_leads_query = (
-        db.query(Lead)
-        .filter(Lead.status == "unqualifiziert")
-    )
-    
-    # Filtere Leads, die von anderen Telefonisten bearbeitet werden (außer wenn Lock abgelaufen ist)
-    unqualifizierte_leads = []
-    for lead in unqualifizierte_leads_query.all():
-        if not ist_lead_gesperrt(lead, aktueller_user_id):
-            unqualifizierte_leads.append(lead)
-    
     # Hole alle aktiven Makler
     alle_makler = db.query(Makler).all()
     
-    # Finde besten Lead (mit Locking-Berücksichtigung)
-    empfehlung = finde_besten_lead_fuer_telefonist(db, unqualifizierte_leads, alle_makler, aktueller_user_id)
+    # Finde besten Lead (Locks anderer Telefonisten werden in SQL ausgefiltert,
+    # es werden keine unqualifizierten Leads mehr komplett geladen)
+    empfehlung = finde_besten_lead_fuer_telefonist(db, alle_makler, aktueller_user_id)
     
-    # Berechne Übersicht für alle Makler (nur aktive, nicht pausierte)
+    # Übersicht für alle Makler (nur aktive, nicht pausierte) aus dem Tagesplan
+    tagesplan = lade_tagesplan(db, aktuelles_datum)
     uebersicht = []
     for makler in alle_makler:
         # Prüfe ob Makler pausiert ist - pausierte Makler werden nicht in der Übersicht angezeigt
         if not kann_makler_neue_leads_bekommen(makler, aktueller_monat, aktuelles_jahr):
             continue  # Überspringe pausierte Makler
         
-        tagessatz_info = berechne_tagessatz_fuer_makler(
-            db, makler, aktueller_monat, aktuelles_jahr, aktuelles_datum
-        )
+        zeile = tagesplan.get(makler.id)
+        if zeile is None:
+            continue
+        tagessatz_info = tagesplan_info(zeile)
         
         if tagessatz_info["kann_leads"]:
             uebersicht.append({
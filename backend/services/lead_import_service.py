@@ -0,0 +1,826 @@
+"""
+Service für den CSV-Lead-Import.
+Liest die Datei gestreamt (ohne sie komplett in den Speicher zu laden), löst
+Makler pro Datei nur einmal auf und schreibt die Leads per Bulk-INSERT in Batches.
+Der Fortschritt wird nach jedem Batch im ImportJob gespeichert; Jobs laufen in
+einem lokalen Worker-Pool und können nach einem Abbruch fortgesetzt werden.
+"""
+
+import codecs
+import csv
+import io
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, or_
+from sqlalchemy.orm import Session
+
+from ..config import IMPORT_BATCH_GROESSE, IMPORT_DUPLIKAT_MODUS, IMPORT_JOB_TIMEOUT_MINUTEN, IMPORT_WORKER_ANZAHL
+from ..database import SessionLocal
+from ..models import ImportJob, Lead, Makler
+from ..models.lead import LeadStatusEnum
+from .duplikat_service import (
+    DUPLIKAT_MODUS_MERGE,
+    DUPLIKAT_MODUS_SKIP,
+    ZUSAMMENFUEHRBARE_FELDER,
+    berechne_fingerprint,
+    finde_leads_nach_fingerprints,
+    fuehre_lead_zusammen
+)
+from .gebiet_index_service import finde_makler_ids_fuer_plz
+from .lead_nummer_service import reserviere_lead_nummern
+from ..logging_config import get_logger
+
+logger = get_logger("lead_import")
+
+# Größe der Stichprobe für Encoding- und Formaterkennung
+PROBE_GROESSE = 64 * 1024
+# Maximale Anzahl gespeicherter Fehlerdetails pro Job
+MAX_FEHLER_DETAILS = 100
+
+# cp1252 vor latin-1: latin-1 dekodiert jedes Byte und würde z.B. das €-Zeichen verfälschen
+ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+
+ERWARTETE_SPALTEN = {
+    'anbieter_name': ['anbieter_name', 'anbieter', 'name', 'anbieter name'],
+    'postleitzahl': ['postleitzahl', 'plz', 'postleitzahl'],
+    'ort': ['ort', 'stadt', 'wohnort'],
+    'grundstuecksflaeche': ['grundstücksfläche', 'grundstuecksflaeche', 'grundstücksflaeche', 'grundstücksfläche (m²)', 'grundstücksfläche m²'],
+    'wohnflaeche': ['wohnfläche', 'wohnflaeche', 'wohnfläche (m²)', 'wohnfläche m²'],
+    'preis': ['preis', 'preis (€)', 'preis (euro)', 'preis €', 'preis in euro', 'preis in €'],
+    'telefonnummer': ['telefonnummer', 'telefon', 'tel', 'handy'],
+    'features': ['features', 'ausstattung', 'merkmale', 'eigenschaften'],
+    'immobilien_typ': ['immobilien_typ', 'immobilientyp', 'immobilien typ', 'typ'],
+    'baujahr': ['baujahr', 'baujahr (jjjj)'],
+    'lage': ['lage', 'lagebeschreibung']
+}
+
+KATEGORIE_SCHLUESSELWOERTER = [
+    'anbieter', 'postleitzahl', 'plz', 'ort', 'stadt', 'grundstücksfläche',
+    'grundstuecksflaeche', 'wohnfläche', 'wohnflaeche', 'preis', 'preis (€)', 'preis (euro)',
+    'telefon', 'tel', 'features', 'ausstattung', 'makler', 'immobilien_typ', 'immobilientyp',
+    'baujahr', 'lage', 'lagebeschreibung'
+]
+
+MAKLER_SCHLUESSEL = ['makler_id', 'makler_name', 'makler_email', 'makler']
+
+# Lokaler Worker-Pool für Import-Jobs (wird beim ersten Job erzeugt)
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def detect_delimiter(content: str) -> str:
+    """Erkennt das Trennzeichen einer CSV-Datei (Komma oder Semikolon)."""
+    # Prüfe erste nicht-leere Zeile
+    lines = content.strip().split('\n')
+    for line in lines[:5]:  # Prüfe erste 5 Zeilen
+        if not line.strip():
+            continue
+        
+        # Zähle Kommas und Semikolons
+        comma_count = line.count(',')
+        semicolon_count = line.count(';')
+        
+        # Wenn mehr Semikolons als Kommas, verwende Semikolon
+        if semicolon_count > comma_count:
+            logger.debug(f"Semikolon als Trennzeichen erkannt (Kommas: {comma_count}, Semikolons: {semicolon_count})")
+            return ';'
+        
+        # Wenn Kommas vorhanden sind, verwende Komma
+        if comma_count > 0:
+            logger.debug(f"Komma als Trennzeichen erkannt (Kommas: {comma_count}, Semikolons: {semicolon_count})")
+            return ','
+    
+    # Standard: Komma
+    logger.debug("Standard-Trennzeichen verwendet: Komma")
+    return ','
+
+
+def map_category(category: str) -> Optional[str]:
+    """Mappt einen Kategorienamen (auch abgeschnitten) zu einem Standard-Namen."""
+    cat_lower = category.lower().strip()
+
+    # Exakte Treffer
+    exact_mapping = {
+        'anbieter_name': 'anbieter_name',
+        'anbieter': 'anbieter_name',
+        'name': 'anbieter_name',
+        'postleitzahl': 'postleitzahl',
+        'plz': 'postleitzahl',
+        'ort': 'ort',
+        'stadt': 'ort',
+        'wohnort': 'ort',
+        'grundstücksfläche': 'grundstuecksflaeche',
+        'grundstuecksflaeche': 'grundstuecksflaeche',
+        'grundstücksflaeche': 'grundstuecksflaeche',
+        'wohnfläche': 'wohnflaeche',
+        'wohnflaeche': 'wohnflaeche',
+        'preis': 'preis',
+        'preis (€)': 'preis',
+        'preis (euro)': 'preis',
+        'preis €': 'preis',
+        'telefonnummer': 'telefonnummer',
+        'telefon': 'telefonnummer',
+        'tel': 'telefonnummer',
+        'handy': 'telefonnummer',
+        'features': 'features',
+        'ausstattung': 'features',
+        'merkmale': 'features',
+        'eigenschaften': 'features',
+        'immobilien_typ': 'immobilien_typ',
+        'immobilientyp': 'immobilien_typ',
+        'immobilien typ': 'immobilien_typ',
+        'typ': 'immobilien_typ',
+        'baujahr': 'baujahr',
+        'baujahr (jjjj)': 'baujahr',
+        'lage': 'lage',
+        'lagebeschreibung': 'lage',
+        'makler_id': 'makler_id',
+        'makler_name': 'makler_name',
+        'makler_email': 'makler_email',
+        'makler': 'makler_name'
+    }
+
+    if cat_lower in exact_mapping:
+        return exact_mapping[cat_lower]
+
+    # Prüfe auf Teilübereinstimmungen (für abgeschnittene Namen und Tippfehler)
+    # Anbieter_Name: Erkennt auch "Anbieter_Nlame", "Anbieter" etc.
+    if 'anbieter' in cat_lower or (cat_lower.startswith('name') and len(cat_lower) > 3):
+        return 'anbieter_name'
+    # Postleitzahl / PLZ
+    if cat_lower.startswith('postleitzahl') or cat_lower.startswith('plz') or 'plz' in cat_lower:
+        return 'postleitzahl'
+    # Ort / Stadt
+    if cat_lower in ['ort', 'stadt', 'wohnort'] or cat_lower.startswith('ort') or cat_lower.startswith('stadt'):
+        return 'ort'
+    # Grundstücksfläche: Erkennt auch "Grundstücksf", "Grundstücksfl" etc.
+    if 'grundstücks' in cat_lower or 'grundstuecks' in cat_lower or cat_lower.startswith('grundstücks') or cat_lower.startswith('grundstuecks'):
+        return 'grundstuecksflaeche'
+    # Wohnfläche: Erkennt auch "Wohnfl", "Wohnflä" etc.
+    if 'wohnfl' in cat_lower or cat_lower.startswith('wohnfl'):
+        return 'wohnflaeche'
+    # Preis
+    if cat_lower.startswith('preis') or 'preis' in cat_lower:
+        return 'preis'
+    # Telefonnummer: Erkennt auch "Telefonnumm", "Telefonnum" etc.
+    if 'telefon' in cat_lower or cat_lower.startswith('tel') or ('telefon' in cat_lower and 'num' in cat_lower):
+        return 'telefonnummer'
+    # Features / Ausstattung
+    if cat_lower.startswith('features') or cat_lower in ['ausstattung', 'merkmale', 'eigenschaften'] or 'feature' in cat_lower:
+        return 'features'
+    # Immobilien Typ
+    if 'immobilien' in cat_lower and ('typ' in cat_lower or 'type' in cat_lower) or cat_lower == 'typ':
+        return 'immobilien_typ'
+    # Baujahr
+    if cat_lower.startswith('baujahr') or cat_lower == 'baujahr' or ('bau' in cat_lower and 'jahr' in cat_lower):
+        return 'baujahr'
+    # Lage
+    if cat_lower.startswith('lage') or cat_lower == 'lage' or 'lagebeschreibung' in cat_lower:
+        return 'lage'
+    # Makler
+    if cat_lower.startswith('makler') or 'makler' in cat_lower:
+        if 'id' in cat_lower:
+            return 'makler_id'
+        elif 'email' in cat_lower:
+            return 'makler_email'
+        else:
+            return 'makler_name'
+
+    return None
+
+
+def find_makler_by_identifier(db: Session, identifier: str) -> Optional[Makler]:
+    """Findet einen Makler anhand von ID, Firmenname oder Email."""
+    try:
+        makler_id = int(identifier.strip())
+        makler = db.query(Makler).filter(Makler.id == makler_id).first()
+        if makler:
+            return makler
+    except ValueError:
+        pass
+    
+    makler = db.query(Makler).filter(Makler.firmenname.ilike(f"%{identifier.strip()}%")).first()
+    if makler:
+        return makler
+    
+    makler = db.query(Makler).filter(Makler.email.ilike(identifier.strip())).first()
+    if makler:
+        return makler
+    
+    return None
+
+
+def parse_float(value: str) -> Optional[float]:
+    """Konvertiert einen String zu einem Float. Unterstützt deutsches Format (150.000,00 €)."""
+    if not value:
+        return None
+    
+    try:
+        # Konvertiere zu String und entferne Leerzeichen
+        s = str(value).strip()
+        if not s:
+            return None
+        
+        # Entferne Euro-Symbol (€) und andere Symbole
+        s = s.replace('€', '').replace('EUR', '').replace('Euro', '')
+        s = s.strip()
+        
+        # Entferne alle Leerzeichen
+        s = s.replace(' ', '')
+        
+        # DEUTSCHES FORMAT: "150.000,00" oder "150000,00"
+        # Regel: Wenn Punkt UND Komma vorhanden → Punkt = Tausender, Komma = Dezimal
+        if '.' in s and ',' in s:
+            # Entferne alle Punkte (Tausender-Trenner), ersetze Komma durch Punkt
+            s = s.replace('.', '').replace(',', '.')
+        # NUR KOMMA: "150000,50" → Komma = Dezimal
+        elif ',' in s:
+            s = s.replace(',', '.')
+        # NUR PUNKT: "150000.50" → Punkt = Dezimal (US-Format)
+        # Oder mehrere Punkte: "150.000.00" → alle Punkte entfernen (fehlerhaftes Format)
+        elif '.' in s:
+            parts = s.split('.')
+            if len(parts) == 2:
+                # Ein Punkt = Dezimaltrennzeichen
+                pass  # Bereits korrekt
+            else:
+                # Mehrere Punkte = alle entfernen (fehlerhaftes Format)
+                s = s.replace('.', '')
+        
+        # Konvertiere zu Float
+        return float(s)
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+def erkenne_encoding(probe: bytes) -> str:
+    """
+    Erkennt das Encoding anhand einer Stichprobe vom Dateianfang.
+    Die Stichprobe wird nur einmal pro Kandidat dekodiert, nicht die ganze Datei.
+    """
+    if probe.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    for encoding in ENCODINGS:
+        try:
+            # Inkrementeller Decoder: ein am Ende abgeschnittenes Multibyte-Zeichen ist kein Fehler
+            codecs.getincrementaldecoder(encoding)().decode(probe, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Konnte CSV-Datei nicht dekodieren")
+
+
+def ist_vertikales_format(lines: List[str], delimiter: str) -> bool:
+    """
+    Prüft anhand der ersten Zeilen, ob die Datei im vertikalen Format vorliegt
+    (Spalte A = Kategorie wie "Anbieter_Name", Spalte B = Wert).
+    """
+    for i, line in enumerate(lines[:10]):
+        if not line.strip():
+            continue
+        try:
+            parts = next(csv.reader([line], delimiter=delimiter))
+        except (csv.Error, StopIteration):
+            parts = line.split(delimiter)
+        # Vertikale Zeilen haben nur Kategorie und Wert (ein Header mit weiteren Spalten zählt nicht)
+        if len(parts) >= 2 and not any(part.strip() for part in parts[2:]):
+            first_col = parts[0].strip().lower()
+            if any(keyword in first_col for keyword in KATEGORIE_SCHLUESSELWOERTER):
+                logger.debug(f"Vertikales Format erkannt in Zeile {i+1}: '{first_col}'")
+                return True
+
+    # Zusätzlich: Prüfe ob Header "Kategorie,Wert" vorhanden
+    first_line = lines[0].strip().lower() if lines else ''
+    if first_line in [f'kategorie{delimiter}wert', 'kategorie,wert', 'kategorie;wert', 'category,value', 'category;value'] or \
+       (delimiter in first_line and len(first_line.split(delimiter)) == 2 and
+        ('kategorie' in first_line or 'category' in first_line)):
+        logger.debug(f"Vertikales Format erkannt durch Header: '{first_line}'")
+        return True
+
+    return False
+
+
+def erkenne_csv_format(datei: BinaryIO) -> Tuple[str, str, bool]:
+    """
+    Liest eine Stichprobe vom Dateianfang und erkennt Encoding, Trennzeichen und Format.
+    Die Dateiposition wird danach wieder auf den Anfang gesetzt.
+    Gibt (encoding, delimiter, ist_vertikal) zurück.
+    """
+    datei.seek(0)
+    probe = datei.read(PROBE_GROESSE)
+    datei.seek(0)
+
+    if not probe.strip():
+        raise ValueError("CSV-Datei ist leer")
+
+    encoding = erkenne_encoding(probe)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(probe, final=False)
+
+    delimiter = detect_delimiter(text)
+    lines = text.strip().split('\n')
+    if len(lines) < 2:
+        raise ValueError("CSV-Datei enthält nicht genug Zeilen")
+
+    ist_vertikal = ist_vertikales_format(lines, delimiter)
+    logger.debug(f"Format-Erkennung: is_vertical = {ist_vertikal}, delimiter = '{delimiter}', encoding = '{encoding}'")
+    return encoding, delimiter, ist_vertikal
+
+
+def _iter_vertikale_leads(reader: Iterator[List[str]]) -> Iterator[dict]:
+    """Fasst die Zeilen im vertikalen Format (Kategorie, Wert) zu einem Dict pro Lead zusammen."""
+    current_lead = {}
+    erste_zeile = True
+
+    for row in reader:
+        # Überspringe Header-Zeile falls vorhanden
+        if erste_zeile:
+            erste_zeile = False
+            if row and row[0].strip().lower() in ['kategorie', 'category']:
+                continue
+
+        if len(row) < 2:
+            # Leere oder unvollständige Zeile: komplett leer = neuer Lead
+            if not any(row) and current_lead:
+                yield current_lead
+                current_lead = {}
+            continue
+
+        category = row[0].strip()
+        value = row[1].strip()
+
+        # Leere Zeile = neuer Lead
+        if not category and not value:
+            if current_lead:
+                yield current_lead
+                current_lead = {}
+            continue
+
+        # Unbekannte Kategorien werden mit Original-Namen gespeichert
+        current_lead[map_category(category) or category.lower()] = value
+
+    # Letzten Lead zurückgeben
+    if current_lead:
+        yield current_lead
+
+
+def iter_csv_zeilen(text_datei: io.TextIOBase, delimiter: str, ist_vertikal: bool) -> Iterator[dict]:
+    """Liefert die Zeilen (horizontal) bzw. Leads (vertikal) der Datei einzeln als Dict."""
+    if ist_vertikal:
+        return _iter_vertikale_leads(csv.reader(text_datei, delimiter=delimiter))
+    return csv.DictReader(text_datei, delimiter=delimiter)
+
+
+def ermittle_spalten_mapping(headers: List[str]) -> Dict[str, str]:
+    """Ordnet den CSV-Headern (horizontales Format) die Lead-Felder zu."""
+    csv_headers_lower = [str(col).strip().lower() for col in headers]
+    column_mapping = {}
+
+    for field_name, possible_names in ERWARTETE_SPALTEN.items():
+        normalized_possible = [name.lower().strip() for name in possible_names]
+        for idx, header_lower in enumerate(csv_headers_lower):
+            if header_lower in normalized_possible:
+                # Verwende den originalen Header-Namen (case-sensitive)
+                column_mapping[field_name] = headers[idx]
+                break
+
+    # Spezialbehandlung für Preis (kann auch mit Varianten wie "Preis (€)" kommen)
+    if 'preis' not in column_mapping:
+        for idx, header_lower in enumerate(csv_headers_lower):
+            if 'preis' in header_lower:
+                column_mapping['preis'] = headers[idx]
+                break
+
+    # Makler-Spalte (ID, Firmenname oder E-Mail)
+    for idx, header_lower in enumerate(csv_headers_lower):
+        if 'makler' in header_lower:
+            column_mapping['makler'] = headers[idx]
+            break
+
+    return column_mapping
+
+
+def _text(row: dict, key: Optional[str]) -> Optional[str]:
+    """Gibt den getrimmten Wert einer Spalte zurück (None bei leer oder fehlend)"""
+    if not key:
+        return None
+    value = row.get(key)
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _zahl(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except (ValueError, TypeError):
+        return None
+
+
+def zeile_zu_lead_daten(row: dict, column_mapping: Dict[str, str]) -> dict:
+    """Extrahiert die Lead-Felder aus einer CSV-Zeile."""
+    preis = parse_float(_text(row, column_mapping.get('preis')))
+    if preis is None:
+        # Fallback: Suche in ALLEN Spalten nach "preis" (case-insensitive)
+        for key in row.keys():
+            if key is not None and 'preis' in str(key).lower():
+                preis = parse_float(_text(row, key))
+                if preis is not None:
+                    break
+
+    return {
+        'anbieter_name': _text(row, column_mapping.get('anbieter_name')),
+        'postleitzahl': _text(row, column_mapping.get('postleitzahl')),
+        'ort': _text(row, column_mapping.get('ort')),
+        'grundstuecksflaeche': parse_float(_text(row, column_mapping.get('grundstuecksflaeche'))),
+        'wohnflaeche': parse_float(_text(row, column_mapping.get('wohnflaeche'))),
+        'preis': preis,
+        'telefonnummer': _text(row, column_mapping.get('telefonnummer')),
+        'features': _text(row, column_mapping.get('features')),
+        'immobilien_typ': _text(row, column_mapping.get('immobilien_typ')),
+        'baujahr': _zahl(_text(row, column_mapping.get('baujahr'))),
+        'lage': _text(row, column_mapping.get('lage')),
+    }
+
+
+def _fuege_fehler_hinzu(job: ImportJob, fehler: List[dict], row_num: int, error_msg: str) -> None:
+    job.fehler_anzahl += 1
+    if len(fehler) < MAX_FEHLER_DETAILS:
+        fehler.append({'row': row_num, 'error': error_msg})
+
+
+def _wende_duplikat_modus_an(
+    db: Session, job: ImportJob, batch: List[Tuple[int, dict]]
+) -> Tuple[List[Tuple[int, dict]], List[Tuple[int, dict]], List[Tuple[int, dict]]]:
+    """
+    Prüft die Zeilen eines Batches über den Fingerprint-Index auf Duplikate (eine Query
+    pro Batch, danach O(1) pro Zeile) und wendet den Duplikat-Modus des Jobs an.
+    Schreibt nichts: Gibt (neue Zeilen, Duplikate innerhalb des Batches im Modus "flag",
+    Zusammenführungen (original_id, daten) im Modus "merge") zurück.
+    """
+    modus = job.duplikat_modus or IMPORT_DUPLIKAT_MODUS
+    vorhandene = finde_leads_nach_fingerprints(db, (daten['fingerprint'] for _, daten in batch))
+    im_batch: Dict[str, dict] = {}
+
+    neue: List[Tuple[int, dict]] = []
+    nachzuegler: List[Tuple[int, dict]] = []
+    zusammenfuehrungen: List[Tuple[int, dict]] = []
+    for row_num, daten in batch:
+        fingerprint = daten['fingerprint']
+        if not fingerprint:
+            neue.append((row_num, daten))
+            continue
+
+        original_id = vorhandene.get(fingerprint)
+        if original_id is None and fingerprint not in im_batch:
+            im_batch[fingerprint] = daten
+            neue.append((row_num, daten))
+            continue
+
+        job.duplikate_anzahl = (job.duplikate_anzahl or 0) + 1
+        if modus == DUPLIKAT_MODUS_SKIP:
+            continue
+        if modus == DUPLIKAT_MODUS_MERGE:
+            if original_id is not None:
+                zusammenfuehrungen.append((original_id, daten))
+            else:
+                # Original steht noch im selben Batch: leere Felder direkt ergänzen
+                original = im_batch[fingerprint]
+                for feld in ZUSAMMENFUEHRBARE_FELDER:
+                    if original.get(feld) is None:
+                        original[feld] = daten.get(feld)
+            continue
+
+        # DUPLIKAT_MODUS_FLAG: Lead anlegen und auf das Original verweisen
+        if original_id is not None:
+            daten['duplikat_von_lead_id'] = original_id
+            neue.append((row_num, daten))
+        else:
+            nachzuegler.append((row_num, daten))
+
+    return neue, nachzuegler, zusammenfuehrungen
+
+
+def _schreibe_batch(db: Session, job: ImportJob, batch: List[Tuple[int, dict]], fehler: List[dict]) -> int:
+    """
+    Schreibt einen Batch per Bulk-INSERT (Lead-Nummern sind bereits vergeben). Schlägt der
+    Batch fehl, werden die Zeilen einzeln (mit Savepoint) geschrieben, um die fehlerhaften
+    Zeilen zu identifizieren. Gibt die Anzahl geschriebener Leads zurück.
+    """
+    if not batch:
+        return 0
+
+    try:
+        with db.begin_nested():
+            db.execute(insert(Lead), [daten for _, daten in batch])
+        return len(batch)
+    except Exception as e:
+        logger.warning(f"Bulk-INSERT für Import-Job {job.id} fehlgeschlagen, schreibe Zeilen einzeln: {e}")
+
+    geschrieben = 0
+    for row_num, daten in batch:
+        try:
+            with db.begin_nested():
+                db.execute(insert(Lead), [daten])
+            geschrieben += 1
+        except Exception as e:
+            _fuege_fehler_hinzu(job, fehler, row_num, f'Fehler beim Import: {str(e)}')
+    return geschrieben
+
+
+def importiere_leads_aus_datei(
+    db: Session,
+    job: ImportJob,
+    datei: BinaryIO,
+    batch_groesse: Optional[int] = None,
+) -> List[dict]:
+    """
+    Importiert die Leads aus der (binär geöffneten) CSV-Datei für den gegebenen Job.
+    Committet nach jedem Batch und aktualisiert dabei den Fortschritt des Jobs.
+    Hat der Job bereits Zeilen verarbeitet (abgebrochener Import), wird hinter der
+    zuletzt committeten Zeile fortgesetzt.
+    Gibt Details der ersten importierten Leads zurück (für die Anzeige).
+    """
+    batch_groesse = batch_groesse or IMPORT_BATCH_GROESSE
+    bereits_verarbeitet = job.verarbeitete_zeilen or 0
+    encoding, delimiter, ist_vertikal = erkenne_csv_format(datei)
+
+    # Makler pro Datei nur einmal auflösen
+    fester_makler = None
+    if job.makler_id:
+        fester_makler = db.query(Makler.id, Makler.firmenname).filter(Makler.id == job.makler_id).first()
+    makler_cache: Dict[str, Optional[Tuple[int, str]]] = {}
+
+    def makler_fuer_identifier(identifier: Optional[str]) -> Optional[Tuple[int, str]]:
+        if not identifier:
+            return None
+        if identifier not in makler_cache:
+            makler = find_makler_by_identifier(db, identifier)
+            makler_cache[identifier] = (makler.id, makler.firmenname) if makler else None
+        return makler_cache[identifier]
+
+    text_datei = io.TextIOWrapper(datei, encoding=encoding, errors='replace', newline='')
+    fehler: List[dict] = json.loads(job.fehler_details) if job.fehler_details else []
+    details: List[dict] = []
+    try:
+        zeilen = iter_csv_zeilen(text_datei, delimiter, ist_vertikal)
+        if ist_vertikal:
+            # Keys sind bereits die gemappten Kategorien
+            column_mapping = {feld: feld for feld in ERWARTETE_SPALTEN}
+        else:
+            column_mapping = ermittle_spalten_mapping(zeilen.fieldnames or [])
+        logger.debug(f"Import-Job {job.id}: Spalten-Mapping {column_mapping}")
+
+        batch: List[Tuple[int, dict]] = []
+        row_num = 1
+        for row_num, row in enumerate(zeilen, start=2):
+            if row_num - 1 <= bereits_verarbeitet:
+                continue  # Bereits in einem früheren Lauf committet
+            try:
+                daten = zeile_zu_lead_daten(row, column_mapping)
+
+                # Makler ist optional - wenn nicht gefunden, bleibt Lead ohne Makler (Status: unqualifiziert)
+                if job.makler_id:
+                    makler = fester_makler
+                elif not ist_vertikal:
+                    makler = makler_fuer_identifier(_text(row, column_mapping.get('makler')))
+                else:
+                    # Vertikales Format: Makler steht direkt in den Daten
+                    makler = None
+                    for key in MAKLER_SCHLUESSEL:
+                        makler = makler_fuer_identifier(_text(row, key))
+                        if makler:
+                            break
+
+                # Finde alle Makler, die für diese Postleitzahl zuständig sind ("1, 3, 5")
+                moegliche_makler_ids = finde_makler_ids_fuer_plz(db, daten['postleitzahl'])
+
+                daten.update({
+                    'makler_id': makler[0] if makler else None,
+                    'status': LeadStatusEnum.UNQUALIFIZIERT,
+                    'erstellt_am': datetime.utcnow(),
+                    'created_by_user_id': job.created_by_user_id,
+                    'anbieter_name': daten['anbieter_name'] or (makler[1] if makler else None),
+                    'moegliche_makler_ids': ', '.join(map(str, moegliche_makler_ids)) if moegliche_makler_ids else None,
+                })
+                daten['fingerprint'] = berechne_fingerprint(
+                    daten['telefonnummer'], daten['postleitzahl'], daten['anbieter_name']
+                )
+                batch.append((row_num, daten))
+
+                if len(details) < 10:
+                    details.append({
+                        'row': row_num,
+                        'makler': makler[1] if makler else 'Kein Makler',
+                        'ort': daten['ort'] or 'N/A',
+                        'postleitzahl': daten['postleitzahl'] or 'N/A',
+                        'preis': daten['preis'],
+                    })
+            except Exception as e:
+                error_msg = f'Fehler beim Import: {str(e)}'
+                logger.warning(f"Import-Job {job.id}, Zeile {row_num}: {error_msg}")
+                _fuege_fehler_hinzu(job, fehler, row_num, error_msg)
+
+            if len(batch) >= batch_groesse:
+                _schliesse_batch_ab(db, job, batch, fehler, datei, row_num)
+                batch = []
+
+        if row_num - 1 > bereits_verarbeitet:
+            _schliesse_batch_ab(db, job, batch, fehler, datei, row_num)
+    finally:
+        # Wrapper lösen, ohne die zugrunde liegende Datei zu schließen
+        text_datei.detach()
+
+    if job.verarbeitete_zeilen == 0:
+        raise ValueError("CSV-Datei enthält keine Daten")
+
+    return details
+
+
+def _schliesse_batch_ab(
+    db: Session, job: ImportJob, batch: List[Tuple[int, dict]], fehler: List[dict], datei: BinaryIO, row_num: int
+) -> None:
+    """Schreibt einen Batch und committet ihn zusammen mit dem Fortschritt des Jobs"""
+    if batch:
+        neue, nachzuegler, zusammenfuehrungen = _wende_duplikat_modus_an(db, job, batch)
+        # Lead-Nummern für alle zu schreibenden Zeilen vor dem ersten Schreibzugriff der Session
+        # reservieren (siehe reserviere_lead_nummern: unter SQLite würde die Reservierung sonst
+        # auf die Schreibsperre dieser Session warten)
+        zu_schreiben = neue + nachzuegler
+        for (_, daten), lead_nummer in zip(zu_schreiben, reserviere_lead_nummern(len(zu_schreiben))):
+            daten['lead_nummer'] = lead_nummer
+        for original_id, daten in zusammenfuehrungen:
+            fuehre_lead_zusammen(db, original_id, daten)
+        job.importierte_leads += _schreibe_batch(db, job, neue, fehler)
+        if nachzuegler:
+            # Duplikate innerhalb des Batches: Original ist jetzt geschrieben, ID nachschlagen
+            originale = finde_leads_nach_fingerprints(db, (daten['fingerprint'] for _, daten in nachzuegler))
+            for _, daten in nachzuegler:
+                daten['duplikat_von_lead_id'] = originale.get(daten['fingerprint'])
+            job.importierte_leads += _schreibe_batch(db, job, nachzuegler, fehler)
+    job.verarbeitete_zeilen = max(row_num - 1, 0)
+    try:
+        job.verarbeitete_bytes = datei.tell()
+    except (OSError, ValueError):
+        pass
+    job.fehler_details = json.dumps(fehler, ensure_ascii=False)
+    db.commit()
+
+
+def _beanspruche_job(db: Session, job_id: int) -> bool:
+    """
+    Übernimmt einen wartenden Job atomar (bedingtes UPDATE), damit ihn bei mehreren
+    Workern oder Prozessen nur genau einer verarbeitet.
+    """
+    jetzt = datetime.utcnow()
+    anzahl = (
+        db.query(ImportJob)
+        .filter(ImportJob.id == job_id, ImportJob.status == "wartend")
+        .update(
+            {
+                ImportJob.status: "laeuft",
+                ImportJob.gestartet_am: func.coalesce(ImportJob.gestartet_am, jetzt),
+                ImportJob.aktualisiert_am: jetzt,
+            },
+            synchronize_session=False
+        )
+    )
+    db.commit()
+    return anzahl == 1
+
+
+def verarbeite_import_job(job_id: int) -> None:
+    """
+    Verarbeitet einen Import-Job mit eigener DB-Session (läuft im Worker-Pool).
+    Die Upload-Datei wird nach erfolgreichem Import gelöscht, bei Fehlern bleibt
+    sie erhalten, damit der Job fortgesetzt werden kann.
+    """
+    db = SessionLocal()
+    try:
+        if not _beanspruche_job(db, job_id):
+            return  # Bereits von einem anderen Worker übernommen oder nicht mehr wartend
+
+        job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+        if job.verarbeitete_zeilen:
+            logger.info(f"Import-Job {job_id} wird ab Zeile {job.verarbeitete_zeilen + 1} fortgesetzt")
+
+        try:
+            if not job.dateipfad or not os.path.exists(job.dateipfad):
+                raise ValueError("Upload-Datei des Imports nicht gefunden")
+            with open(job.dateipfad, "rb") as datei:
+                importiere_leads_aus_datei(db, job, datei, job.batch_groesse)
+            job.status = "abgeschlossen"
+        except Exception as e:
+            # Bereits committete Batches bleiben erhalten - der Job kann dort fortgesetzt werden
+            db.rollback()
+            logger.error(f"Import-Job {job_id} fehlgeschlagen: {e}")
+            job.status = "fehlgeschlagen"
+            job.meldung = str(e)
+        job.beendet_am = datetime.utcnow()
+        db.commit()
+
+        if job.status == "abgeschlossen" and job.dateipfad:
+            try:
+                os.remove(job.dateipfad)
+            except OSError as e:
+                logger.warning(f"Upload-Datei von Import-Job {job_id} konnte nicht gelöscht werden: {e}")
+
+        logger.info(
+            f"Import-Job {job.id} {job.status}: {job.importierte_leads} Leads, "
+            f"{job.duplikate_anzahl or 0} Duplikate, {job.fehler_anzahl} Fehler, {job.verarbeitete_zeilen} Zeilen"
+        )
+    except Exception as e:
+        logger.error(f"Unerwarteter Fehler im Import-Worker (Job {job_id}): {e}", exc_info=True)
+    finally:
+        db.close()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKER_ANZAHL, thread_name_prefix="lead-import")
+        return _executor
+
+
+def starte_import_job(job_id: int) -> None:
+    """Reiht einen Import-Job in den lokalen Worker-Pool ein"""
+    _get_executor().submit(verarbeite_import_job, job_id)
+
+
+def setze_offene_import_jobs_fort() -> int:
+    """
+    Reiht alle wartenden Jobs ein und gibt abgebrochene Jobs wieder frei
+    (Status "laeuft", aber ohne Heartbeat seit IMPORT_JOB_TIMEOUT_MINUTEN).
+    Wird beim Start der Anwendung aufgerufen. Gibt die Anzahl eingereihter Jobs zurück.
+    """
+    db = SessionLocal()
+    try:
+        grenze = datetime.utcnow() - timedelta(minutes=IMPORT_JOB_TIMEOUT_MINUTEN)
+        abgebrochen = (
+            db.query(ImportJob)
+            .filter(
+                ImportJob.status == "laeuft",
+                or_(ImportJob.aktualisiert_am.is_(None), ImportJob.aktualisiert_am < grenze)
+            )
+            .update({ImportJob.status: "wartend"}, synchronize_session=False)
+        )
+        db.commit()
+        if abgebrochen:
+            logger.info(f"{abgebrochen} abgebrochene(r) Import-Job(s) werden fortgesetzt")
+
+        job_ids = [job_id for (job_id,) in db.query(ImportJob.id).filter(ImportJob.status == "wartend").order_by(ImportJob.id)]
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Offene Import-Jobs konnten nicht geladen werden: {e}")
+        return 0
+    finally:
+        db.close()
+
+    for job_id in job_ids:
+        starte_import_job(job_id)
+    return len(job_ids)
+
+
+def beende_import_worker() -> None:
+    """Beendet den Worker-Pool (laufende Batches werden beim nächsten Start fortgesetzt)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def import_job_zu_dict(job: ImportJob) -> dict:
+    """Serialisiert einen Import-Job inkl. Fortschritt in Prozent"""
+    fortschritt = None
+    if job.status == "abgeschlossen":
+        fortschritt = 100.0
+    elif job.datei_groesse:
+        fortschritt = round(min(job.verarbeitete_bytes / job.datei_groesse, 1.0) * 100, 1)
+
+    return {
+        'id': job.id,
+        'dateiname': job.dateiname,
+        'status': job.status,
+        'makler_id': job.makler_id,
+        'created_by_user_id': job.created_by_user_id,
+        'datei_groesse': job.datei_groesse,
+        'verarbeitete_bytes': job.verarbeitete_bytes,
+        'verarbeitete_zeilen': job.verarbeitete_zeilen,
+        'importierte_leads': job.importierte_leads,
+        'fehler_anzahl': job.fehler_anzahl,
+        'duplikat_modus': job.duplikat_modus or IMPORT_DUPLIKAT_MODUS,
+        'duplikate_anzahl': job.duplikate_anzahl or 0,
+        'fortschritt_prozent': fortschritt,
+        'fehler_details': json.loads(job.fehler_details) if job.fehler_details else [],
+        'meldung': job.meldung,
+        'erstellt_am': job.erstellt_am,
+        'gestartet_am': job.gestartet_am,
+        'beendet_am': job.beendet_am,
+    }
@@ -0,0 +1,99 @@
+"""
+Service für die Vergabe eindeutiger Lead-Nummern.
+Nummern werden blockweise aus der Tabelle lead_nummer_sequenz reserviert
+(atomares UPDATE in einer eigenen Transaktion), sodass mehrere Worker nie
+dieselbe Nummer vergeben und keine Lead-Tabelle durchsucht werden muss.
+"""
+
+import threading
+from typing import List
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..database import engine
+from ..models import Lead, LeadNummerSequenz
+from ..logging_config import get_logger
+
+logger = get_logger("lead_nummer")
+
+# Anzahl Nummern, die pro Prozess auf Vorrat reserviert werden
+BLOCK_GROESSE = 50
+# Erste vergebene Nummer bei leerer Datenbank (5-stellig wie bisher)
+START_NUMMER = 10000
+SEQUENZ_ID = 1
+
+# Lokal reservierter Block: [_block_naechste, _block_ende)
+_block_naechste = 0
+_block_ende = 0
+_lock = threading.Lock()
+
+
+def _reserviere_block(anzahl: int) -> int:
+    """
+    Reserviert anzahl fortlaufende Nummern in der Datenbank und gibt die erste zurück.
+    Läuft in einer eigenen Transaktion, damit die Reservierung sofort committet ist
+    und nicht vom Rollback der aufrufenden Session abhängt (Lücken sind erlaubt).
+    """
+    for _ in range(3):
+        with engine.begin() as conn:
+            result = conn.execute(
+                update(LeadNummerSequenz)
+                .where(LeadNummerSequenz.id == SEQUENZ_ID)
+                .values(naechste_nummer=LeadNummerSequenz.naechste_nummer + anzahl)
+            )
+            if result.rowcount == 1:
+                # Schreibsperre wird bis zum Commit gehalten - der gelesene Wert gehört uns
+                ende = conn.execute(
+                    select(LeadNummerSequenz.naechste_nummer).where(LeadNummerSequenz.id == SEQUENZ_ID)
+                ).scalar_one()
+                return ende - anzahl
+
+        # Sequenz existiert noch nicht: hinter der höchsten vergebenen Nummer initialisieren
+        try:
+            with engine.begin() as conn:
+                hoechste = conn.execute(select(func.max(Lead.lead_nummer))).scalar()
+                conn.execute(
+                    LeadNummerSequenz.__table__.insert().values(
+                        id=SEQUENZ_ID,
+                        naechste_nummer=max((hoechste or 0) + 1, START_NUMMER)
+                    )
+                )
+            logger.info("Lead-Nummern-Sequenz initialisiert")
+        except IntegrityError:
+            pass  # Ein anderer Worker hat die Sequenz gerade angelegt
+
+    raise RuntimeError("Lead-Nummern konnten nicht reserviert werden")
+
+
+def reserviere_lead_nummern(anzahl: int) -> List[int]:
+    """
+    Gibt anzahl eindeutige Lead-Nummern zurück.
+    Kleine Anfragen werden aus dem lokal reservierten Block bedient, größere
+    (Bulk-Erstellung, CSV-Import) reservieren einen passenden Block in einem Schritt.
+
+    Vor dem ersten Schreibzugriff der Transaktion aufrufen: Die Reservierung läuft über eine
+    eigene Verbindung. Hält die Session des Aufrufers unter SQLite bereits die Schreibsperre
+    (ausstehendes INSERT/UPDATE), wartet sie bis zum Busy-Timeout und scheitert mit
+    "database is locked" (tests/test_lead_nummer_service.py).
+    """
+    global _block_naechste, _block_ende
+    if anzahl <= 0:
+        return []
+
+    nummern: List[int] = []
+    with _lock:
+        while len(nummern) < anzahl:
+            if _block_naechste >= _block_ende:
+                block = max(BLOCK_GROESSE, anzahl - len(nummern))
+                _block_naechste = _reserviere_block(block)
+                _block_ende = _block_naechste + block
+            bis = min(_block_ende, _block_naechste + anzahl - len(nummern))
+            nummern.extend(range(_block_naechste, bis))
+            _block_naechste = bis
+    return nummern
+
+
+def naechste_lead_nummer() -> int:
+    """Gibt eine einzelne eindeutige Lead-Nummer zurück"""
+    return reserviere_lead_nummern(1)[0]
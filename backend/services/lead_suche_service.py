@@ -0,0 +1,197 @@
+"""
+Service für die serverseitige Lead-Suche.
+Filtert Leads in SQL (Status, Makler, PLZ, Ort, Zeitraum, Makler-Status) statt im Frontend
+und bietet eine Volltextsuche über anbieter_name, ort und beschreibung (SQLite FTS5).
+"""
+
+import re
+from datetime import date, datetime, time, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, or_, text
+from sqlalchemy.orm import Session
+
+from ..models import Lead
+
+# FTS5-Tabelle (External Content auf leads, wird per Trigger synchron gehalten)
+FTS_TABELLE = "leads_fts"
+FTS_SPALTEN = ("anbieter_name", "ort", "beschreibung")
+
+# Erlaubte Sortierungen (Name -> Spalte); "relevanz" nur mit Suchbegriff
+SORTIERUNGEN = {
+    "erstellt_am": Lead.erstellt_am,
+    "qualifiziert_am": Lead.qualifiziert_am,
+    "lead_nummer": Lead.lead_nummer,
+    "postleitzahl": Lead.postleitzahl,
+    "ort": Lead.ort,
+    "anbieter_name": Lead.anbieter_name,
+}
+SORTIERUNG_RELEVANZ = "relevanz"
+
+# Datumsfelder, auf die sich datum_von/datum_bis beziehen können
+DATUM_FELDER = {
+    "erstellt_am": Lead.erstellt_am,
+    "qualifiziert_am": Lead.qualifiziert_am,
+}
+
+_fts_verfuegbar: Optional[bool] = None
+
+
+def richte_volltextsuche_ein(db: Session) -> bool:
+    """
+    Legt die FTS5-Tabelle samt Sync-Triggern an und befüllt sie beim ersten Anlegen.
+    Gibt True zurück, wenn der Index neu angelegt wurde. Ohne FTS5-Unterstützung schlägt
+    das Anlegen fehl und die Suche fällt auf LIKE zurück. Committet nicht.
+    """
+    global _fts_verfuegbar
+    vorhanden = db.execute(
+        text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+        {"name": FTS_TABELLE}
+    ).fetchone()
+
+    spalten = ", ".join(FTS_SPALTEN)
+    neu_spalten = ", ".join(f"new.{s}" for s in FTS_SPALTEN)
+    alt_spalten = ", ".join(f"old.{s}" for s in FTS_SPALTEN)
+
+    if not vorhanden:
+        db.execute(text(
+            f"CREATE VIRTUAL TABLE {FTS_TABELLE} USING fts5("
+            f"{spalten}, content='leads', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        ))
+
+    # Trigger halten den Index bei INSERT/UPDATE/DELETE auf leads aktuell
+    db.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN "
+        f"INSERT INTO {FTS_TABELLE}(rowid, {spalten}) VALUES (new.id, {neu_spalten}); END"
+    ))
+    db.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN "
+        f"INSERT INTO {FTS_TABELLE}({FTS_TABELLE}, rowid, {spalten}) VALUES ('delete', old.id, {alt_spalten}); END"
+    ))
+    # Nur bei Änderung der indizierten Spalten (Status-Updates etc. lösen keinen FTS-Update aus)
+    db.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF {spalten} ON leads BEGIN "
+        f"INSERT INTO {FTS_TABELLE}({FTS_TABELLE}, rowid, {spalten}) VALUES ('delete', old.id, {alt_spalten}); "
+        f"INSERT INTO {FTS_TABELLE}(rowid, {spalten}) VALUES (new.id, {neu_spalten}); END"
+    ))
+
+    if not vorhanden:
+        # Bestehende Leads einmalig indizieren
+        db.execute(text(f"INSERT INTO {FTS_TABELLE}({FTS_TABELLE}) VALUES ('rebuild')"))
+
+    _fts_verfuegbar = True
+    return not vorhanden
+
+
+def ist_volltextsuche_verfuegbar(db: Session) -> bool:
+    """Prüft (einmal pro Prozess), ob die FTS5-Tabelle existiert (nur unter SQLite)"""
+    global _fts_verfuegbar
+    if _fts_verfuegbar is None:
+        if db.get_bind().dialect.name != "sqlite":
+            # Eine fehlschlagende Abfrage würde z.B. unter PostgreSQL die Transaktion abbrechen
+            _fts_verfuegbar = False
+            return _fts_verfuegbar
+        try:
+            _fts_verfuegbar = db.execute(
+                text("SELECT name FROM sqlite_master WHERE type='table' AND name=:name"),
+                {"name": FTS_TABELLE}
+            ).fetchone() is not None
+        except Exception:
+            _fts_verfuegbar = False
+    return _fts_verfuegbar
+
+
+def baue_fts_ausdruck(suchtext: str) -> Optional[str]:
+    """
+    Wandelt freie Eingabe in einen sicheren FTS5-Ausdruck um.
+    Jedes Wort wird als Präfix gesucht, alle Wörter müssen vorkommen ("mül ber" -> "mül"* "ber"*).
+    """
+    woerter = re.findall(r"\w+", suchtext or "")
+    if not woerter:
+        return None
+    return " ".join(f'"{wort}"*' for wort in woerter)
+
+
+def suche_leads(
+    db: Session,
+    suchtext: Optional[str] = None,
+    status: Optional[List[str]] = None,
+    makler_ids: Optional[List[int]] = None,
+    qualifiziert_von_user_ids: Optional[List[int]] = None,
+    postleitzahl: Optional[str] = None,
+    ort: Optional[str] = None,
+    makler_status: Optional[str] = None,
+    datum_feld: str = "erstellt_am",
+    datum_von: Optional[date] = None,
+    datum_bis: Optional[date] = None,
+    sortierung: str = "erstellt_am",
+    absteigend: bool = True,
+    skip: int = 0,
+    limit: int = 100
+) -> Tuple[List[Lead], int]:
+    """
+    Sucht Leads mit den gegebenen Filtern.
+    Gibt (Leads der angeforderten Seite, Gesamtanzahl aller Treffer) zurück.
+    Wirft ValueError bei ungültiger Sortierung oder ungültigem Datumsfeld.
+    """
+    if datum_feld not in DATUM_FELDER:
+        raise ValueError(f"Ungültiges Datumsfeld. Erlaubt: {', '.join(DATUM_FELDER)}")
+    if sortierung != SORTIERUNG_RELEVANZ and sortierung not in SORTIERUNGEN:
+        raise ValueError(f"Ungültige Sortierung. Erlaubt: {', '.join([*SORTIERUNGEN, SORTIERUNG_RELEVANZ])}")
+
+    query = db.query(Lead)
+
+    if status:
+        query = query.filter(Lead.status.in_(status))
+    if makler_ids:
+        query = query.filter(Lead.makler_id.in_(makler_ids))
+    if qualifiziert_von_user_ids:
+        query = query.filter(Lead.qualifiziert_von_user_id.in_(qualifiziert_von_user_ids))
+    if postleitzahl and postleitzahl.strip():
+        # Präfix-Suche als Range, damit idx_leads_postleitzahl genutzt werden kann
+        praefix = postleitzahl.strip()
+        query = query.filter(Lead.postleitzahl >= praefix, Lead.postleitzahl < praefix + "\uffff")
+    if ort and ort.strip():
+        query = query.filter(Lead.ort.ilike(f"%{ort.strip()}%"))
+    if makler_status:
+        query = query.filter(Lead.makler_status == makler_status)
+
+    # Zeitraum als halboffenes Intervall [von, bis + 1 Tag), damit der Index auf der Spalte greift
+    datum_spalte = DATUM_FELDER[datum_feld]
+    if datum_von:
+        query = query.filter(datum_spalte >= datetime.combine(datum_von, time.min))
+    if datum_bis:
+        query = query.filter(datum_spalte < datetime.combine(datum_bis + timedelta(days=1), time.min))
+
+    rang_spalte = None
+    fts_ausdruck = baue_fts_ausdruck(suchtext) if suchtext else None
+    if fts_ausdruck and ist_volltextsuche_verfuegbar(db):
+        treffer = (
+            text(f"SELECT rowid AS lead_id, bm25({FTS_TABELLE}) AS rang FROM {FTS_TABELLE} WHERE {FTS_TABELLE} MATCH :fts_ausdruck")
+            .bindparams(fts_ausdruck=fts_ausdruck)
+            .columns(lead_id=Integer, rang=Float)
+            .subquery("fts_treffer")
+        )
+        query = query.join(treffer, treffer.c.lead_id == Lead.id)
+        rang_spalte = treffer.c.rang
+    elif suchtext and suchtext.strip():
+        # Fallback ohne FTS5: LIKE über dieselben Spalten
+        muster = f"%{suchtext.strip()}%"
+        query = query.filter(or_(*(getattr(Lead, spalte).ilike(muster) for spalte in FTS_SPALTEN)))
+
+    gesamt = query.count()
+
+    if sortierung == SORTIERUNG_RELEVANZ:
+        if rang_spalte is not None:
+            # bm25: kleinerer Wert = relevanter
+            query = query.order_by(rang_spalte.asc(), Lead.id.desc())
+        else:
+            query = query.order_by(Lead.erstellt_am.desc(), Lead.id.desc())
+    else:
+        spalte = SORTIERUNGEN[sortierung]
+        if absteigend:
+            query = query.order_by(spalte.desc().nullslast(), Lead.id.desc())
+        else:
+            query = query.order_by(spalte.asc().nullslast(), Lead.id.asc())
+
+    return query.offset(skip).limit(limit).all(), gesamt
@@ -0,0 +1,200 @@
+"""
+Service für die versionierten Datenbank-Migrationen (Liste in backend/migrations).
+Jede Migration läuft genau einmal und wird mit ihrer Version in schema_migrationen
+eingetragen. Beim Start wird nur die höchste eingetragene Version mit der neuesten
+bekannten verglichen (eine Abfrage); ausstehende Migrationen laufen unter einer Sperre,
+sodass bei mehreren Workern nur einer migriert und die anderen danach weiterstarten.
+
+Die Sperre ist eine Zeile in schema_migration_sperre (Primärschlüssel, funktioniert mit
+SQLite und PostgreSQL). Sperren abgestürzter Prozesse gelten nach SPERRE_TIMEOUT_MINUTEN
+als verwaist und werden übernommen.
+"""
+
+import os
+import socket
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from ..config import DB_MIGRATIONEN_BEIM_START
+from ..database import SessionLocal, engine
+from ..logging_config import get_logger
+from ..migrations import MIGRATIONEN, Migration
+from ..models import SchemaMigration, SchemaMigrationSperre
+
+logger = get_logger("migration")
+
+SPERRE_ID = 1
+# Älter als X Minuten: Sperre eines abgestürzten Prozesses
+SPERRE_TIMEOUT_MINUTEN = 30
+# So lange wartet ein Prozess höchstens auf die Migration eines anderen
+SPERRE_WARTEZEIT_SEKUNDEN = 15 * 60
+SPERRE_PRUEFINTERVALL_SEKUNDEN = 0.5
+
+
+def neueste_schema_version() -> int:
+    """Höchste Version aus backend/migrations"""
+    return max((m.version for m in MIGRATIONEN), default=0)
+
+
+def aktuelle_schema_version() -> int:
+    """Höchste angewendete Version (0 bei neuer Datenbank oder ohne Versionstabelle)"""
+    db = SessionLocal()
+    try:
+        return db.execute(select(func.max(SchemaMigration.version))).scalar() or 0
+    except SQLAlchemyError:
+        # Tabelle existiert noch nicht (Datenbank vor Einführung der Versionierung)
+        db.rollback()
+        return 0
+    finally:
+        db.close()
+
+
+def _lege_verwaltungstabellen_an() -> None:
+    """Legt schema_migrationen und schema_migration_sperre an (parallel startende Worker erlaubt)"""
+    for tabelle in (SchemaMigration.__table__, SchemaMigrationSperre.__table__):
+        try:
+            tabelle.create(bind=engine, checkfirst=True)
+        except SQLAlchemyError:
+            # Ein anderer Prozess hat die Tabelle zwischen Prüfung und CREATE angelegt
+            tabelle.create(bind=engine, checkfirst=True)
+
+
+def _sperr_inhaber() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+@contextmanager
+def migrations_sperre(wartezeit_sekunden: float = SPERRE_WARTEZEIT_SEKUNDEN) -> Iterator[None]:
+    """
+    Hält die Migrations-Sperre für die Dauer des with-Blocks.
+    Wartet, solange ein anderer Prozess migriert; RuntimeError nach wartezeit_sekunden.
+    """
+    inhaber = _sperr_inhaber()
+    frist = time.monotonic() + wartezeit_sekunden
+    gemeldet = False
+    while True:
+        try:
+            with engine.begin() as conn:
+                conn.execute(SchemaMigrationSperre.__table__.insert().values(
+                    id=SPERRE_ID, gesperrt_von=inhaber, gesperrt_seit=datetime.utcnow()
+                ))
+            break
+        except IntegrityError:
+            pass
+
+        # Verwaiste Sperre eines abgestürzten Prozesses übernehmen
+        with engine.begin() as conn:
+            conn.execute(delete(SchemaMigrationSperre).where(
+                SchemaMigrationSperre.id == SPERRE_ID,
+                SchemaMigrationSperre.gesperrt_seit < datetime.utcnow() - timedelta(minutes=SPERRE_TIMEOUT_MINUTEN),
+            ))
+        if time.monotonic() > frist:
+            raise RuntimeError("Zeitüberschreitung beim Warten auf die Migrations-Sperre")
+        if not gemeldet:
+            logger.info("Migration läuft in einem anderen Prozess, warte...")
+            gemeldet = True
+        time.sleep(SPERRE_PRUEFINTERVALL_SEKUNDEN)
+
+    try:
+        yield
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(SchemaMigrationSperre).where(
+                SchemaMigrationSperre.id == SPERRE_ID,
+                SchemaMigrationSperre.gesperrt_von == inhaber,
+            ))
+
+
+def ausstehende_migrationen() -> List[Migration]:
+    """Noch nicht angewendete Migrationen in Ausführungsreihenfolge"""
+    db = SessionLocal()
+    try:
+        try:
+            angewendet = set(db.execute(select(SchemaMigration.version)).scalars())
+        except SQLAlchemyError:
+            db.rollback()
+            angewendet = set()
+        return sorted((m for m in MIGRATIONEN if m.version not in angewendet), key=lambda m: m.version)
+    finally:
+        db.close()
+
+
+def fuehre_migrationen_aus() -> List[int]:
+    """
+    Führt alle ausstehenden Migrationen unter der Sperre aus und gibt die angewendeten
+    Versionen zurück. Jede Migration wird zusammen mit ihrem Eintrag in schema_migrationen
+    committet; schlägt eine fehl, wird abgebrochen (spätere Versionen laufen nicht).
+    """
+    _lege_verwaltungstabellen_an()
+    angewendet = []
+    with migrations_sperre():
+        # Erst unter der Sperre lesen - ein anderer Prozess kann gerade fertig geworden sein
+        for migration in ausstehende_migrationen():
+            logger.info(f"Migration {migration.version}: {migration.name}")
+            start = time.perf_counter()
+            db = SessionLocal()
+            try:
+                migration.upgrade(db)
+                db.add(SchemaMigration(
+                    version=migration.version,
+                    name=migration.name,
+                    angewendet_am=datetime.utcnow(),
+                    dauer_ms=int((time.perf_counter() - start) * 1000),
+                ))
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception(f"Migration {migration.version} fehlgeschlagen")
+                raise
+            finally:
+                db.close()
+            angewendet.append(migration.version)
+    return angewendet
+
+
+def pruefe_schema_version(automatisch_migrieren: Optional[bool] = None) -> None:
+    """
+    Startprüfung: vergleicht die Schema-Version der Datenbank mit der neuesten Migration.
+    Ist sie veraltet, werden die Migrationen ausgeführt (DB_MIGRATIONEN_BEIM_START) oder
+    der Start mit RuntimeError abgebrochen.
+    """
+    if automatisch_migrieren is None:
+        automatisch_migrieren = DB_MIGRATIONEN_BEIM_START
+
+    version = aktuelle_schema_version()
+    neueste = neueste_schema_version()
+    if version >= neueste:
+        return
+    if not automatisch_migrieren:
+        raise RuntimeError(
+            f"Datenbank-Schema ist veraltet (Version {version}, benötigt {neueste}). "
+            "Bitte zuerst 'python migrate.py' ausführen."
+        )
+    fuehre_migrationen_aus()
+
+
+def migrations_status() -> List[Dict[str, object]]:
+    """Alle bekannten Migrationen mit Zeitpunkt der Anwendung (None = ausstehend)"""
+    db = SessionLocal()
+    try:
+        try:
+            eintraege = {e.version: e for e in db.query(SchemaMigration).all()}
+        except SQLAlchemyError:
+            db.rollback()
+            eintraege = {}
+        return [
+            {
+                "version": m.version,
+                "name": m.name,
+                "angewendet_am": eintraege[m.version].angewendet_am if m.version in eintraege else None,
+                "dauer_ms": eintraege[m.version].dauer_ms if m.version in eintraege else None,
+            }
+            for m in MIGRATIONEN
+        ]
+    finally:
+        db.close()
@@ -0,0 +1,286 @@
+"""
+Service für die Monats-Rollup-Tabelle makler_monat_rollup.
+Statistik-Endpunkte lesen die vorberechneten Monatswerte pro Makler, statt
+qualifizierte Leads bei jeder Anfrage neu aus der leads-Tabelle zu zählen.
+
+Bei Lead-Änderungen werden nur die betroffenen (Makler, Jahr, Monat)-Zeilen
+neu berechnet (alter und neuer Monat von qualifiziert_am, dazu der aktuelle Monat
+für Credits-Buchungen). baue_rollup_neu() berechnet die gesamte Tabelle neu.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, extract, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import Lead, Makler, MaklerCredits, MaklerMonatRollup, Rechnung
+from .abrechnung_service import ist_makler_in_monat_aktiv
+from .zeitraum_service import im_monat
+
+# (makler_id, jahr, monat)
+RollupSchluessel = Tuple[int, int, int]
+
+# Lead-Status -> Spalte der Rollup-Tabelle
+STATUS_SPALTEN = {
+    "qualifiziert": "qualifiziert_anzahl",
+    "flexrecall": "flexrecall_anzahl",
+    "storniert": "storniert_anzahl",
+}
+# Credits-Transaktionen, die in credits_abgebucht eingehen (Erstattungen sind positiv und mindern den Betrag)
+CREDITS_TYPEN = ("lead_abbuchung", "erstattung")
+
+
+def rollup_schluessel(makler_id: Optional[int], datum: Optional[datetime]) -> Optional[RollupSchluessel]:
+    """Liefert (makler_id, jahr, monat) oder None, wenn Makler oder Datum fehlen"""
+    if makler_id is None or datum is None:
+        return None
+    return makler_id, datum.year, datum.month
+
+
+def lead_rollup_schluessel(lead: Lead) -> Optional[RollupSchluessel]:
+    """Rollup-Zeile, in die der Lead mit seinem aktuellen Zustand zählt"""
+    return rollup_schluessel(lead.makler_id, lead.qualifiziert_am)
+
+
+def _berechne_werte(db: Session, makler_id: int, jahr: int, monat: int) -> Dict[str, float]:
+    """Berechnet die Kennzahlen einer Rollup-Zeile aus den Rohdaten (indizierte Bereichsabfragen)"""
+    werte = {spalte: 0 for spalte in STATUS_SPALTEN.values()}
+    zeilen = (
+        db.query(Lead.status, func.count(Lead.id))
+        .filter(
+            Lead.makler_id == makler_id,
+            Lead.status.in_(list(STATUS_SPALTEN)),
+            im_monat(Lead.qualifiziert_am, monat, jahr),
+        )
+        .group_by(Lead.status)
+        .all()
+    )
+    for status, anzahl in zeilen:
+        werte[STATUS_SPALTEN[status]] = anzahl
+
+    credits_summe = (
+        db.query(func.sum(MaklerCredits.betrag))
+        .filter(
+            MaklerCredits.makler_id == makler_id,
+            MaklerCredits.transaktionstyp.in_(CREDITS_TYPEN),
+            im_monat(MaklerCredits.erstellt_am, monat, jahr),
+        )
+        .scalar()
+    )
+    werte["credits_abgebucht"] = -float(credits_summe) if credits_summe else 0.0
+
+    umsatz = (
+        db.query(func.sum(Rechnung.gesamtbetrag))
+        .filter(
+            Rechnung.makler_id == makler_id,
+            or_(
+                and_(Rechnung.monat == monat, Rechnung.jahr == jahr),
+                and_(Rechnung.rechnungstyp == "beteiligung", im_monat(Rechnung.erstellt_am, monat, jahr)),
+            ),
+        )
+        .scalar()
+    )
+    werte["umsatz"] = float(umsatz) if umsatz else 0.0
+    return werte
+
+
+def _sperre_zeile(db: Session, makler_id: int, jahr: int, monat: int) -> MaklerMonatRollup:
+    """
+    Liefert die Rollup-Zeile mit Zeilensperre (SELECT ... FOR UPDATE, unter SQLite ohne
+    Wirkung - dort sind Schreibtransaktionen ohnehin serialisiert) und legt sie bei Bedarf an.
+    Eine parallel angelegte Zeile (Unique-Index makler_id, jahr, monat) wird übernommen.
+    """
+    def abfrage():
+        return (
+            db.query(MaklerMonatRollup)
+            .filter(
+                MaklerMonatRollup.makler_id == makler_id,
+                MaklerMonatRollup.jahr == jahr,
+                MaklerMonatRollup.monat == monat,
+            )
+            .with_for_update()
+            .populate_existing()
+        )
+
+    zeile = abfrage().first()
+    if zeile is not None:
+        return zeile
+    try:
+        with db.begin_nested():
+            zeile = MaklerMonatRollup(makler_id=makler_id, jahr=jahr, monat=monat)
+            db.add(zeile)
+        return zeile
+    except IntegrityError:
+        # Parallel von einer anderen Anfrage angelegt - deren Zeile sperren
+        return abfrage().one()
+
+
+def aktualisiere_rollup(db: Session, schluessel: Iterable[Optional[RollupSchluessel]]) -> None:
+    """
+    Berechnet die angegebenen Rollup-Zeilen neu (None-Einträge werden ignoriert).
+    Flusht ausstehende Änderungen vorher, committet nicht.
+
+    Jede Zeile wird vor der Berechnung gesperrt: Parallele Anfragen für denselben Makler-Monat
+    warten bis zum Commit der ersten und zählen danach deren Leads mit, statt mit einem
+    veralteten Stand zu überschreiben. Gesperrt wird in fester Reihenfolge (keine Deadlocks).
+    """
+    eindeutig = sorted({s for s in schluessel if s is not None})
+    if not eindeutig:
+        return
+    db.flush()
+    jetzt = datetime.utcnow()
+    for makler_id, jahr, monat in eindeutig:
+        zeile = _sperre_zeile(db, makler_id, jahr, monat)
+        for spalte, wert in _berechne_werte(db, makler_id, jahr, monat).items():
+            setattr(zeile, spalte, wert)
+        zeile.aktualisiert_am = jetzt
+
+
+def aktualisiere_rollup_fuer_lead(
+    db: Session, lead: Lead, alter_schluessel: Optional[RollupSchluessel] = None
+) -> None:
+    """
+    Aktualisiert die Rollup-Zeilen nach einer Lead-Änderung: den Monat vor der Änderung
+    (alter_schluessel), den Monat nach der Änderung und den aktuellen Monat des Maklers
+    (Credits-Abbuchungen und Erstattungen werden mit dem heutigen Datum gebucht).
+    """
+    aktualisiere_rollup(db, [
+        alter_schluessel,
+        lead_rollup_schluessel(lead),
+        rollup_schluessel(lead.makler_id, datetime.utcnow()),
+    ])
+
+
+def entferne_makler_aus_rollup(db: Session, makler_id: int) -> None:
+    """Löscht alle Rollup-Zeilen eines Maklers. Committet nicht."""
+    db.query(MaklerMonatRollup).filter(MaklerMonatRollup.makler_id == makler_id).delete()
+
+
+def baue_rollup_neu(db: Session) -> int:
+    """
+    Berechnet die gesamte Rollup-Tabelle mit gruppierten Abfragen neu.
+    Gibt die Anzahl der Zeilen zurück. Committet nicht.
+    """
+    zeilen: Dict[RollupSchluessel, Dict[str, float]] = {}
+
+    def zeile_fuer(schluessel: RollupSchluessel) -> Dict[str, float]:
+        if schluessel not in zeilen:
+            zeilen[schluessel] = {
+                **{spalte: 0 for spalte in STATUS_SPALTEN.values()},
+                "credits_abgebucht": 0.0,
+                "umsatz": 0.0,
+            }
+        return zeilen[schluessel]
+
+    makler_ids = {makler_id for (makler_id,) in db.query(Makler.id).all()}
+
+    jahr_spalte = extract("year", Lead.qualifiziert_am)
+    monat_spalte = extract("month", Lead.qualifiziert_am)
+    for makler_id, status, jahr, monat, anzahl in (
+        db.query(Lead.makler_id, Lead.status, jahr_spalte, monat_spalte, func.count(Lead.id))
+        .filter(
+            Lead.makler_id.isnot(None),
+            Lead.status.in_(list(STATUS_SPALTEN)),
+            Lead.qualifiziert_am.isnot(None),
+        )
+        .group_by(Lead.makler_id, Lead.status, jahr_spalte, monat_spalte)
+        .all()
+    ):
+        zeile_fuer((makler_id, int(jahr), int(monat)))[STATUS_SPALTEN[status]] = anzahl
+
+    jahr_spalte = extract("year", MaklerCredits.erstellt_am)
+    monat_spalte = extract("month", MaklerCredits.erstellt_am)
+    for makler_id, jahr, monat, summe in (
+        db.query(MaklerCredits.makler_id, jahr_spalte, monat_spalte, func.sum(MaklerCredits.betrag))
+        .filter(MaklerCredits.transaktionstyp.in_(CREDITS_TYPEN))
+        .group_by(MaklerCredits.makler_id, jahr_spalte, monat_spalte)
+        .all()
+    ):
+        zeile_fuer((makler_id, int(jahr), int(monat)))["credits_abgebucht"] = -float(summe or 0.0)
+
+    for makler_id, jahr, monat, summe in (
+        db.query(Rechnung.makler_id, Rechnung.jahr, Rechnung.monat, func.sum(Rechnung.gesamtbetrag))
+        .filter(Rechnung.monat.isnot(None), Rechnung.jahr.isnot(None))
+        .group_by(Rechnung.makler_id, Rechnung.jahr, Rechnung.monat)
+        .all()
+    ):
+        zeile_fuer((makler_id, jahr, monat))["umsatz"] += float(summe or 0.0)
+
+    jahr_spalte = extract("year", Rechnung.erstellt_am)
+    monat_spalte = extract("month", Rechnung.erstellt_am)
+    for makler_id, jahr, monat, summe in (
+        db.query(Rechnung.makler_id, jahr_spalte, monat_spalte, func.sum(Rechnung.gesamtbetrag))
+        .filter(
+            Rechnung.rechnungstyp == "beteiligung",
+            # Bereits über monat/jahr erfasst (siehe _berechne_werte: ODER-Verknüpfung)
+            or_(Rechnung.monat.is_(None), Rechnung.jahr.is_(None)),
+        )
+        .group_by(Rechnung.makler_id, jahr_spalte, monat_spalte)
+        .all()
+    ):
+        zeile_fuer((makler_id, int(jahr), int(monat)))["umsatz"] += float(summe or 0.0)
+
+    db.query(MaklerMonatRollup).delete()
+    jetzt = datetime.utcnow()
+    db.bulk_insert_mappings(MaklerMonatRollup, [
+        {"makler_id": makler_id, "jahr": jahr, "monat": monat, "aktualisiert_am": jetzt, **werte}
+        for (makler_id, jahr, monat), werte in zeilen.items()
+        if makler_id in makler_ids
+    ])
+    return sum(1 for (makler_id, _, _) in zeilen if makler_id in makler_ids)
+
+
+def lade_monats_rollup(db: Session, monat: int, jahr: int) -> Dict[int, MaklerMonatRollup]:
+    """Alle Rollup-Zeilen eines Monats als {makler_id: Zeile}"""
+    return {
+        zeile.makler_id: zeile
+        for zeile in db.query(MaklerMonatRollup)
+        .filter(MaklerMonatRollup.jahr == jahr, MaklerMonatRollup.monat == monat)
+        .all()
+    }
+
+
+def lade_rollup_monate(
+    db: Session, monate: List[Tuple[int, int]]
+) -> Dict[RollupSchluessel, MaklerMonatRollup]:
+    """Rollup-Zeilen aller Makler für die übergebenen (monat, jahr)-Paare als {(makler_id, jahr, monat): Zeile}"""
+    if not monate:
+        return {}
+    zeilen = (
+        db.query(MaklerMonatRollup)
+        .filter(or_(*(
+            and_(MaklerMonatRollup.jahr == jahr, MaklerMonatRollup.monat == monat)
+            for monat, jahr in set(monate)
+        )))
+        .all()
+    )
+    return {(z.makler_id, z.jahr, z.monat): z for z in zeilen}
+
+
+def lade_makler_monat_rollup(
+    db: Session, makler_id: int, monat: int, jahr: int
+) -> Optional[MaklerMonatRollup]:
+    """Rollup-Zeile eines Maklers für einen Monat (None, wenn im Monat nichts angefallen ist)"""
+    return (
+        db.query(MaklerMonatRollup)
+        .filter(
+            MaklerMonatRollup.makler_id == makler_id,
+            MaklerMonatRollup.jahr == jahr,
+            MaklerMonatRollup.monat == monat,
+        )
+        .first()
+    )
+
+
+def ist_makler_aktiv_laut_rollup(
+    makler: Makler, monat: int, jahr: int, rollup: Optional[MaklerMonatRollup]
+) -> bool:
+    """
+    Entspricht ist_makler_in_monat_aktiv(makler, monat, jahr, db): bereits gelieferte
+    (qualifizierte) Leads laut Rollup machen den Makler für den Monat immer aktiv.
+    """
+    if rollup is not None and rollup.qualifiziert_anzahl > 0:
+        return True
+    return ist_makler_in_monat_aktiv(makler, monat, jahr)
@@ -12,21 +12,28 @@ from ..models import Makler, Lead, MaklerCredits
 from .credits_service import (
     berechne_credits_stand,
     berechne_preis_fuer_lead,
-    zaehle_leads_im_monat
+    zaehle_leads_im_monat,
+    zaehle_leads_im_monat_pro_makler
 )
 from .abrechnung_service import (
-    ist_makler_in_monat_aktiv,
     berechne_vertragsmonat,
     bestimme_preis_pro_lead,
     kann_makler_neue_leads_bekommen
 )
+from .gebiet_index_service import makler_ids_mit_plz_praefix
+from .monats_rollup_service import ist_makler_aktiv_laut_rollup, lade_makler_monat_rollup, lade_monats_rollup
+
+# Markiert in berechne_makler_status, dass die Rollup-Zeile noch geladen werden muss
+# (None bedeutet dort: geladen, aber im Monat keine Zeile vorhanden)
+_NICHT_GELADEN = object()
 
 
 def berechne_durchschnittlichen_preis(
     db: Session,
     makler: Makler,
     monat: int,
-    jahr: int
+    jahr: int,
+    anzahl_leads: Optional[int] = None
 ) -> float:
     """
     Berechnet den durchschnittlichen Preis für Leads eines Maklers in einem Monat.
@@ -37,12 +44,14 @@ def berechne_durchschnittlichen_preis(
         makler: Der Makler
         monat: Monat (1-12)
         jahr: Jahr
+        anzahl_leads: Bereits gezählte qualifizierte Leads im Monat (None = aus der DB zählen)
     
     Returns:
         Durchschnittlicher Preis pro Lead in Euro
     """
     # Zähle Leads im Monat
-    anzahl_leads = zaehle_leads_im_monat(db, makler.id, monat, jahr)
+    if anzahl_leads is None:
+        anzahl_leads = zaehle_leads_im_monat(db, makler.id, monat, jahr)
     
     if anzahl_leads == 0:
         # Keine Leads bisher: Verwende erwarteten Preis für ersten Lead
@@ -81,7 +90,9 @@ def berechne_verfuegbare_leads_aus_credits(
     db: Session,
     makler: Makler,
     monat: int,
-    jahr: int
+    jahr: int,
+    credits_stand: Optional[float] = None,
+    anzahl_leads_aktuell: Optional[int] = None
 ) -> Tuple[int, float, float]:
     """
     Berechnet wie viele Leads ein Makler mit Credits-System noch bekommen kann.
@@ -91,6 +102,8 @@ def berechne_verfuegbare_leads_aus_credits(
         makler: Der Makler (muss rechnungssystem_typ = "neu" haben)
         monat: Monat (1-12)
         jahr: Jahr
+        credits_stand: Bereits geladener Credits-Stand (None = aus der DB laden)
+        anzahl_leads_aktuell: Bereits gezählte qualifizierte Leads im Monat (None = aus der DB zählen)
     
     Returns:
         Tuple (verfuegbare_leads: int, durchschnittlicher_preis: float, naechster_lead_preis: float)
@@ -98,13 +111,15 @@ def berechne_verfuegbare_leads_aus_credits(
     if makler.rechnungssystem_typ != "neu":
         return 0, 0.0, 0.0
     
-    credits_stand = berechne_credits_stand(db, makler.id)
+    if credits_stand is None:
+        credits_stand = berechne_credits_stand(db, makler.id)
+    if anzahl_leads_aktuell is None:
+        anzahl_leads_aktuell = zaehle_leads_im_monat(db, makler.id, monat, jahr)
     
     # Berechne durchschnittlichen Preis basierend auf bisherigen Leads
-    durchschnittlicher_preis = berechne_durchschnittlichen_preis(db, makler, monat, jahr)
+    durchschnittlicher_preis = berechne_durchschnittlichen_preis(db, makler, monat, jahr, anzahl_leads_aktuell)
     
     # Berechne Preis für nächsten Lead
-    anzahl_leads_aktuell = zaehle_leads_im_monat(db, makler.id, monat, jahr)
     vertragsmonat = berechne_vertragsmonat(makler.vertragsstart_datum, monat, jahr)
     
     # Simuliere nächsten Lead für Preisberechnung
@@ -123,7 +138,10 @@ def berechne_makler_status(
     db: Session,
     makler: Makler,
     monat: int,
-    jahr: int
+    jahr: int,
+    monats_rollup: Any = _NICHT_GELADEN,
+    credits_stand: Optional[float] = None,
+    anzahl_leads_im_monat: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Berechnet den Status und die Verfügbarkeit eines Maklers.
@@ -133,12 +151,20 @@ def berechne_makler_status(
         makler: Der Makler
         monat: Monat (1-12)
         jahr: Jahr
+        monats_rollup: Bereits geladene Rollup-Zeile des Monats (auch None), sonst wird sie geladen
+        credits_stand: Bereits geladener Credits-Stand (None = aus der DB laden)
+        anzahl_leads_im_monat: Bereits gezählte qualifizierte Leads für die Preisberechnung (None = zählen)
     
     Returns:
         Dict mit Status-Informationen
     """
+    # Ist-Leads aus der vorberechneten Monatsstatistik (makler_monat_rollup)
+    if monats_rollup is _NICHT_GELADEN:
+        monats_rollup = lade_makler_monat_rollup(db, makler.id, monat, jahr)
+    rollup_ist_leads = monats_rollup.qualifiziert_anzahl if monats_rollup else 0
+    
     # Prüfe ob Makler aktiv ist (für Abrechnungszwecke - bereits gelieferte Leads werden berücksichtigt)
-    ist_aktiv = ist_makler_in_monat_aktiv(makler, monat, jahr, db)
+    ist_aktiv = ist_makler_aktiv_laut_rollup(makler, monat, jahr, monats_rollup)
     
     # Prüfe ob Makler neue Leads bekommen kann (für Lead-Zuweisungen)
     kann_neue_leads = kann_makler_neue_leads_bekommen(makler, monat, jahr)
@@ -155,7 +181,7 @@ def berechne_makler_status(
     
     # Wenn pausiert, setze Status auf "pausiert" und Lead-Lieferung auf 100%
     if ist_pausiert:
-        ist_leads = zaehle_leads_im_monat(db, makler.id, monat, jahr)
+        ist_leads = rollup_ist_leads
         # Berechne Soll-Leads für Anzeige
         vertragsmonat = berechne_vertragsmonat(makler.vertragsstart_datum, monat, jahr)
         if makler.monatliche_soll_leads is not None:
@@ -178,7 +204,7 @@ def berechne_makler_status(
         }
     
     if not ist_aktiv:
-        ist_leads = zaehle_leads_im_monat(db, makler.id, monat, jahr)
+        ist_leads = rollup_ist_leads
         return {
             "status": "inaktiv",
             "prioritaet": "niedrig",
@@ -188,7 +214,7 @@ def berechne_makler_status(
             "warnung": "Makler ist inaktiv (Vertrag abgelaufen)"
         }
     
-    ist_leads = zaehle_leads_im_monat(db, makler.id, monat, jahr) if ist_aktiv else 0
+    ist_leads = rollup_ist_leads if ist_aktiv else 0
     
     # Sicherstellen, dass rechnungssystem_typ nicht None ist (Default: "alt")
     rechnungssystem_typ = makler.rechnungssystem_typ if makler.rechnungssystem_typ else "alt"
@@ -249,9 +275,10 @@ def berechne_makler_status(
     
     # Neues System (Credits)
     elif rechnungssystem_typ == "neu":
-        credits_stand = berechne_credits_stand(db, makler.id)
+        if credits_stand is None:
+            credits_stand = berechne_credits_stand(db, makler.id)
         verfuegbare_leads, durchschnittlicher_preis, naechster_lead_preis = berechne_verfuegbare_leads_aus_credits(
-            db, makler, monat, jahr
+            db, makler, monat, jahr, credits_stand, anzahl_leads_im_monat
         )
         
         if credits_stand < naechster_lead_preis:
@@ -305,6 +332,33 @@ def berechne_makler_status(
         }
 
 
+def berechne_makler_status_batch(
+    db: Session,
+    makler_liste: List[Makler],
+    monat: int,
+    jahr: int
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Berechnet den Status aller übergebenen Makler mit einer festen Anzahl Abfragen:
+    Rollup-Zeilen des Monats und qualifizierte Leads pro Makler (gruppiert), der
+    Credits-Stand kommt aus der bereits geladenen Spalte Makler.credits_stand.
+    
+    Returns:
+        Dict {makler_id: Status-Informationen wie bei berechne_makler_status}
+    """
+    monats_rollup = lade_monats_rollup(db, monat, jahr)
+    leads_im_monat = zaehle_leads_im_monat_pro_makler(db, monat, jahr)
+    return {
+        makler.id: berechne_makler_status(
+            db, makler, monat, jahr,
+            monats_rollup=monats_rollup.get(makler.id),
+            credits_stand=float(makler.credits_stand or 0.0),
+            anzahl_leads_im_monat=leads_im_monat.get(makler.id, 0),
+        )
+        for makler in makler_liste
+    }
+
+
 def get_telefonist_dashboard(
     db: Session,
     filter_status: Optional[str] = None,  # "kann_leads", "wenig_credits", "voll", "keine_credits"
@@ -319,7 +373,7 @@ def get_telefonist_dashboard(
         db: Datenbank-Session
         filter_status: Optionaler Filter nach Status
         filter_system: Optionaler Filter nach Rechnungssystem
-        suche: Optionaler Suchbegriff (Firmenname oder PLZ)
+        suche: Optionaler Suchbegriff (Teil des Firmennamens oder Anfang einer PLZ im Gebiet)
     
     Returns:
         Dict mit makler_liste und statistiken
@@ -333,10 +387,10 @@ def get_telefonist_dashboard(
     
     # Filter nach Suche
     if suche:
-        suche_lower = suche.lower()
+        # PLZ-Suche über die indizierte Tabelle makler_gebiet (statt LIKE auf dem Gebiet-String)
         makler_query = makler_query.filter(
             (Makler.firmenname.ilike(f"%{suche}%")) |
-            (Makler.gebiet.ilike(f"%{suche}%"))
+            (Makler.id.in_(makler_ids_mit_plz_praefix(db, suche)))
         )
     
     alle_makler = makler_query.all()
@@ -352,8 +406,11 @@ def get_telefonist_dashboard(
         "pausiert": 0
     }
     
+    # Status aller Makler gebündelt berechnen (statt mehrerer Abfragen pro Makler)
+    status_pro_makler = berechne_makler_status_batch(db, alle_makler, aktueller_monat, aktuelles_jahr)
+    
     for makler in alle_makler:
-        status_info = berechne_makler_status(db, makler, aktueller_monat, aktuelles_jahr)
+        status_info = status_pro_makler[makler.id]
         
         # Pausierte Makler werden nicht im Dashboard angezeigt (sie brauchen keine neuen Leads)
         if status_info["status"] == "pausiert":
@@ -0,0 +1,94 @@
+"""
+Service für Keyset-(Cursor-)Pagination.
+Statt OFFSET wird ab dem letzten gelieferten Eintrag weitergelesen
+(WHERE (sortierspalte, id) < (letzter_wert, letzte_id)), sodass auch tiefe Seiten
+über den Index in konstanter Zeit geladen werden. Der Cursor ist ein opaker
+Base64-String; der Cursor der nächsten Seite wird im Header X-Next-Cursor geliefert.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import Response
+from sqlalchemy import and_, nulls_last, or_, tuple_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sortwert: Optional[datetime], eintrag_id: int) -> str:
+    """Kodiert (Sortierwert, ID) des letzten Eintrags einer Seite als opaken Cursor"""
+    payload = json.dumps([sortwert.isoformat() if sortwert else None, eintrag_id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """
+    Dekodiert einen Cursor zu (Sortierwert, ID).
+    Wirft ValueError bei ungültigem Cursor.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        sortwert, eintrag_id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return (datetime.fromisoformat(sortwert) if sortwert else None), int(eintrag_id)
+    except (ValueError, TypeError, json.JSONDecodeError) as e:
+        raise ValueError("Ungültiger Cursor") from e
+
+
+def sortiere_keyset(query: Query, spalte, id_spalte, absteigend: bool = True) -> Query:
+    """Stabile Sortierung nach (spalte, id); NULL-Werte der Sortierspalte stehen am Ende"""
+    if absteigend:
+        return query.order_by(nulls_last(spalte.desc()), id_spalte.desc())
+    return query.order_by(nulls_last(spalte.asc()), id_spalte.asc())
+
+
+def filtere_nach_cursor(
+    query: Query,
+    cursor: Optional[str],
+    spalte,
+    id_spalte,
+    absteigend: bool = True,
+    nullable: bool = False
+) -> Query:
+    """
+    Schränkt die Query auf Einträge hinter dem Cursor ein (passend zu sortiere_keyset).
+    Bei nullable=True werden Einträge mit NULL in der Sortierspalte nach allen anderen geliefert.
+    """
+    if not cursor:
+        return query
+
+    sortwert, letzte_id = decode_cursor(cursor)
+    if sortwert is None:
+        # Cursor steht bereits im NULL-Bereich am Ende
+        naechste_id = id_spalte < letzte_id if absteigend else id_spalte > letzte_id
+        return query.filter(and_(spalte.is_(None), naechste_id))
+
+    if absteigend:
+        dahinter = tuple_(spalte, id_spalte) < tuple_(sortwert, letzte_id)
+    else:
+        dahinter = tuple_(spalte, id_spalte) > tuple_(sortwert, letzte_id)
+    if nullable:
+        dahinter = or_(dahinter, spalte.is_(None))
+    return query.filter(dahinter)
+
+
+def schneide_seite_ab(
+    eintraege: List[Any],
+    limit: Optional[int],
+    response: Optional[Response],
+    sortwert_attribut: str
+) -> List[Any]:
+    """
+    Erwartet bis zu limit + 1 geladene Einträge. Gibt höchstens limit Einträge zurück und
+    setzt den Cursor der nächsten Seite im Response-Header, falls es weitere Einträge gibt.
+    """
+    if limit is None or len(eintraege) <= limit:
+        return eintraege
+
+    seite = eintraege[:limit]
+    if response is not None:
+        letzter = seite[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(getattr(letzter, sortwert_attribut), letzter.id)
+    return seite
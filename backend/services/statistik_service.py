@@ -0,0 +1,189 @@
+"""
+Service für die Dashboard-Statistiken.
+Alle Kennzahlen und die Monats-Trends werden mit wenigen Abfragen berechnet, statt pro
+Makler und pro Lead einzeln nachzuladen. Die gelieferten Leads pro Makler und Monat
+kommen aus der Rollup-Tabelle makler_monat_rollup (services/monats_rollup_service.py).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from ..models import Lead, Makler, Rechnung
+from .abrechnung_service import ist_makler_in_monat_aktiv
+from .monats_rollup_service import lade_rollup_monate
+from .zeitraum_service import im_monat
+
+GELIEFERT_STATI = ("qualifiziert", "flexrecall")
+
+# (makler_id, jahr, monat) -> {status: anzahl}
+LeadZaehlung = Dict[Tuple[int, int, int], Dict[str, int]]
+
+
+def berechne_trend_monate(
+    jetzt: datetime,
+    start_monat: Optional[int] = None,
+    start_jahr: Optional[int] = None,
+    anzahl_monate: int = 12,
+) -> List[Tuple[int, int]]:
+    """
+    Liefert die (monat, jahr)-Paare der Trend-Reihe.
+    Mit Start-Monat/-Jahr: anzahl_monate vorwärts (alt zu neu),
+    sonst die letzten 6 Monate ab dem aktuellen Monat rückwärts (neu zu alt).
+    """
+    monate = []
+    if start_monat is not None and start_jahr is not None:
+        for i in range(anzahl_monate):
+            index = start_jahr * 12 + start_monat - 1 + i
+            monate.append((index % 12 + 1, index // 12))
+    else:
+        for i in range(6):
+            index = jetzt.year * 12 + jetzt.month - 1 - i
+            monate.append((index % 12 + 1, index // 12))
+    return monate
+
+
+def zaehle_gelieferte_leads(db: Session, monate: List[Tuple[int, int]]) -> LeadZaehlung:
+    """
+    Liefert die gelieferten (qualifiziert/flexrecall) Leads pro Makler und Qualifizierungsmonat
+    für alle übergebenen (monat, jahr)-Paare aus der Rollup-Tabelle makler_monat_rollup.
+    """
+    zaehlung: LeadZaehlung = {}
+    for schluessel, zeile in lade_rollup_monate(db, monate).items():
+        stati = {}
+        if zeile.qualifiziert_anzahl:
+            stati["qualifiziert"] = zeile.qualifiziert_anzahl
+        if zeile.flexrecall_anzahl:
+            stati["flexrecall"] = zeile.flexrecall_anzahl
+        if stati:
+            zaehlung[schluessel] = stati
+    return zaehlung
+
+
+def ist_aktiv_laut_zaehlung(
+    makler: Makler, monat: int, jahr: int, zaehlung: LeadZaehlung
+) -> bool:
+    """
+    Entspricht ist_makler_in_monat_aktiv(makler, monat, jahr, db), nutzt aber die
+    vorab gruppierte Zählung statt einer eigenen Count-Abfrage pro Makler.
+    """
+    if zaehlung.get((makler.id, jahr, monat), {}).get("qualifiziert", 0) > 0:
+        return True
+    return ist_makler_in_monat_aktiv(makler, monat, jahr)
+
+
+def berechne_dashboard_statistiken(
+    db: Session,
+    trends_start_monat: Optional[int] = None,
+    trends_start_jahr: Optional[int] = None,
+    trends_anzahl_monate: int = 12,
+) -> Dict[str, Any]:
+    """
+    Berechnet alle Kennzahlen des Dashboards (aktueller Monat, Umsatz, Top-Makler, Trends).
+    """
+    jetzt = datetime.now()
+    monat, jahr = jetzt.month, jetzt.year
+
+    alle_makler = db.query(Makler).order_by(Makler.id).all()
+    trend_monate = berechne_trend_monate(
+        jetzt, trends_start_monat, trends_start_jahr, trends_anzahl_monate
+    )
+    zaehlung = zaehle_gelieferte_leads(db, trend_monate + [(monat, jahr)])
+
+    # Aktive Makler: nicht pausiert, Vertrag nicht vor Monatsbeginn abgelaufen
+    # und im aktuellen Monat aktiv (bereits gelieferte Leads zählen immer)
+    monatsanfang = datetime(jahr, monat, 1).date()
+    aktive_makler_ids = [
+        makler.id
+        for makler in alle_makler
+        if makler.vertrag_pausiert in (0, None)
+        and (makler.vertrag_bis is None or makler.vertrag_bis >= monatsanfang)
+        and ist_aktiv_laut_zaehlung(makler, monat, jahr, zaehlung)
+    ]
+
+    # Gelieferte Leads im aktuellen Monat (ohne aktive Makler: alle mit Makler-Zuordnung)
+    if aktive_makler_ids:
+        aktive_set = set(aktive_makler_ids)
+        anzahl_gelieferte_leads = sum(
+            sum(stati.values())
+            for (makler_id, j, m), stati in zaehlung.items()
+            if (j, m) == (jahr, monat) and makler_id in aktive_set
+        )
+    else:
+        anzahl_gelieferte_leads = sum(
+            sum(stati.values())
+            for (_, j, m), stati in zaehlung.items()
+            if (j, m) == (jahr, monat)
+        )
+
+    # Rechnungen des aktuellen Monats: monatliche Rechnungen nach monat/jahr,
+    # Beteiligungsrechnungen nach erstellt_am
+    anzahl_rechnungen, gesamtumsatz = db.query(
+        func.count(Rechnung.id), func.sum(Rechnung.gesamtbetrag)
+    ).filter(
+        or_(
+            and_(Rechnung.monat == monat, Rechnung.jahr == jahr),
+            and_(
+                Rechnung.rechnungstyp == "beteiligung",
+                im_monat(Rechnung.erstellt_am, monat, jahr),
+            ),
+        )
+    ).one()
+    gesamtumsatz = float(gesamtumsatz) if gesamtumsatz is not None else 0.0
+    durchschnitt_pro_rechnung = gesamtumsatz / anzahl_rechnungen if anzahl_rechnungen > 0 else 0.0
+
+    # Alle Leads dieses Monats (erstellt_am, nicht qualifiziert_am)
+    leads_dieser_monat = (
+        db.query(func.count(Lead.id))
+        .filter(im_monat(Lead.erstellt_am, monat, jahr))
+        .scalar()
+    )
+
+    # Top-Makler nach allen gelieferten Leads, nur im aktuellen Monat aktive Makler
+    leads_pro_makler = dict(
+        db.query(Lead.makler_id, func.count(Lead.id))
+        .filter(Lead.status.in_(GELIEFERT_STATI), Lead.makler_id.isnot(None))
+        .group_by(Lead.makler_id)
+        .all()
+    )
+    makler_stats = [
+        {"id": makler.id, "firmenname": makler.firmenname, "anzahl_leads": leads_pro_makler[makler.id]}
+        for makler in alle_makler
+        if leads_pro_makler.get(makler.id, 0) > 0
+        and ist_aktiv_laut_zaehlung(makler, monat, jahr, zaehlung)
+    ]
+    makler_stats.sort(key=lambda x: x["anzahl_leads"], reverse=True)
+    top_makler = makler_stats[:4]
+
+    # Monatliche Trends: gelieferte Leads von Maklern, die im jeweiligen Monat aktiv waren
+    makler_nach_id = {makler.id: makler for makler in alle_makler}
+    monatliche_trends = []
+    for trend_monat, trend_jahr in trend_monate:
+        anzahl = 0
+        for (makler_id, j, m), stati in zaehlung.items():
+            if (j, m) != (trend_jahr, trend_monat):
+                continue
+            makler = makler_nach_id.get(makler_id)
+            if makler and ist_aktiv_laut_zaehlung(makler, trend_monat, trend_jahr, zaehlung):
+                anzahl += sum(stati.values())
+        monatliche_trends.append({"monat": trend_monat, "jahr": trend_jahr, "anzahl": anzahl})
+
+    return {
+        "basis": {
+            "anzahl_makler": len(aktive_makler_ids),
+            "anzahl_gelieferte_leads": anzahl_gelieferte_leads,
+            "anzahl_rechnungen": anzahl_rechnungen,
+        },
+        "umsatz": {
+            "gesamtumsatz": gesamtumsatz,
+            "durchschnitt_pro_rechnung": float(durchschnitt_pro_rechnung),
+        },
+        "aktueller_monat": {
+            "leads": leads_dieser_monat,
+            "gelieferte_leads": anzahl_gelieferte_leads,
+        },
+        "top_makler": top_makler,
+        "monatliche_trends": monatliche_trends,
+    }
@@ -4,6 +4,7 @@ from fastapi import HTTPException, status
 
 from ..config import STRIPE_SECRET_KEY, STRIPE_ENABLED
 from ..models import Makler, MaklerCredits
+from .credits_service import buche_credits_transaktion
 from sqlalchemy.orm import Session
 
 if STRIPE_ENABLED and STRIPE_SECRET_KEY:
@@ -170,7 +171,7 @@ def handle_payment_success(
         zahlungsstatus="completed"
     )
     
-    db.add(transaktion)
+    buche_credits_transaktion(db, transaktion)
     db.commit()
     db.refresh(transaktion)
     
@@ -0,0 +1,335 @@
+"""
+Service für den Tages-Verteilungsplan der Lead-Empfehlung (Tabelle makler_tagesplan).
+Tagessatz, noch benötigte Leads und Monatswerte werden pro Makler einmal am Tag berechnet
+(für alle Makler gebündelt, siehe berechne_makler_status_batch) und gespeichert. Bei einer
+Qualifizierung werden nur die Zähler der Zeile erhöht, bei anderen Änderungen (Credits,
+Makler, zurückgenommene Qualifizierungen) wird die Zeile verworfen und beim nächsten
+Lesen neu berechnet. Die Rangfolge der Lead-Empfehlung liest damit nur noch den
+Rückstand (tagessatz - geliefert) pro Makler.
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..models import Lead, Makler, MaklerTagesplan
+from .abrechnung_service import berechne_vertragsmonat, kann_makler_neue_leads_bekommen
+from .organisation_service import berechne_makler_status, berechne_makler_status_batch
+
+# Status, die als heute gelieferte Leads zählen (wie bisher zaehle_leads_heute_fuer_makler)
+GELIEFERT_STATI = ("qualifiziert", "geliefert")
+
+# (makler_id, Tag von qualifiziert_am)
+TagesplanSchluessel = Tuple[int, date]
+
+
+def berechne_arbeitstage_bis_monatsende(aktuelles_datum: date) -> int:
+    """
+    Berechnet die Anzahl der Arbeitstage (Mo-Fr) bis zum Monatsende.
+    
+    Args:
+        aktuelles_datum: Das aktuelle Datum
+    
+    Returns:
+        Anzahl der Arbeitstage (ohne Wochenende)
+    """
+    # Letzter Tag des Monats
+    if aktuelles_datum.month == 12:
+        letzter_tag = date(aktuelles_datum.year + 1, 1, 1) - timedelta(days=1)
+    else:
+        letzter_tag = date(aktuelles_datum.year, aktuelles_datum.month + 1, 1) - timedelta(days=1)
+    
+    arbeitstage = 0
+    aktueller_tag = aktuelles_datum
+    
+    while aktueller_tag <= letzter_tag:
+        # 0 = Montag, 6 = Sonntag
+        wochentag = aktueller_tag.weekday()
+        if wochentag < 5:  # Montag bis Freitag
+            arbeitstage += 1
+        aktueller_tag += timedelta(days=1)
+    
+    return arbeitstage
+
+
+def berechne_tagessatz_fuer_makler(
+    db: Session,
+    makler: Makler,
+    monat: int,
+    jahr: int,
+    aktuelles_datum: date,
+    status_info: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Berechnet den Tagessatz (wie viele Leads muss dieser Makler heute noch bekommen)
+    und die noch benötigten Leads für den Monat.
+    
+    Args:
+        db: Datenbank-Session
+        makler: Der Makler
+        monat: Monat (1-12)
+        jahr: Jahr
+        aktuelles_datum: Das aktuelle Datum
+        status_info: Bereits berechneter Status (berechne_makler_status), sonst wird er berechnet
+    
+    Returns:
+        Dict mit tagessatz, noch_benoetigt, ist_leads, soll_leads, arbeitstage_noch
+    """
+    if status_info is None:
+        status_info = berechne_makler_status(db, makler, monat, jahr)
+    
+    # Prüfe ob Makler neue Leads bekommen kann (für Lead-Zuweisungen)
+    # WICHTIG: Verwendet kann_makler_neue_leads_bekommen statt ist_makler_in_monat_aktiv,
+    # da pausierte Makler keine neuen Leads bekommen sollen
+    if not kann_makler_neue_leads_bekommen(makler, monat, jahr):
+        return {
+            "tagessatz": 0,
+            "noch_benoetigt": 0,
+            "ist_leads": 0,
+            "soll_leads": None,
+            "arbeitstage_noch": 0,
+            "kann_leads": False
+        }
+    
+    ist_leads = status_info.get("ist_leads", 0)
+    arbeitstage_noch = berechne_arbeitstage_bis_monatsende(aktuelles_datum)
+    
+    # Altes System
+    if makler.rechnungssystem_typ == "alt" or (makler.rechnungssystem_typ is None):
+        vertragsmonat = berechne_vertragsmonat(makler.vertragsstart_datum, monat, jahr)
+        
+        # Soll-Leads bestimmen
+        if makler.monatliche_soll_leads is not None:
+            soll_leads = makler.monatliche_soll_leads
+        elif vertragsmonat == 1 and makler.testphase_leads > 0:
+            soll_leads = makler.testphase_leads
+        else:
+            soll_leads = None  # Unbegrenzt
+        
+        if soll_leads is None:
+            # Unbegrenzt: Kein Tagessatz, aber kann Leads bekommen
+            return {
+                "tagessatz": 0,  # Kein fester Tagessatz bei unbegrenzt
+                "noch_benoetigt": None,  # Unbegrenzt
+                "ist_leads": ist_leads,
+                "soll_leads": None,
+                "arbeitstage_noch": arbeitstage_noch,
+                "kann_leads": True,
+                "prioritaet": "normal"
+            }
+        else:
+            noch_benoetigt = max(0, soll_leads - ist_leads)
+            if noch_benoetigt == 0:
+                tagessatz = 0
+                prioritaet = "niedrig"
+            elif arbeitstage_noch > 0:
+                tagessatz = noch_benoetigt / arbeitstage_noch
+                prioritaet = "hoch" if tagessatz >= 1.0 else "normal"
+            else:
+                tagessatz = noch_benoetigt  # Heute noch alles
+                prioritaet = "hoch"
+            
+            return {
+                "tagessatz": tagessatz,
+                "noch_benoetigt": noch_benoetigt,
+                "ist_leads": ist_leads,
+                "soll_leads": soll_leads,
+                "arbeitstage_noch": arbeitstage_noch,
+                "kann_leads": noch_benoetigt > 0,
+                "prioritaet": prioritaet
+            }
+    
+    # Neues System (Credits)
+    else:
+        credits_stand = status_info.get("credits_stand", 0)
+        verfuegbare_leads = status_info.get("verfuegbare_leads", 0)
+        naechster_lead_preis = status_info.get("naechster_lead_preis", 0)
+        
+        if credits_stand < naechster_lead_preis:
+            # Keine Credits
+            return {
+                "tagessatz": 0,
+                "noch_benoetigt": 0,
+                "ist_leads": ist_leads,
+                "soll_leads": None,
+                "arbeitstage_noch": arbeitstage_noch,
+                "kann_leads": False,
+                "prioritaet": "niedrig"
+            }
+        
+        # Bei Credits-System: Verfuegbare Leads gleichmäßig verteilen
+        if verfuegbare_leads == 0:
+            tagessatz = 0
+            prioritaet = "niedrig"
+        elif arbeitstage_noch > 0:
+            # Gleichmäßige Verteilung der verfügbaren Leads
+            tagessatz = verfuegbare_leads / arbeitstage_noch
+            prioritaet = "hoch" if tagessatz >= 1.0 else "normal"
+        else:
+            tagessatz = verfuegbare_leads
+            prioritaet = "hoch"
+        
+        return {
+            "tagessatz": tagessatz,
+            "noch_benoetigt": verfuegbare_leads,
+            "ist_leads": ist_leads,
+            "soll_leads": None,  # Credits-System hat kein festes Soll
+            "arbeitstage_noch": arbeitstage_noch,
+            "kann_leads": verfuegbare_leads > 0,
+            "prioritaet": prioritaet,
+            "credits_stand": credits_stand,
+            "verfuegbare_leads": verfuegbare_leads
+        }
+
+
+def zaehle_leads_heute_pro_makler(db: Session, datum: date) -> Dict[int, int]:
+    """Am Tag qualifizierte Leads aller Makler mit einer gruppierten Abfrage ({makler_id: anzahl})"""
+    tag_start = datetime.combine(datum, datetime.min.time())
+    return dict(
+        db.query(Lead.makler_id, func.count(Lead.id))
+        .filter(
+            Lead.makler_id.isnot(None),
+            Lead.status.in_(GELIEFERT_STATI),
+            Lead.qualifiziert_am >= tag_start,
+            Lead.qualifiziert_am < tag_start + timedelta(days=1),
+        )
+        .group_by(Lead.makler_id)
+        .all()
+    )
+
+
+def _berechne_tagesplan_zeilen(db: Session, makler_liste: Iterable[Makler], datum: date) -> Dict[int, MaklerTagesplan]:
+    """Berechnet Tagesplan-Zeilen für die übergebenen Makler (noch nicht in der Session)"""
+    makler_liste = list(makler_liste)
+    status_pro_makler = berechne_makler_status_batch(db, makler_liste, datum.month, datum.year)
+    leads_heute = zaehle_leads_heute_pro_makler(db, datum)
+    jetzt = datetime.utcnow()
+    zeilen = {}
+    for makler in makler_liste:
+        info = berechne_tagessatz_fuer_makler(
+            db, makler, datum.month, datum.year, datum, status_pro_makler[makler.id]
+        )
+        zeile = MaklerTagesplan(
+            makler_id=makler.id,
+            datum=datum,
+            tagessatz=info["tagessatz"] or 0.0,
+            geliefert=leads_heute.get(makler.id, 0),
+            noch_benoetigt=info["noch_benoetigt"],
+            ist_leads=info["ist_leads"] or 0,
+            soll_leads=info["soll_leads"],
+            arbeitstage_noch=info["arbeitstage_noch"],
+            prioritaet=info.get("prioritaet", "niedrig"),
+            kann_leads=bool(info["kann_leads"]),
+            berechnet_am=jetzt,
+        )
+        zeilen[makler.id] = zeile
+    return zeilen
+
+
+def lade_tagesplan(db: Session, datum: Optional[date] = None) -> Dict[int, MaklerTagesplan]:
+    """
+    Liefert den Tagesplan aller Makler als {makler_id: Zeile} (Standard: heute).
+    Fehlende Zeilen (erster Aufruf des Tages, verworfene Makler) werden berechnet und in
+    einem Savepoint angelegt. Committet nicht - der Aufrufer committet, damit die Zeilen
+    für spätere Anfragen erhalten bleiben.
+    """
+    datum = datum or datetime.now().date()
+    zeilen = {
+        zeile.makler_id: zeile
+        for zeile in db.query(MaklerTagesplan).filter(MaklerTagesplan.datum == datum).all()
+    }
+    fehlende_makler = db.query(Makler).filter(Makler.id.notin_(list(zeilen))).all()
+    if not fehlende_makler:
+        return zeilen
+
+    neue_zeilen = _berechne_tagesplan_zeilen(db, fehlende_makler, datum)
+    try:
+        with db.begin_nested():
+            db.add_all(neue_zeilen.values())
+        zeilen.update(neue_zeilen)
+    except IntegrityError:
+        # Parallel von einer anderen Anfrage berechnet - deren Zeilen verwenden
+        zeilen = {
+            zeile.makler_id: zeile
+            for zeile in db.query(MaklerTagesplan).filter(MaklerTagesplan.datum == datum).all()
+        }
+    return zeilen
+
+
+def tagesplan_info(zeile: MaklerTagesplan) -> Dict[str, Any]:
+    """
+    Tagesplan-Zeile im Format von berechne_tagessatz_fuer_makler, ergänzt um leads_heute
+    und rueckstand (wie viele Leads dem Makler heute noch fehlen, 1 bei fehlendem Tagessatz).
+    """
+    kann_leads = zeile.kann_leads and (zeile.noch_benoetigt is None or zeile.noch_benoetigt > 0)
+    if not zeile.tagessatz:
+        rueckstand = 1.0
+    else:
+        rueckstand = max(0, zeile.tagessatz - zeile.geliefert)
+    return {
+        "tagessatz": zeile.tagessatz,
+        "noch_benoetigt": zeile.noch_benoetigt,
+        "ist_leads": zeile.ist_leads,
+        "soll_leads": zeile.soll_leads,
+        "arbeitstage_noch": zeile.arbeitstage_noch,
+        "kann_leads": kann_leads,
+        "prioritaet": zeile.prioritaet,
+        "leads_heute": zeile.geliefert,
+        "rueckstand": rueckstand,
+    }
+
+
+def lead_tagesplan_schluessel(lead: Lead) -> Optional[TagesplanSchluessel]:
+    """(makler_id, Tag) an dem der Lead als geliefert zählt, oder None"""
+    if lead.makler_id is None or lead.qualifiziert_am is None or lead.status not in GELIEFERT_STATI:
+        return None
+    return lead.makler_id, lead.qualifiziert_am.date()
+
+
+def verwerfe_tagesplan(db: Session, makler_ids: Iterable[int]) -> None:
+    """
+    Löscht die Tagesplan-Zeilen der Makler ab heute, sie werden beim nächsten Lesen neu
+    berechnet. Für Änderungen an Makler oder Credits. Committet nicht.
+    """
+    makler_ids = [makler_id for makler_id in set(makler_ids) if makler_id is not None]
+    if not makler_ids:
+        return
+    db.query(MaklerTagesplan).filter(
+        MaklerTagesplan.makler_id.in_(makler_ids),
+        MaklerTagesplan.datum >= datetime.now().date(),
+    ).delete()
+
+
+def aktualisiere_tagesplan_fuer_lead(
+    db: Session, lead: Lead, alter_schluessel: Optional[TagesplanSchluessel] = None
+) -> None:
+    """
+    Aktualisiert den Tagesplan nach einer Lead-Änderung. Eine neue Qualifizierung von heute
+    erhöht geliefert/ist_leads und verringert noch_benoetigt direkt in SQL; jede andere
+    Änderung der Zuordnung verwirft die Zeilen der betroffenen Makler. Committet nicht.
+    """
+    neuer_schluessel = lead_tagesplan_schluessel(lead)
+    if neuer_schluessel == alter_schluessel:
+        return
+
+    heute = datetime.now().date()
+    if alter_schluessel is None and neuer_schluessel == (lead.makler_id, heute) and lead.status == "qualifiziert":
+        db.execute(
+            update(MaklerTagesplan)
+            .where(MaklerTagesplan.makler_id == lead.makler_id, MaklerTagesplan.datum == heute)
+            .values(
+                geliefert=MaklerTagesplan.geliefert + 1,
+                ist_leads=MaklerTagesplan.ist_leads + 1,
+                noch_benoetigt=case(
+                    (MaklerTagesplan.noch_benoetigt > 0, MaklerTagesplan.noch_benoetigt - 1),
+                    else_=MaklerTagesplan.noch_benoetigt,
+                ),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return
+
+    verwerfe_tagesplan(db, [s[0] for s in (alter_schluessel, neuer_schluessel) if s is not None])
@@ -0,0 +1,133 @@
+"""
+Service für den Antwort-Cache der Telefonisten-Ansichten.
+Telefonisten fragen Dashboard und Lead-Empfehlung im Sekundentakt ab, die Ergebnisse
+ändern sich aber nur bei Lead-Änderungen, Credits-Buchungen und Makler-Änderungen.
+Berechnete Antworten werden deshalb kurz (TTL) pro Prozess zwischengespeichert und bei
+diesen Änderungen explizit verworfen.
+
+Invalidierung aus einer laufenden Transaktion: markiere_telefonist_cache_veraltet(db)
+merkt die Änderung an der Session vor, der Cache wird erst nach dem Commit geleert
+(bei Rollback bleibt er gültig). Hinweis: Wie der Gebiets-Index lebt der Cache pro
+Prozess - bei mehreren Workern begrenzt die TTL, wie lange andere Prozesse veraltete
+Antworten liefern.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import TELEFONIST_CACHE_TTL_SEKUNDEN
+
+BEREICH_DASHBOARD = "dashboard"
+BEREICH_LEAD_EMPFEHLUNG = "lead_empfehlung"
+
+# Ab dieser Anzahl Einträge werden beim Speichern abgelaufene Einträge entfernt
+MAX_EINTRAEGE = 500
+
+# Schlüssel in Session.info für eine vorgemerkte Invalidierung
+_SESSION_MARKIERUNG = "telefonist_cache_veraltet"
+
+# (bereich, schluessel) -> (gueltig_bis, wert)
+_eintraege: Dict[Tuple[str, Hashable], Tuple[float, Any]] = {}
+# bereich -> {"treffer": ..., "fehlschlaege": ...}
+_metriken: Dict[str, Dict[str, int]] = {}
+_invalidierungen = 0
+# Wird bei jeder Invalidierung erhöht; Berechnungen, die währenddessen liefen, werden nicht gespeichert
+_generation = 0
+_lock = threading.RLock()
+
+
+def _zaehle(bereich: str, art: str) -> None:
+    """Erhöht einen Metrik-Zähler (ohne Lock, Aufrufer hält ihn)"""
+    zaehler = _metriken.setdefault(bereich, {"treffer": 0, "fehlschlaege": 0})
+    zaehler[art] += 1
+
+
+def _entferne_abgelaufene(jetzt: float) -> None:
+    """Entfernt abgelaufene Einträge (ohne Lock, Aufrufer hält ihn)"""
+    for schluessel in [s for s, (gueltig_bis, _) in _eintraege.items() if gueltig_bis <= jetzt]:
+        del _eintraege[schluessel]
+
+
+def hole_oder_berechne(
+    bereich: str,
+    schluessel: Hashable,
+    berechne: Callable[[], Any],
+    ttl_sekunden: Optional[float] = None
+) -> Any:
+    """
+    Liefert die zwischengespeicherte Antwort für (bereich, schluessel) oder berechnet sie
+    mit berechne() und speichert sie für ttl_sekunden (Standard: TELEFONIST_CACHE_TTL_SEKUNDEN).
+    Die gelieferten Objekte werden geteilt und dürfen vom Aufrufer nicht verändert werden.
+    """
+    ttl = TELEFONIST_CACHE_TTL_SEKUNDEN if ttl_sekunden is None else ttl_sekunden
+    if ttl <= 0:
+        return berechne()
+
+    with _lock:
+        eintrag = _eintraege.get((bereich, schluessel))
+        if eintrag is not None and eintrag[0] > time.monotonic():
+            _zaehle(bereich, "treffer")
+            return eintrag[1]
+        _zaehle(bereich, "fehlschlaege")
+        generation = _generation
+
+    wert = berechne()
+
+    with _lock:
+        # Wurde während der Berechnung invalidiert, ist das Ergebnis womöglich schon veraltet
+        if generation == _generation:
+            jetzt = time.monotonic()
+            if len(_eintraege) >= MAX_EINTRAEGE:
+                _entferne_abgelaufene(jetzt)
+            _eintraege[(bereich, schluessel)] = (jetzt + ttl, wert)
+    return wert
+
+
+def invalidiere_telefonist_cache() -> None:
+    """Verwirft sofort alle zwischengespeicherten Telefonisten-Antworten"""
+    global _generation, _invalidierungen
+    with _lock:
+        _eintraege.clear()
+        _generation += 1
+        _invalidierungen += 1
+
+
+def markiere_telefonist_cache_veraltet(db: Session) -> None:
+    """
+    Merkt an der Session vor, dass der Cache nach dem nächsten Commit verworfen werden muss.
+    Für Änderungen innerhalb einer Transaktion (Lead-Status, Credits, Makler).
+    """
+    db.info[_SESSION_MARKIERUNG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _nach_commit(session: Session) -> None:
+    if session.info.pop(_SESSION_MARKIERUNG, False):
+        invalidiere_telefonist_cache()
+
+
+@event.listens_for(Session, "after_rollback")
+def _nach_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_MARKIERUNG, None)
+
+
+def get_cache_metriken() -> Dict[str, Any]:
+    """Treffer/Fehlschläge pro Bereich, Trefferquote, Anzahl Einträge und Invalidierungen"""
+    with _lock:
+        bereiche = {}
+        for bereich, zaehler in _metriken.items():
+            gesamt = zaehler["treffer"] + zaehler["fehlschlaege"]
+            bereiche[bereich] = {
+                **zaehler,
+                "trefferquote": zaehler["treffer"] / gesamt if gesamt else 0.0,
+                "eintraege": sum(1 for (b, _) in _eintraege if b == bereich),
+            }
+        return {
+            "ttl_sekunden": TELEFONIST_CACHE_TTL_SEKUNDEN,
+            "invalidierungen": _invalidierungen,
+            "bereiche": bereiche,
+        }
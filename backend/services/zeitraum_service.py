@@ -0,0 +1,38 @@
+"""
+Service für Zeitraum-Filter auf Datumsspalten.
+Statt extract("month"/"year", spalte) == ... werden halboffene Bereiche
+[start, ende) erzeugt. Vergleiche direkt auf der Spalte können einen Index
+nutzen, extract() erzwingt dagegen einen Full-Scan über alle Zeilen.
+"""
+
+from datetime import datetime
+from typing import Tuple
+
+from sqlalchemy import and_
+
+
+def monats_fenster(monat: int, jahr: int) -> Tuple[datetime, datetime]:
+    """Liefert (start, ende) des Monats als halboffenes Intervall [start, ende)"""
+    start = datetime(jahr, monat, 1)
+    if monat == 12:
+        ende = datetime(jahr + 1, 1, 1)
+    else:
+        ende = datetime(jahr, monat + 1, 1)
+    return start, ende
+
+
+def jahres_fenster(jahr: int) -> Tuple[datetime, datetime]:
+    """Liefert (start, ende) des Jahres als halboffenes Intervall [start, ende)"""
+    return datetime(jahr, 1, 1), datetime(jahr + 1, 1, 1)
+
+
+def im_monat(spalte, monat: int, jahr: int):
+    """Filter-Ausdruck: spalte liegt im angegebenen Monat (NULL-Werte fallen heraus)"""
+    start, ende = monats_fenster(monat, jahr)
+    return and_(spalte >= start, spalte < ende)
+
+
+def im_jahr(spalte, jahr: int):
+    """Filter-Ausdruck: spalte liegt im angegebenen Jahr (NULL-Werte fallen heraus)"""
+    start, ende = jahres_fenster(jahr)
+    return and_(spalte >= start, spalte < ende)
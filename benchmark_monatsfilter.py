@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Monatszählung qualifizierter Leads pro Makler.
+Vergleicht extract("month"/"year", qualifiziert_am) (unter SQLite: CAST(STRFTIME(...)))
+mit dem halboffenen Datumsbereich aus services/zeitraum_service.py auf einer
+synthetischen leads-Tabelle in einer temporären SQLite-Datenbank.
+
+Aufruf: python benchmark_monatsfilter.py [anzahl_leads]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from backend.services.zeitraum_service import monats_fenster
+
+ANZAHL_LEADS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+ANZAHL_MAKLER = 200
+WIEDERHOLUNGEN = 50
+ZEITFORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+EXTRACT_SQL = """
+    SELECT count(*) FROM leads
+    WHERE makler_id = ? AND status = 'qualifiziert' AND qualifiziert_am IS NOT NULL
+      AND CAST(STRFTIME('%m', qualifiziert_am) AS INTEGER) = ?
+      AND CAST(STRFTIME('%Y', qualifiziert_am) AS INTEGER) = ?
+"""
+
+BEREICH_SQL = """
+    SELECT count(*) FROM leads
+    WHERE makler_id = ? AND status = 'qualifiziert' AND qualifiziert_am IS NOT NULL
+      AND qualifiziert_am >= ? AND qualifiziert_am < ?
+"""
+
+
+def erzeuge_leads(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE TABLE leads (id INTEGER PRIMARY KEY, makler_id INTEGER, status VARCHAR, "
+        "qualifiziert_am DATETIME, erstellt_am DATETIME)"
+    )
+    # Dieselben Indizes wie init_db vor der Umstellung
+    conn.execute("CREATE INDEX idx_leads_makler_status ON leads(makler_id, status)")
+    conn.execute("CREATE INDEX idx_leads_qualifiziert_am ON leads(qualifiziert_am)")
+
+    rnd = random.Random(42)
+    basis = datetime(2022, 1, 1)
+    stati = ["qualifiziert"] * 6 + ["unqualifiziert"] * 3 + ["reklamiert"]
+
+    def zeilen():
+        for i in range(1, ANZAHL_LEADS + 1):
+            erstellt = basis + timedelta(seconds=rnd.randrange(4 * 365 * 86400))
+            status = rnd.choice(stati)
+            qualifiziert = None
+            if status != "unqualifiziert":
+                qualifiziert = (erstellt + timedelta(days=rnd.randrange(14))).strftime(ZEITFORMAT)
+            yield (i, rnd.randint(1, ANZAHL_MAKLER), status, qualifiziert, erstellt.strftime(ZEITFORMAT))
+
+    conn.executemany("INSERT INTO leads VALUES (?, ?, ?, ?, ?)", zeilen())
+    conn.commit()
+
+
+def messe(conn: sqlite3.Connection, sql: str, parameter) -> float:
+    start = time.perf_counter()
+    for p in parameter:
+        conn.execute(sql, p).fetchone()
+    return (time.perf_counter() - start) / len(parameter) * 1000
+
+
+def main() -> None:
+    rnd = random.Random(7)
+    abfragen = [(rnd.randint(1, ANZAHL_MAKLER), rnd.randint(1, 12), rnd.choice([2023, 2024, 2025]))
+                for _ in range(WIEDERHOLUNGEN)]
+    extract_param = abfragen
+    bereich_param = []
+    for makler_id, monat, jahr in abfragen:
+        start, ende = monats_fenster(monat, jahr)
+        # Gleiches Format, mit dem SQLAlchemy DateTime-Parameter an SQLite bindet
+        bereich_param.append((makler_id, start.strftime(ZEITFORMAT), ende.strftime(ZEITFORMAT)))
+
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        conn = sqlite3.connect(os.path.join(verzeichnis, "benchmark.db"))
+        print(f"Erzeuge {ANZAHL_LEADS:,} synthetische Leads...")
+        erzeuge_leads(conn)
+
+        # Beide Varianten müssen dieselben Zahlen liefern
+        for e, b in zip(extract_param, bereich_param):
+            assert conn.execute(EXTRACT_SQL, e).fetchone() == conn.execute(BEREICH_SQL, b).fetchone()
+
+        vorher = messe(conn, EXTRACT_SQL, extract_param)
+        bereich_alt = messe(conn, BEREICH_SQL, bereich_param)
+
+        conn.execute(
+            "CREATE INDEX idx_leads_makler_status_qualifiziert_am ON leads(makler_id, status, qualifiziert_am)"
+        )
+        conn.execute("ANALYZE")
+        extract_neu = messe(conn, EXTRACT_SQL, extract_param)
+        nachher = messe(conn, BEREICH_SQL, bereich_param)
+        plan = conn.execute("EXPLAIN QUERY PLAN " + BEREICH_SQL, bereich_param[0]).fetchall()
+        conn.close()
+
+    print(f"extract(), alte Indizes:              {vorher:8.3f} ms/Abfrage")
+    print(f"Datumsbereich, alte Indizes:          {bereich_alt:8.3f} ms/Abfrage")
+    print(f"extract(), neuer Composite-Index:     {extract_neu:8.3f} ms/Abfrage")
+    print(f"Datumsbereich, neuer Composite-Index: {nachher:8.3f} ms/Abfrage")
+    print(f"Speedup gegenüber extract():          {vorher / nachher:8.1f}x")
+    print("Query-Plan:", "; ".join(str(zeile[-1]) for zeile in plan))
+
+
+if __name__ == "__main__":
+    main()
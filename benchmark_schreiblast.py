@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Lasttest: gleichzeitige Schreibzugriffe mehrerer Telefonisten auf SQLite.
+Vergleicht die bisherige Engine (nur check_same_thread=False, Rollback-Journal,
+synchronous=FULL) mit dem Engine-Profil aus backend/database.py (WAL, busy_timeout,
+Cache, mmap, fester Pool) auf einer temporären Datenbank.
+
+Jeder Schreiber-Thread führt pro Transaktion aus, was eine Lead-Qualifizierung
+schreibt (Lead-Status setzen, Credits-Buchung einfügen, Makler-Kontostand anpassen);
+parallel lesen Dashboard-Threads Zählungen aus derselben Tabelle.
+
+Aufruf (aus dem Projektverzeichnis): python benchmark_schreiblast.py [schreiber] [transaktionen_pro_schreiber]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import SQLITE_PRAGMAS, erstelle_engine
+
+ANZAHL_SCHREIBER = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+TRANSAKTIONEN_PRO_SCHREIBER = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+ANZAHL_LESER = 4
+ANZAHL_LEADS = 50_000
+ANZAHL_MAKLER = 50
+
+
+def erzeuge_daten(engine) -> None:
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE makler (id INTEGER PRIMARY KEY, credits_stand FLOAT)"))
+        conn.execute(text(
+            "CREATE TABLE leads (id INTEGER PRIMARY KEY, makler_id INTEGER, status VARCHAR, "
+            "qualifiziert_am DATETIME)"
+        ))
+        conn.execute(text("CREATE INDEX idx_leads_status ON leads(status)"))
+        conn.execute(text(
+            "CREATE TABLE makler_credits (id INTEGER PRIMARY KEY, makler_id INTEGER, "
+            "betrag FLOAT, erstellt_am DATETIME)"
+        ))
+        conn.execute(
+            text("INSERT INTO makler VALUES (:id, 1000.0)"),
+            [{"id": i} for i in range(1, ANZAHL_MAKLER + 1)],
+        )
+        conn.execute(
+            text("INSERT INTO leads (id, status) VALUES (:id, 'unqualifiziert')"),
+            [{"id": i} for i in range(1, ANZAHL_LEADS + 1)],
+        )
+
+
+def schreiber(session_factory, nummer: int, latenzen: list, fehler: list) -> None:
+    rnd = random.Random(nummer)
+    for _ in range(TRANSAKTIONEN_PRO_SCHREIBER):
+        lead_id = rnd.randint(1, ANZAHL_LEADS)
+        makler_id = rnd.randint(1, ANZAHL_MAKLER)
+        start = time.perf_counter()
+        db = session_factory()
+        try:
+            db.execute(text("SELECT status FROM leads WHERE id = :id"), {"id": lead_id}).scalar()
+            db.execute(
+                text("UPDATE leads SET status = 'qualifiziert', makler_id = :m, "
+                     "qualifiziert_am = CURRENT_TIMESTAMP WHERE id = :id"),
+                {"m": makler_id, "id": lead_id},
+            )
+            db.execute(
+                text("INSERT INTO makler_credits (makler_id, betrag, erstellt_am) "
+                     "VALUES (:m, -50.0, CURRENT_TIMESTAMP)"),
+                {"m": makler_id},
+            )
+            db.execute(
+                text("UPDATE makler SET credits_stand = credits_stand - 50.0 WHERE id = :m"),
+                {"m": makler_id},
+            )
+            db.commit()
+            latenzen.append(time.perf_counter() - start)
+        except OperationalError as e:
+            db.rollback()
+            fehler.append(str(e.orig))
+        finally:
+            db.close()
+
+
+def leser(session_factory, stopp: threading.Event, zaehler: list) -> None:
+    while not stopp.is_set():
+        db = session_factory()
+        try:
+            db.execute(text("SELECT status, count(*) FROM leads GROUP BY status")).all()
+            zaehler.append(1)
+        except OperationalError:
+            pass
+        finally:
+            db.close()
+
+
+def lauf(name: str, engine) -> None:
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    latenzen, fehler, lesungen = [], [], []
+    stopp = threading.Event()
+    leser_threads = [
+        threading.Thread(target=leser, args=(session_factory, stopp, lesungen))
+        for _ in range(ANZAHL_LESER)
+    ]
+    schreiber_threads = [
+        threading.Thread(target=schreiber, args=(session_factory, i, latenzen, fehler))
+        for i in range(ANZAHL_SCHREIBER)
+    ]
+    start = time.perf_counter()
+    for t in leser_threads + schreiber_threads:
+        t.start()
+    for t in schreiber_threads:
+        t.join()
+    dauer = time.perf_counter() - start
+    stopp.set()
+    for t in leser_threads:
+        t.join()
+    engine.dispose()
+
+    latenzen.sort()
+    p95 = latenzen[int(len(latenzen) * 0.95) - 1] * 1000 if latenzen else 0.0
+    median = statistics.median(latenzen) * 1000 if latenzen else 0.0
+    print(f"{name}:")
+    print(f"  Commits:               {len(latenzen):6d} in {dauer:6.2f} s ({len(latenzen) / dauer:8.1f}/s)")
+    print(f"  'database is locked':  {sum(1 for f in fehler if 'locked' in f):6d}")
+    print(f"  Latenz Median / p95:   {median:8.1f} ms / {p95:8.1f} ms")
+    print(f"  Lesezugriffe:          {len(lesungen):6d} ({len(lesungen) / dauer:8.1f}/s)")
+
+
+def main() -> None:
+    print(f"{ANZAHL_SCHREIBER} Schreiber x {TRANSAKTIONEN_PRO_SCHREIBER} Transaktionen, {ANZAHL_LESER} Leser")
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        url_alt = f"sqlite:///{os.path.join(verzeichnis, 'alt.db')}"
+        # Bisherige Konfiguration aus database.py
+        engine_alt = create_engine(url_alt, connect_args={"check_same_thread": False})
+        erzeuge_daten(engine_alt)
+        lauf("Bisher (Rollback-Journal, ohne Tuning)", engine_alt)
+
+        url_neu = f"sqlite:///{os.path.join(verzeichnis, 'neu.db')}"
+        engine_neu = erstelle_engine(url_neu, SQLITE_PRAGMAS)
+        erzeuge_daten(engine_neu)
+        lauf(f"Engine-Profil ({', '.join(f'{k}={v}' for k, v in SQLITE_PRAGMAS.items() if v)})", engine_neu)
+
+
+if __name__ == "__main__":
+    main()
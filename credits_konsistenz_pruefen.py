@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Prüft den laufenden Credits-Stand (makler.credits_stand) gegen die Summe aller Transaktionen.
+Mit --korrigieren wird der Stand abweichender Makler auf die Ledger-Summe gesetzt.
+"""
+
+import sys
+
+from backend.database import SessionLocal
+from backend.services.credits_service import pruefe_credits_konsistenz
+
+korrigieren = '--korrigieren' in sys.argv
+
+db = SessionLocal()
+try:
+    abweichungen = pruefe_credits_konsistenz(db, korrigieren=korrigieren)
+    if not abweichungen:
+        print('Alle Credits-Stände stimmen mit den Transaktionen überein')
+    for a in abweichungen:
+        print(f"Makler {a['makler_id']}: Stand {a['credits_stand']:.2f} €, Ledger {a['ledger_summe']:.2f} € (Differenz {a['differenz']:+.2f} €)")
+    if abweichungen and korrigieren:
+        db.commit()
+        print(f'{len(abweichungen)} Credits-Stände korrigiert')
+finally:
+    db.close()
@@ -92,3 +92,76 @@ function logout() {
     window.location.href = '/login.html';
 }
 
+// ========== Chat: Ungelesen-Badge und Echtzeit-Kanal ==========
+// Erwartet von der Seite: checkUnreadMessages(), loadConversations(), loadConversationMessages(),
+// updateTicketButtonVisibility() und currentConversation (Chat-Modal mit id="chat-modal").
+
+// Zeigt die Anzahl ungelesener Nachrichten am Chat-Button (data-maximum am Badge: Obergrenze der Anzeige, Standard 99)
+function zeigeChatBadge(totalUnread) {
+    const badge = document.getElementById('chat-badge');
+    if (badge) {
+        if (totalUnread > 0) {
+            const maximum = Number(badge.dataset.maximum || 99);
+            badge.textContent = totalUnread > maximum ? `${maximum}+` : totalUnread;
+            badge.classList.remove('hidden');
+        } else {
+            badge.classList.add('hidden');
+        }
+    }
+}
+
+// Echtzeit-Kanal: neue Nachrichten, Lesebestätigungen und Ungelesen-Zähler kommen per WebSocket,
+// das Polling gleicht mit Verbindung nur noch jede Minute ab
+let chatPushVerbunden = false;
+let chatPushWartezeit = 1000;
+// Ereignisse erreichen nur Verbindungen desselben Server-Prozesses: mit Verbindung seltener abgleichen
+const CHAT_ABGLEICH_MIT_PUSH_MS = 60000;
+const chatLetzterAbgleich = {};
+
+// Ob das Polling der Art ('badge', 'postfach') jetzt abgleichen soll
+function chatAbgleichFaellig(art) {
+    const jetzt = Date.now();
+    if (chatPushVerbunden && jetzt - (chatLetzterAbgleich[art] || 0) < CHAT_ABGLEICH_MIT_PUSH_MS) return false;
+    chatLetzterAbgleich[art] = jetzt;
+    return true;
+}
+
+function verbindeChatPush() {
+    const token = getToken();
+    if (!token || !window.WebSocket) return;
+    const protokoll = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(`${protokoll}//${window.location.host}${API_BASE}/auth/chat/ws?token=${encodeURIComponent(token)}`);
+    socket.onmessage = (event) => {
+        const ereignis = JSON.parse(event.data);
+        if (ereignis.typ === 'verbunden') {
+            chatPushVerbunden = true;
+            chatPushWartezeit = 1000;
+            checkUnreadMessages(); // Änderungen während der Trennung nachholen
+        } else if (ereignis.typ === 'ungelesen') {
+            zeigeChatBadge(ereignis.gesamt);
+        } else if (ereignis.typ === 'neu_laden') {
+            checkUnreadMessages();
+            aktualisiereOffenenChat();
+        } else if (ereignis.typ === 'nachricht' || ereignis.typ === 'gelesen') {
+            aktualisiereOffenenChat();
+        }
+    };
+    socket.onclose = () => {
+        chatPushVerbunden = false;
+        // Neu verbinden (z.B. nach Token-Ablauf oder Server-Neustart), Wartezeit wächst bis 30 Sekunden
+        setTimeout(verbindeChatPush, chatPushWartezeit);
+        chatPushWartezeit = Math.min(chatPushWartezeit * 2, 30000);
+    };
+}
+
+// Lädt Postfach und offene Konversation neu, wenn das Chat-Modal geöffnet ist
+async function aktualisiereOffenenChat() {
+    const modal = document.getElementById('chat-modal');
+    if (!modal || modal.classList.contains('hidden')) return;
+    await loadConversations();
+    if (currentConversation) {
+        await loadConversationMessages(true);
+        // Aktualisiere Ticket-Button-Sichtbarkeit
+        updateTicketButtonVisibility();
+    }
+}
@@ -7,6 +7,7 @@ Verwende dies, wenn der Webhook nicht funktioniert hat
 import sys
 from backend.database import SessionLocal
 from backend.models import Makler, MaklerCredits
+from backend.services.credits_service import buche_credits_transaktion
 
 if len(sys.argv) < 3:
     print("Verwendung: python manual_credit_fix.py <makler_email> <betrag> [payment_intent_id]")
@@ -41,7 +42,7 @@ if payment_intent_id:
         db.close()
         sys.exit(0)
 
-# Erstelle Credits-Transaktion
+# Erstelle Credits-Transaktion (erhöht auch Makler.credits_stand)
 transaktion = MaklerCredits(
     makler_id=makler.id,
     betrag=betrag,
@@ -51,7 +52,7 @@ transaktion = MaklerCredits(
     zahlungsstatus="completed"
 )
 
-db.add(transaktion)
+buche_credits_transaktion(db, transaktion)
 db.commit()
 db.refresh(transaktion)
 
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Führt ausstehende Datenbank-Migrationen aus (backend/migrations), unabhängig vom App-Start.
+Mit --status werden nur angewendete und ausstehende Migrationen angezeigt.
+"""
+
+import sys
+
+from backend.services.migration_service import (
+    aktuelle_schema_version,
+    fuehre_migrationen_aus,
+    migrations_status,
+    neueste_schema_version,
+)
+
+if '--status' in sys.argv:
+    print(f'Schema-Version: {aktuelle_schema_version()} (neueste: {neueste_schema_version()})')
+    for m in migrations_status():
+        if m['angewendet_am']:
+            print(f"  {m['version']:4d}  {m['name']}  angewendet am {m['angewendet_am']:%d.%m.%Y %H:%M} ({m['dauer_ms']} ms)")
+        else:
+            print(f"  {m['version']:4d}  {m['name']}  ausstehend")
+    sys.exit(0)
+
+angewendet = fuehre_migrationen_aus()
+if angewendet:
+    print(f"{len(angewendet)} Migration(en) angewendet, Schema-Version: {angewendet[-1]}")
+else:
+    print(f'Keine ausstehenden Migrationen, Schema-Version: {aktuelle_schema_version()}')
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""Berechnet die Monatsstatistik-Tabelle makler_monat_rollup vollständig neu"""
+
+from backend.database import SessionLocal, engine
+from backend.models import MaklerMonatRollup
+from backend.services.monats_rollup_service import baue_rollup_neu
+
+MaklerMonatRollup.__table__.create(bind=engine, checkfirst=True)
+
+db = SessionLocal()
+try:
+    anzahl_zeilen = baue_rollup_neu(db)
+    db.commit()
+    print(f'makler_monat_rollup neu aufgebaut: {anzahl_zeilen} Zeilen')
+except Exception:
+    db.rollback()
+    raise
+finally:
+    db.close()
@@ -0,0 +1,63 @@
+"""
+Gemeinsame Fixtures für die Tests.
+Die Tests laufen nie gegen leadgate.db: DATABASE_URL zeigt vor dem ersten Import von
+backend auf eine temporäre SQLite-Datei, einzelne Tests nutzen eigene In-Memory-Datenbanken.
+Das kurze Busy-Timeout lässt Sperrkonflikte zwischen zwei Verbindungen sofort scheitern,
+statt den Test minutenlang warten zu lassen.
+"""
+
+import os
+import tempfile
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='leadgate_test_'), 'test.db')}"
+os.environ["SQLITE_BUSY_TIMEOUT_MS"] = "1000"
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from backend.database import Base, SessionLocal  # noqa: E402
+from backend import models  # noqa: E402,F401 - registriert alle Tabellen an Base.metadata
+
+
+@pytest.fixture
+def engine():
+    """Leere In-Memory-SQLite-Datenbank mit allen Tabellen"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """Session auf der In-Memory-Datenbank (Objekte bleiben nach dem Commit geladen)"""
+    session = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def anwendungs_db():
+    """
+    Die temporäre Datenbank der Anwendung (backend.database.engine), migriert.
+    Für Code, der eigene Verbindungen öffnet (z.B. die Lead-Nummern-Vergabe).
+    """
+    from backend.services.migration_service import fuehre_migrationen_aus
+
+    fuehre_migrationen_aus()
+    return SessionLocal
+
+
+@pytest.fixture
+def app_db(anwendungs_db):
+    """Session auf der Anwendungs-Datenbank"""
+    session = anwendungs_db()
+    yield session
+    session.rollback()
+    session.close()
@@ -0,0 +1,84 @@
+"""
+Zustellung von Chat-Ereignissen über den WebSocket /api/auth/chat/ws:
+Eine per REST gesendete Nachricht kommt beim Empfänger als "nachricht" und
+"ungelesen" an, beim Absender als "nachricht".
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from backend.database import SessionLocal
+from backend.main import app
+from backend.models import User
+from backend.models.user import UserRole
+from backend.services.auth_service import create_access_token, get_password_hash
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Mit Kontextmanager, damit der Start (Migrationen auf der Test-Datenbank) ausgeführt wird
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def benutzer(client):
+    """Zwei aktive Manager, die sich Nachrichten schreiben"""
+    db = SessionLocal()
+    try:
+        paar = [
+            User(username=name, email=f"{name}@example.de", hashed_password=get_password_hash("geheim"),
+                 role=UserRole.MANAGER, is_active=True)
+            for name in ("push_anna", "push_bernd")
+        ]
+        db.add_all(paar)
+        db.commit()
+        return [(user.id, create_access_token({"sub": user.username})) for user in paar]
+    finally:
+        db.close()
+
+
+def _empfange(ws, typ):
+    """
+    Nächstes Ereignis, muss vom erwarteten Typ sein. Bleibt die Zustellung aus, kommt nach
+    PING_SEKUNDEN ein "ping" an und der Test schlägt fehl, statt endlos zu warten.
+    """
+    ereignis = ws.receive_json()
+    assert ereignis["typ"] == typ, ereignis
+    return ereignis
+
+
+def test_nachricht_und_ungelesen_werden_zugestellt(client, benutzer):
+    (anna_id, anna_token), (bernd_id, bernd_token) = benutzer
+
+    with client.websocket_connect(f"/api/auth/chat/ws?token={anna_token}") as anna_ws, \
+            client.websocket_connect(f"/api/auth/chat/ws?token={bernd_token}") as bernd_ws:
+        _empfange(anna_ws, "verbunden")
+        _empfange(bernd_ws, "verbunden")
+
+        antwort = client.post(
+            "/api/auth/chat",
+            json={"to_user_id": bernd_id, "nachricht": "Hallo Bernd"},
+            headers={"Authorization": f"Bearer {anna_token}"},
+        )
+        assert antwort.status_code == 201, antwort.text
+        nachricht_id = antwort.json()["id"]
+
+        ereignis = _empfange(bernd_ws, "nachricht")
+        assert ereignis["nachricht"]["id"] == nachricht_id
+        assert ereignis["nachricht"]["nachricht"] == "Hallo Bernd"
+        assert ereignis["nachricht"]["from_user_id"] == anna_id
+
+        ereignis = _empfange(bernd_ws, "ungelesen")
+        assert ereignis["gesamt"] == 1
+
+        ereignis = _empfange(anna_ws, "nachricht")
+        assert ereignis["nachricht"]["id"] == nachricht_id
+
+
+def test_ungueltiges_token_wird_abgelehnt(client):
+    with pytest.raises(WebSocketDisconnect) as fehler:
+        with client.websocket_connect("/api/auth/chat/ws?token=ungueltig") as ws:
+            ws.receive_json()
+    assert fehler.value.code == 1008
@@ -0,0 +1,83 @@
+"""
+Regressionstest: load_lead_details_batch lädt Usernamen, Makler-Firmennamen und
+PLZ-Zuständigkeiten einer Seite mit einer festen Anzahl an Queries (kein N+1).
+"""
+
+from contextlib import contextmanager
+from datetime import date, datetime
+
+from sqlalchemy import event
+
+from backend.models import Lead, Makler, User
+from backend.routers.leads import load_lead_details_batch
+from backend.services.gebiet_index_service import synchronisiere_makler_gebiet
+
+# Usernamen, Firmennamen und Gebiets-Version (einmal pro Transaktion)
+ERWARTETE_QUERIES = 3
+
+
+@contextmanager
+def zaehle_queries(engine):
+    """Zählt alle an die Datenbank gesendeten Statements"""
+    statements = []
+
+    def mitschreiben(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", mitschreiben)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", mitschreiben)
+
+
+def _lege_leads_an(db, anzahl):
+    """Leads mit jeweils eigenem Bearbeiter, Qualifizierer, Makler und eigener PLZ"""
+    leads = []
+    for i in range(anzahl):
+        qualifizierer = User(username=f"qualifizierer{i}", email=f"q{i}@example.de", hashed_password="x")
+        bearbeiter = User(username=f"bearbeiter{i}", email=f"b{i}@example.de", hashed_password="x")
+        makler = Makler(firmenname=f"Makler {i}", email=f"m{i}@example.de", vertragsstart_datum=date(2025, 1, 1))
+        db.add_all([qualifizierer, bearbeiter, makler])
+        db.flush()
+        plz = f"{10000 + i:05d}"
+        synchronisiere_makler_gebiet(db, makler.id, plz)
+        leads.append(Lead(
+            status="qualifiziert",
+            postleitzahl=plz,
+            makler_id=makler.id,
+            qualifiziert_von_user_id=qualifizierer.id,
+            bearbeitet_von_user_id=bearbeiter.id,
+            bearbeitet_seit=datetime.utcnow(),
+            erstellt_am=datetime.utcnow(),
+        ))
+    db.add_all(leads)
+    db.commit()
+    return leads
+
+
+def _queries_fuer(engine, db, leads):
+    # Neue Transaktion: die Gebiets-Version wird wie in einer echten Anfrage einmal gelesen
+    db.commit()
+    with zaehle_queries(engine) as statements:
+        details = load_lead_details_batch(leads, db)
+    assert len(details) == len(leads)
+    return len(statements), details
+
+
+def test_feste_anzahl_queries_unabhaengig_von_seitengroesse(engine, db):
+    leads = _lege_leads_an(db, 50)
+    # Gebiets-Index einmalig laden (geschieht im Betrieb beim ersten Zugriff des Prozesses)
+    load_lead_details_batch(leads, db)
+
+    queries_einzeln, _ = _queries_fuer(engine, db, leads[:1])
+    queries_seite, details = _queries_fuer(engine, db, leads)
+
+    assert queries_einzeln == ERWARTETE_QUERIES
+    assert queries_seite == ERWARTETE_QUERIES
+
+    erster = details[0]
+    assert erster["qualifiziert_von_username"] == "qualifizierer0"
+    assert erster["bearbeitet_von_username"] == "bearbeiter0"
+    assert erster["moegliche_makler_ids"] == str(leads[0].makler_id)
+    assert details[-1]["moegliche_makler_ids"] == str(leads[-1].makler_id)
@@ -0,0 +1,56 @@
+"""
+CSV-Import mit Duplikat-Modus "merge" und "flag" auf SQLite.
+Die Lead-Nummern werden in einer eigenen Transaktion reserviert; schreibt die Import-Session
+vorher (Zusammenführung, erster Batch-INSERT), wartet die Reservierung auf deren Schreibsperre
+und der Import scheitert mit "database is locked".
+"""
+
+import io
+
+import pytest
+
+from backend.models import ImportJob, Lead
+from backend.services import lead_nummer_service
+from backend.services.lead_import_service import importiere_leads_aus_datei
+
+KOPF = "Anbieter;PLZ;Ort;Telefon\n"
+
+
+@pytest.fixture(autouse=True)
+def reservierung_ohne_vorrat(monkeypatch):
+    """Jede Reservierung geht an die Datenbank (kein lokal reservierter Block, der den Konflikt verdeckt)"""
+    monkeypatch.setattr(lead_nummer_service, "BLOCK_GROESSE", 1)
+
+
+def _importiere(db, inhalt, duplikat_modus):
+    job = ImportJob(dateiname="test.csv", duplikat_modus=duplikat_modus, status="laeuft")
+    db.add(job)
+    db.commit()
+    importiere_leads_aus_datei(db, job, io.BytesIO((KOPF + inhalt).encode("utf-8")))
+    return job
+
+
+def _leads(db, telefonnummer):
+    return db.query(Lead).filter(Lead.telefonnummer == telefonnummer).order_by(Lead.id).all()
+
+
+def test_merge_ergaenzt_vorhandenen_lead_und_legt_neue_an(app_db):
+    _importiere(app_db, "Merge GmbH;10115;;030 1000\n", "skip")
+
+    job = _importiere(app_db, "Merge GmbH;10115;Berlin;030 1000\nNeu GmbH;10117;Berlin;030 1001\n", "merge")
+
+    assert (job.importierte_leads, job.duplikate_anzahl, job.fehler_anzahl) == (1, 1, 0)
+    [vorhandener] = _leads(app_db, "030 1000")
+    assert vorhandener.ort == "Berlin"
+    [neuer] = _leads(app_db, "030 1001")
+    assert neuer.lead_nummer is not None
+
+
+def test_flag_mit_duplikat_im_selben_batch(app_db):
+    job = _importiere(app_db, "Flag GmbH;20095;Hamburg;040 2000\nFlag GmbH;20095;Hamburg;040 2000\n", "flag")
+
+    assert (job.importierte_leads, job.duplikate_anzahl, job.fehler_anzahl) == (2, 1, 0)
+    original, duplikat = _leads(app_db, "040 2000")
+    assert original.duplikat_von_lead_id is None
+    assert duplikat.duplikat_von_lead_id == original.id
+    assert original.lead_nummer != duplikat.lead_nummer
@@ -0,0 +1,45 @@
+"""
+Lead-Nummern-Vergabe: reserviere_lead_nummern muss vor dem ersten Schreibzugriff der
+Transaktion aufgerufen werden (eigene Verbindung, unter SQLite eine Schreibsperre pro Datenbank).
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from backend.models import Lead
+from backend.services import lead_nummer_service
+from backend.services.lead_nummer_service import reserviere_lead_nummern
+
+
+@pytest.fixture
+def ohne_vorrat(monkeypatch):
+    """Leerer lokaler Block, jede Reservierung geht an die Datenbank"""
+    monkeypatch.setattr(lead_nummer_service, "BLOCK_GROESSE", 1)
+    monkeypatch.setattr(lead_nummer_service, "_block_naechste", 0)
+    monkeypatch.setattr(lead_nummer_service, "_block_ende", 0)
+
+
+def _lead(lead_nummer=None):
+    return Lead(status="unqualifiziert", lead_nummer=lead_nummer, erstellt_am=datetime.utcnow())
+
+
+def test_reservierung_vor_dem_ersten_schreibzugriff(app_db, ohne_vorrat):
+    # Lesen in der laufenden Transaktion blockiert die Reservierung nicht
+    app_db.query(Lead.id).first()
+    nummern = reserviere_lead_nummern(3)
+    app_db.add_all([_lead(nummer) for nummer in nummern])
+    app_db.commit()
+
+    assert len(set(nummern)) == 3
+    assert nummern == sorted(nummern)
+    assert reserviere_lead_nummern(1)[0] > nummern[-1]
+
+
+def test_reservierung_nach_schreibzugriff_scheitert_unter_sqlite(app_db, ohne_vorrat):
+    app_db.add(_lead())
+    app_db.flush()  # Session hält jetzt die Schreibsperre
+
+    with pytest.raises(OperationalError, match="database is locked"):
+        reserviere_lead_nummern(1)
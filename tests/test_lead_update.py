@@ -0,0 +1,35 @@
+"""
+update_lead hält den Duplikat-Fingerprint aktuell, wenn Telefonnummer, PLZ oder
+Anbieter-Name korrigiert werden.
+"""
+
+from backend import schemas
+from backend.models import Lead, User
+from backend.models.user import UserRole
+from backend.routers.leads import update_lead
+from backend.services.duplikat_service import berechne_fingerprint, finde_duplikat
+
+
+def test_plz_korrektur_berechnet_fingerprint_neu(db):
+    manager = User(username="manager", email="manager@example.de", hashed_password="x", role=UserRole.MANAGER)
+    original = Lead(
+        anbieter_name="Muster GmbH",
+        postleitzahl="10115",
+        telefonnummer="030 1000",
+        fingerprint=berechne_fingerprint("030 1000", "10115", "Muster GmbH"),
+    )
+    # Tippfehler in der PLZ: beim Anlegen nicht als Duplikat erkannt
+    vertippt = Lead(
+        anbieter_name="Muster GmbH",
+        postleitzahl="10151",
+        telefonnummer="030 1000",
+        fingerprint=berechne_fingerprint("030 1000", "10151", "Muster GmbH"),
+    )
+    db.add_all([manager, original, vertippt])
+    db.commit()
+
+    update_lead(vertippt.id, schemas.LeadUpdate(postleitzahl="10115"), db=db, current_user=manager)
+
+    assert vertippt.postleitzahl == "10115"
+    assert vertippt.fingerprint == original.fingerprint
+    assert finde_duplikat(db, vertippt.fingerprint) == original.id
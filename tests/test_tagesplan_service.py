@@ -0,0 +1,34 @@
+"""
+lade_tagesplan legt fehlende Zeilen in einem Savepoint an und committet nicht:
+ausstehende Änderungen des Aufrufers bleiben bei ihm.
+"""
+
+from datetime import date
+
+from backend.models import Makler, MaklerTagesplan, User
+from backend.services.tagesplan_service import lade_tagesplan
+
+
+def test_lade_tagesplan_committet_keine_fremden_aenderungen(db):
+    makler = Makler(firmenname="Plan GmbH", email="plan@example.de", vertragsstart_datum=date(2025, 1, 1))
+    db.add(makler)
+    db.commit()
+
+    db.add(User(username="ausstehend", email="ausstehend@example.de", hashed_password="x"))
+    zeilen = lade_tagesplan(db)
+    assert set(zeilen) == {makler.id}
+    db.rollback()
+
+    assert db.query(User).filter(User.username == "ausstehend").count() == 0
+    assert db.query(MaklerTagesplan).count() == 0
+
+
+def test_lade_tagesplan_zeilen_bleiben_nach_commit_des_aufrufers(db):
+    makler = Makler(firmenname="Plan GmbH", email="plan@example.de", vertragsstart_datum=date(2025, 1, 1))
+    db.add(makler)
+    db.commit()
+
+    lade_tagesplan(db)
+    db.commit()
+
+    assert [zeile.makler_id for zeile in db.query(MaklerTagesplan).all()] == [makler.id]